@@ -0,0 +1,83 @@
+"""
+Inspection pipeline benchmarks. Results are written as JSON under
+benchmarks/results/ (or --output) so runs can be compared across commits.
+
+    python -m benchmarks micro --resolutions vga,fhd,4k
+    python -m benchmarks load --start --clients 8 --resolution hd
+    python -m benchmarks load --url http://127.0.0.1:8000 --query mode=pipeline
+"""
+
+import argparse
+import asyncio
+import json
+from pathlib import Path
+
+from benchmarks.frames import RESOLUTIONS
+from benchmarks.report import write_results
+
+
+def _resolutions(value: str) -> list[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = set(names) - set(RESOLUTIONS)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown resolutions: {sorted(unknown)}")
+    return names
+
+
+async def _load(args: argparse.Namespace) -> dict:
+    from benchmarks.load import LocalServer, run_load
+
+    if not args.start:
+        return await run_load(
+            args.url,
+            args.resolution,
+            args.clients,
+            args.frames,
+            args.query,
+            args.server_pid,
+        )
+    async with LocalServer(args.port) as server:
+        return await run_load(
+            server.base_url,
+            args.resolution,
+            args.clients,
+            args.frames,
+            args.query,
+            server.process.pid,
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    parser.add_argument("--output", type=Path, help="JSON results file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    micro = commands.add_parser("micro", help="in-process per-step timings")
+    micro.add_argument("--resolutions", type=_resolutions, default=list(RESOLUTIONS))
+    micro.add_argument("--iterations", type=int, default=50)
+    micro.add_argument("--format-boxes", type=int, default=100)
+
+    load = commands.add_parser("load", help="multi-client WebSocket load")
+    load.add_argument("--start", action="store_true", help="start a local server")
+    load.add_argument("--port", type=int, default=8765)
+    load.add_argument("--url", default="http://127.0.0.1:8000")
+    load.add_argument("--server-pid", type=int, help="pid of an already running app")
+    load.add_argument("--resolution", choices=list(RESOLUTIONS), default="hd")
+    load.add_argument("--clients", type=int, default=4)
+    load.add_argument("--frames", type=int, default=100, help="frames per client")
+    load.add_argument("--query", default="", help="e.g. mode=pipeline&dedup=true")
+
+    args = parser.parse_args()
+    if args.command == "micro":
+        from benchmarks.micro import run_micro
+
+        results = run_micro(args.resolutions, args.iterations, args.format_boxes)
+    else:
+        results = asyncio.run(_load(args))
+
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {write_results(args.command, results, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
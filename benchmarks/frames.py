@@ -0,0 +1,55 @@
+import cv2
+import numpy as np
+
+RESOLUTIONS: dict[str, tuple[int, int]] = {
+    "vga": (640, 480),
+    "hd": (1280, 720),
+    "fhd": (1920, 1080),
+    "4k": (3840, 2160),
+}
+
+
+def synthetic_frame(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """
+    A camera-like BGR frame: smooth gradient, filled shapes and sensor
+    noise, so it compresses (and decodes) like a real photo rather than a
+    flat test image.
+    """
+    rng = np.random.default_rng(seed)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = x
+    frame[..., 1] = y
+    frame[..., 2] = (x + y) / 2
+
+    scale = max(width, height) / 640
+    for _ in range(24):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        color = rng.integers(0, 256, 3).tolist()
+        if rng.random() < 0.5:
+            radius = int(rng.integers(10, 80) * scale)
+            cv2.circle(frame, center, radius, color, -1)
+        else:
+            size = (rng.integers(20, 160, 2) * scale).astype(int)
+            corner = (center[0] + int(size[0]), center[1] + int(size[1]))
+            cv2.rectangle(frame, center, corner, color, -1)
+
+    frame += rng.normal(0, 6, frame.shape).astype(np.float32)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def encode_jpeg(frame: np.ndarray, quality: int = 90) -> bytes:
+    ok, buffer = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError("JPEG encoding failed")
+    return buffer.tobytes()
+
+
+def jpeg_frames(resolution: str, count: int = 8, quality: int = 90) -> list[bytes]:
+    """``count`` distinct synthetic JPEG frames at a named resolution."""
+    width, height = RESOLUTIONS[resolution]
+    return [
+        encode_jpeg(synthetic_frame(width, height, seed), quality)
+        for seed in range(count)
+    ]
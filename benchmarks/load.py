@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from benchmarks.frames import jpeg_frames
+from benchmarks.report import latency_summary
+from benchmarks.ws_client import WebSocketClient
+
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _process_tree(pid: int) -> list[int]:
+    """A process and all its descendants (inference processes, workers)."""
+    children: dict[int, list[int]] = {}
+    for entry in Path("/proc").iterdir():
+        if not entry.name.isdigit():
+            continue
+        try:
+            stat = (entry / "stat").read_text()
+        except OSError:
+            continue
+        parent = int(stat.rsplit(")", 1)[1].split()[1])
+        children.setdefault(parent, []).append(int(entry.name))
+
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+
+def server_usage(pid: int) -> dict:
+    """CPU seconds used and peak RSS of a server and its child processes."""
+    cpu_ticks, peak_rss = 0, 0
+    for process in _process_tree(pid):
+        try:
+            fields = Path(f"/proc/{process}/stat").read_text().rsplit(")", 1)[1].split()
+            status = Path(f"/proc/{process}/status").read_text()
+        except OSError:
+            continue
+        # utime, stime, cutime, cstime
+        cpu_ticks += sum(int(value) for value in fields[11:15])
+        for line in status.splitlines():
+            if line.startswith("VmHWM:"):
+                peak_rss += int(line.split()[1]) * 1024
+    return {"cpu_seconds": cpu_ticks / CLOCK_TICKS, "peak_rss_bytes": peak_rss}
+
+
+class LocalServer:
+    """Starts the app with uvicorn on a local port and waits until it is ready."""
+
+    def __init__(self, port: int, env: Optional[dict] = None) -> None:
+        self.port = port
+        self.env = env
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def __aenter__(self) -> "LocalServer":
+        self.process = subprocess.Popen(
+            [
+                sys.executable,
+                "-m",
+                "uvicorn",
+                "insperion_api.main:app",
+                "--port",
+                str(self.port),
+                "--log-level",
+                "warning",
+            ],
+            env={**os.environ, **(self.env or {})},
+        )
+        await wait_until_ready(self.base_url)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        self.process.send_signal(signal.SIGINT)
+        try:
+            await asyncio.to_thread(self.process.wait, 30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+
+
+async def wait_until_ready(base_url: str, timeout: float = 600) -> None:
+    """Polls /health/ready until the models are loaded and warmed up."""
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get("/health/ready")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"{base_url} did not become ready in {timeout:.0f}s")
+
+
+async def receive_result(client: WebSocketClient) -> bool:
+    """
+    Waits for the answer to the last frame sent: True for its result, False
+    if the server shed it. Control messages (JSON objects with a ``type``,
+    such as the binary format's class names or admission throttling) are
+    not results and are skipped.
+    """
+    while True:
+        message = await client.receive()
+        if isinstance(message, bytes):
+            return True
+        payload = json.loads(message)
+        if "type" not in payload:
+            return True
+        if payload["type"] == "throttle" and payload.get("dropped"):
+            return False
+
+
+async def run_client(
+    url: str, frames: list[bytes], count: int
+) -> tuple[list[float], int]:
+    """
+    One camera: sends ``count`` frames closed-loop (the next frame only once
+    the previous one was answered) and returns the per-frame latencies and
+    the number of frames the server shed.
+    """
+    client = await WebSocketClient.connect(url)
+    latencies, shed = [], 0
+    try:
+        if "format=binary" in url:
+            # The class names, sent once before the first result
+            await client.receive()
+        for index in range(count):
+            start = time.perf_counter()
+            await client.send_bytes(frames[index % len(frames)])
+            if await receive_result(client):
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                shed += 1
+    finally:
+        await client.close()
+    return latencies, shed
+
+
+async def run_load(
+    base_url: str,
+    resolution: str,
+    clients: int,
+    frames_per_client: int,
+    query: str = "",
+    server_pid: Optional[int] = None,
+) -> dict:
+    """
+    Drives ``clients`` concurrent inspect sockets and reports latency
+    percentiles, throughput and, when the server pid is known, frames per
+    CPU-second (frames/sec/core) and peak RSS of the server processes.
+    """
+    frames = jpeg_frames(resolution)
+    ws_url = (
+        base_url.replace("http", "ws", 1)
+        + "/v1/inspect"
+        + (f"?{query}" if query else "")
+    )
+
+    usage_before = server_usage(server_pid) if server_pid else None
+    start = time.perf_counter()
+    per_client = await asyncio.gather(
+        *(run_client(ws_url, frames, frames_per_client) for _ in range(clients))
+    )
+    elapsed = time.perf_counter() - start
+
+    latencies = [latency for client, _ in per_client for latency in client]
+    results = {
+        "resolution": resolution,
+        "clients": clients,
+        "frames_per_client": frames_per_client,
+        "query": query,
+        "elapsed_s": round(elapsed, 3),
+        "frames_per_second": round(len(latencies) / elapsed, 2),
+        "shed_frames": sum(shed for _, shed in per_client),
+        "latency": latency_summary(latencies),
+    }
+    if server_pid:
+        usage = server_usage(server_pid)
+        cpu_seconds = usage["cpu_seconds"] - usage_before["cpu_seconds"]
+        results["server_cpu_seconds"] = round(cpu_seconds, 3)
+        results["frames_per_second_per_core"] = (
+            round(len(latencies) / cpu_seconds, 2) if cpu_seconds > 0 else None
+        )
+        results["server_peak_rss_mb"] = round(usage["peak_rss_bytes"] / 1024 / 1024, 1)
+    return results
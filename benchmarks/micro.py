@@ -0,0 +1,68 @@
+import time
+from typing import Callable
+
+import numpy as np
+
+from benchmarks.frames import RESOLUTIONS, jpeg_frames
+from benchmarks.report import latency_summary
+
+
+def time_calls(call: Callable[[], object], iterations: int, warmup: int = 3) -> dict:
+    """Latency summary of ``iterations`` calls after ``warmup`` untimed ones."""
+    for _ in range(warmup):
+        call()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - start) * 1000)
+    return latency_summary(samples)
+
+
+def synthetic_detections(count: int, names: dict[int, str], width: int, height: int):
+    """``count`` random boxes, to time formatting independently of the scene."""
+    from insperion_api.modules.inspection.detections import Detections
+
+    rng = np.random.default_rng(0)
+    top_left = rng.uniform(0, 0.8, (count, 2)) * (width, height)
+    size = rng.uniform(0.02, 0.2, (count, 2)) * (width, height)
+    return Detections(
+        np.hstack((top_left, top_left + size)).astype(np.float32),
+        rng.uniform(0.25, 1.0, count).astype(np.float32),
+        rng.choice(list(names), count).astype(np.int32),
+    )
+
+
+def run_micro(resolutions: list[str], iterations: int, format_boxes: int = 100) -> dict:
+    """
+    Times the three steps of ``InspectionController`` in-process, per
+    resolution: ``_decode_image``, ``_run_inference_sync`` (on the decoded
+    frame) and ``_format_results`` (on ``format_boxes`` synthetic boxes).
+    """
+    from insperion_api.core.controllers.inspection_controller import (
+        InspectionController,
+    )
+    from insperion_api.modules.inspection.model_registry import model_registry
+
+    model_registry.load_all()
+    # Only inference is exercised, no session is ever bound to the database
+    controller = InspectionController(inspection_config=None, db_engine=None)
+
+    results = {}
+    for resolution in resolutions:
+        width, height = RESOLUTIONS[resolution]
+        data = jpeg_frames(resolution, count=1)[0]
+        frame = controller._decode_image(data)
+        detections = synthetic_detections(format_boxes, controller.names, width, height)
+        results[resolution] = {
+            "jpeg_bytes": len(data),
+            "decoded_shape": list(frame.image.shape),
+            "decode": time_calls(lambda: controller._decode_image(data), iterations),
+            "inference": time_calls(
+                lambda: controller._run_inference_sync(frame.image), iterations
+            ),
+            "format": time_calls(
+                lambda: controller._format_results(detections), iterations
+            ),
+        }
+    return results
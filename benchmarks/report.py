@@ -0,0 +1,78 @@
+import json
+import os
+import platform
+import subprocess
+import time
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def latency_summary(samples_ms: list[float]) -> dict:
+    """Count, mean and p50/p95/p99 of latency samples in milliseconds."""
+    if not samples_ms:
+        return {"count": 0}
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    p50, p95, p99 = np.percentile(samples, [50, 95, 99])
+    return {
+        "count": int(samples.size),
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(samples.max()), 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    """What a run has to be compared against: code, machine and settings."""
+    from insperion_api.settings.config import settings
+
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "settings": {
+            "inference_backend": settings.inference_backend,
+            "onnx_quantization": settings.onnx_quantization,
+            "inference_engine_mode": settings.inference_engine_mode,
+            "inference_batching": settings.inference_batching,
+            "image_decoder": settings.image_decoder,
+            "image_reduced_decode": settings.image_reduced_decode,
+            "yolo_image_size": settings.yolo_image_size,
+        },
+    }
+
+
+def write_results(kind: str, results: dict, output: Optional[Path] = None) -> Path:
+    """Writes a run as JSON, by default under benchmarks/results/."""
+    document = {
+        "kind": kind,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": environment(),
+        "results": results,
+    }
+    if output is None:
+        commit = (document["environment"]["commit"] or "unknown")[:8]
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        output = RESULTS_DIR / f"{kind}-{stamp}-{commit}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(document, indent=2))
+    return output
@@ -0,0 +1,95 @@
+import asyncio
+from collections import deque
+from typing import Optional, Union
+from urllib.parse import urlsplit
+
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (
+    AcceptConnection,
+    BytesMessage,
+    CloseConnection,
+    Ping,
+    RejectConnection,
+    Request,
+    TextMessage,
+)
+
+
+class WebSocketClient:
+    """
+    Minimal asyncio WebSocket client on top of wsproto (already a dependency
+    of the app), enough to drive the inspection endpoint.
+    """
+
+    def __init__(
+        self,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        connection: WSConnection,
+    ) -> None:
+        self._reader = reader
+        self._writer = writer
+        self._connection = connection
+        self._events: deque = deque()
+        self.subprotocol: Optional[str] = None
+
+    @classmethod
+    async def connect(
+        cls, url: str, subprotocols: tuple[str, ...] = ()
+    ) -> "WebSocketClient":
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or 80
+        reader, writer = await asyncio.open_connection(host, port)
+        client = cls(reader, writer, WSConnection(ConnectionType.CLIENT))
+
+        target = parts.path + (f"?{parts.query}" if parts.query else "")
+        await client._send(
+            Request(
+                host=f"{host}:{port}", target=target, subprotocols=list(subprotocols)
+            )
+        )
+        event = await client._next_event()
+        if isinstance(event, RejectConnection):
+            raise ConnectionError(f"WebSocket rejected with HTTP {event.status_code}")
+        if not isinstance(event, AcceptConnection):
+            raise ConnectionError(f"Unexpected handshake event: {event!r}")
+        client.subprotocol = event.subprotocol
+        return client
+
+    async def _send(self, event) -> None:
+        self._writer.write(self._connection.send(event))
+        await self._writer.drain()
+
+    async def _next_event(self):
+        while not self._events:
+            data = await self._reader.read(1 << 16)
+            self._connection.receive_data(data or None)
+            self._events.extend(self._connection.events())
+            if not data and not self._events:
+                raise ConnectionError("Connection closed")
+        return self._events.popleft()
+
+    async def send_bytes(self, payload: bytes) -> None:
+        await self._send(BytesMessage(data=payload))
+
+    async def receive(self) -> Union[str, bytes]:
+        """The next complete text or binary message."""
+        parts: list = []
+        while True:
+            event = await self._next_event()
+            if isinstance(event, Ping):
+                await self._send(event.response())
+            elif isinstance(event, CloseConnection):
+                raise ConnectionError(f"Closed by server: {event.code} {event.reason}")
+            elif isinstance(event, (TextMessage, BytesMessage)):
+                parts.append(event.data)
+                if event.message_finished:
+                    joiner = "" if isinstance(event, TextMessage) else b""
+                    return joiner.join(parts)
+
+    async def close(self) -> None:
+        try:
+            await self._send(CloseConnection(code=1000))
+        except Exception:
+            pass
+        self._writer.close()
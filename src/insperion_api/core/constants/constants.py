@@ -8,3 +8,14 @@ class InspectionStatus(str, Enum):
     FAILED = "FAILED"
     CANCELLED = "CANCELLED"
     ON_HOLD = "ON_HOLD"
+
+
+class InspectionStreamMode(str, Enum):
+    SEQUENTIAL = "sequential"
+    LATEST = "latest"
+    PIPELINE = "pipeline"
+
+
+class InspectionResultFormat(str, Enum):
+    JSON = "json"
+    BINARY = "binary"
@@ -90,6 +90,29 @@ class ErrorResponse(Enum):
         error_type="RESOURCE_ERROR",
     )
 
+    # Inspection
+    MODEL_NOT_READY = ErrorDetail(
+        message="Inspection models are still loading",
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        error_type="SYSTEM_ERROR",
+    )
+    INSPECTION_NOT_FOUND = ErrorDetail(
+        message="Inspection with ID: {inspection_id} not found",
+        status_code=status.HTTP_404_NOT_FOUND,
+        error_type="RESOURCE_ERROR",
+    )
+    INSPECTION_TYPE_NOT_CONFIGURED = ErrorDetail(
+        "Inspection type '{inspection_type}' is not configured"
+    )
+    UNSUPPORTED_BATCH_UPLOAD = ErrorDetail(
+        message="Unsupported batch upload: {reason}",
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+    )
+    BATCH_UPLOAD_TOO_LARGE = ErrorDetail(
+        message="Batch upload too large: {reason}",
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    )
+
     # Rate limiting
     RATE_LIMIT_EXCEEDED = ErrorDetail(
         message="Rate limit exceeded",
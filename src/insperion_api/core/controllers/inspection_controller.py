@@ -1,12 +1,34 @@
 import asyncio
-import os
-from pathlib import Path
+import time
+from typing import Annotated, AsyncIterator, Optional
 
-import cv2
 import numpy as np
-from ultralytics.models.yolo import YOLO
+from fastapi import Depends
+from sqlalchemy.ext.asyncio import AsyncEngine
 
-from insperion_api.settings.config import settings
+from insperion_api.core.constants.error_response import ErrorResponse
+from insperion_api.core.models.vehicle import Inspection
+from insperion_api.modules.database_configs.inspection_config import InspectionConfig
+from insperion_api.modules.inspection.batch_scheduler import inference_scheduler
+from insperion_api.modules.inspection.decoding import (
+    DecodedFrame,
+    decode_executor,
+    frame_decoder,
+)
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.inspection_params import InspectionParams
+from insperion_api.modules.inspection.model_registry import model_registry
+from insperion_api.modules.inspection.postprocess import (
+    filter_detections,
+    format_detections,
+)
+from insperion_api.modules.inspection.process_pool import inference_pool
+from insperion_api.modules.inspection.result_cache import result_cache
+from insperion_api.modules.inspection.timings import FrameTimings
+from insperion_api.utils.common.custom_http_exception import CustomHTTPException
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.database.connections import get_async_engine
+from insperion_api.utils.database.session_context_manager import session_context
 
 
 class InspectionController:
@@ -14,66 +36,257 @@ class InspectionController:
     Encapsulates the YOLO model and all related processing logic.
     """
 
-    MODEL_PATH = Path(settings.yolo_model_path)
+    def __init__(
+        self,
+        inspection_config: Annotated[InspectionConfig, Depends()],
+        db_engine: Annotated[AsyncEngine, Depends(get_async_engine)],
+    ):
+        self.inspection_config = inspection_config
+        self.db_engine = db_engine
+        # Set once the session is bound to an inspection type (and row)
+        self.params: Optional[InspectionParams] = None
+        self.inspection: Optional[Inspection] = None
+        # What besides the frame bytes decides its detections, for the cache.
+        # Taken when the engine is picked and kept for the session, like the
+        # engine itself: weights replaced on disk are only served (and
+        # cached under their own version) by sessions binding afterwards
+        self.cache_scope: tuple = (model_registry.version(), None)
 
-    def __init__(self):
-        # Load the model once during initialization
-        if not self.MODEL_PATH.exists():
-            raise FileNotFoundError(
-                f"Model not found: {self.MODEL_PATH} {os.getcwd()}, {','.join(os.listdir(os.getcwd()))}"
-            )
-        self.model = YOLO(self.MODEL_PATH)
+        if inference_pool.running:
+            # The model lives in the inference processes, only names are needed
+            self.engine = None
+            self.names = inference_pool.names
+        else:
+            # Shared, already warmed-up engine owned by the process-wide registry
+            self.engine = model_registry.get()
+            self.names = self.engine.names
 
-    def _decode_image(self, data: bytes) -> np.ndarray:
-        """Decodes raw image bytes into an OpenCV image (frame)."""
-        img_np = np.frombuffer(data, np.uint8)
-        frame = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
-        return frame
+    async def bind(
+        self,
+        inspection_id: Optional[int] = None,
+        inspection_type: Optional[str] = None,
+    ) -> None:
+        """
+        Restricts inference to one inspection type, given directly or via
+        an ``Inspection`` row: only its classes, above its confidence and
+        inside its region of interest, as set in the ``inspection_types``
+        config.
+        """
+        if inspection_id is not None:
+            async with session_context(self.db_engine) as session:
+                inspection = await session.get(Inspection, inspection_id)
+            if inspection is None:
+                raise CustomHTTPException(
+                    ErrorResponse.INSPECTION_NOT_FOUND,
+                    details={"inspection_id": inspection_id},
+                ).to_http_exception()
+            self.inspection = inspection
+            inspection_type = inspection.inspection_type
+
+        if inspection_type is None:
+            return
+
+        inspection_types = await self.inspection_config.inspection_types
+        if inspection_type not in inspection_types:
+            raise CustomHTTPException(
+                ErrorResponse.INSPECTION_TYPE_NOT_CONFIGURED,
+                details={"inspection_type": inspection_type},
+            ).to_http_exception()
+        entry = inspection_types[inspection_type]
+
+        # A type runs on its own model when the config or YOLO_MODELS names one
+        model = entry.get("model")
+        if model is None and model_registry.has(inspection_type):
+            model = inspection_type
+        if inference_pool.running:
+            self.names = await inference_pool.model_names(model)
+        else:
+            self.engine = await model_registry.aget(model)
+            self.names = self.engine.names
+
+        self.params = InspectionParams.from_config(entry, self.names, model)
+        self.cache_scope = (model_registry.version(model), self.params)
+        logger.info(f"Inspection session bound to '{inspection_type}': {self.params}")
+
+    def _decode_image(self, data: bytes) -> DecodedFrame:
+        """
+        Decodes raw image bytes into an OpenCV image (frame), at a reduced
+        resolution when the image is much larger than the model input.
+        """
+        return frame_decoder.decode(data)
+
+    def _format_results(self, detections: Detections) -> dict:
+        """Formats the detection arrays into a serializable JSON dictionary."""
+        return format_detections(detections, self.names)
 
-    def _format_results(self, results) -> dict:
-        """Formats the raw YOLO results into a serializable JSON dictionary."""
-        detections = []
-        if results[0].boxes is not None:
-            for box in results[0].boxes:
-                # Get coordinates, class, and confidence
-                xyxy = box.xyxy[0].cpu().numpy()  # [x1, y1, x2, y2]
-                conf = box.conf[0].cpu().numpy()
-                cls_id = int(box.cls[0].cpu().numpy())
-
-                detections.append(
-                    {
-                        "class_id": cls_id,
-                        "class_name": self.model.names[cls_id],
-                        "confidence": float(conf),
-                        "box": [
-                            float(xyxy[0]),
-                            float(xyxy[1]),
-                            float(xyxy[2]),
-                            float(xyxy[3]),
-                        ],
-                    }
-                )
-        return {"detections": detections}
-
-    def _run_inference_sync(self, frame: np.ndarray):
+    def _run_inference_sync(self, frame: np.ndarray) -> Detections:
         """
         Synchronous (blocking) inference call.
         This is separated to be run in a thread pool.
         """
-        return self.model(frame, verbose=False)  # Run YOLO detection
+        return self.engine.predict([frame], self.params)[0]  # Run YOLO detection
+
+    async def decode(
+        self, data: bytes, timings: Optional[FrameTimings] = None
+    ) -> DecodedFrame:
+        """Decodes a frame on the dedicated decode executor, off the event loop."""
+        start = time.perf_counter()
+        frame = await asyncio.get_running_loop().run_in_executor(
+            decode_executor, self._decode_image, data
+        )
+        (timings or FrameTimings()).since("decode", start)
+        return frame
 
-    async def inspect(self, data: bytes) -> dict:
+    def _timed_inference(
+        self, frame: np.ndarray, timings: FrameTimings, queued: float
+    ) -> Detections:
+        timings.since("queue", queued)
+        start = time.perf_counter()
+        detections = self._run_inference_sync(frame)
+        timings.since("inference", start)
+        return detections
+
+    async def detect(
+        self, frame: DecodedFrame, timings: Optional[FrameTimings] = None
+    ) -> Detections:
+        """
+        Runs Inference off the main async event loop: in a dedicated
+        inference process, batched with frames from other sockets, or in a
+        separate thread on its own. A bound session only infers its region
+        of interest. The confidence floor and top-k cap are applied before
+        anything is serialized, and boxes are mapped back to the original
+        image size.
+        """
+        image, offset = frame.image, (0, 0)
+        if self.params is not None:
+            image, offset = self.params.crop(image)
+
+        timings = timings or FrameTimings()
+        if inference_pool.running:
+            detections = await inference_pool.submit(image, self.params, timings)
+        elif inference_scheduler.running:
+            detections = await inference_scheduler.submit(image, self.params, timings)
+        else:
+            detections = await asyncio.to_thread(
+                self._timed_inference, image, timings, time.perf_counter()
+            )
+        return filter_detections(detections).shifted(offset).scaled(frame.scale)
+
+    def cached(
+        self, data: bytes, timings: FrameTimings
+    ) -> tuple[Optional[Detections], Optional[tuple]]:
+        """
+        Looks an image up in the result cache: its detections if the same
+        bytes were inferred before with this model and parameters, and the
+        key to ``result_cache.put`` them under otherwise.
+        """
+        if not result_cache.enabled:
+            return None, None
+        start = time.perf_counter()
+        cache_key = result_cache.key(data, self.cache_scope)
+        cached = result_cache.get(cache_key)
+        timings.since("cache", start)
+        return cached, cache_key
+
+    async def analyze(
+        self, data: bytes, timings: Optional[FrameTimings] = None
+    ) -> Detections:
+        """
+        Decodes and infers a single image, returning the raw detection
+        arrays so callers can pick their own serialization. Images seen
+        before (same bytes, model and parameters) are answered from the
+        result cache without decoding or inference.
+        """
+        timings = timings or FrameTimings()
+        cached, cache_key = self.cached(data, timings)
+        if cached is not None:
+            return cached
+
+        # 1. Decode Image (off the event loop)
+        frame = await self.decode(data, timings)
+
+        # 2. Run Inference
+        detections = await self.detect(frame, timings)
+        if cache_key is not None:
+            result_cache.put(cache_key, detections)
+        return detections
+
+    async def inspect(
+        self, data: bytes, timings: Optional[FrameTimings] = None
+    ) -> dict:
         """
         The main async processing pipeline for a single image.
         """
-        # 1. Decode Image
-        frame = self._decode_image(data)
+        timings = timings or FrameTimings()
 
-        # 2. Run Inference in a separate thread to avoid blocking
-        #    the main async event loop.
-        results = await asyncio.to_thread(self._run_inference_sync, frame)
+        # 1-2. Decode Image and Run Inference
+        detections = await self.analyze(data, timings)
 
         # 3. Format Results
-        detections_json = self._format_results(results)
+        start = time.perf_counter()
+        detections_json = self._format_results(detections)
+        timings.since("format", start)
 
         return detections_json
+
+    async def inspect_batch(
+        self, images: AsyncIterator[tuple[str, bytes]], concurrency: int
+    ) -> AsyncIterator[dict]:
+        """
+        Inspects a stream of (name, image bytes) with up to ``concurrency``
+        images in flight, so they are decoded in parallel and batched or
+        spread over the inference processes like socket frames. Reading
+        pauses while all slots are busy, which bounds memory. Results are
+        yielded as soon as each image is done, tagged with its index.
+        """
+        results: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max(1, concurrency))
+        tasks: set[asyncio.Task] = set()
+
+        async def run(index: int, name: str, data: bytes) -> None:
+            try:
+                result = {"index": index, "filename": name, **await self.inspect(data)}
+            except Exception as exc:
+                logger.warning(f"Batch inspection of {name} failed: {exc}")
+                result = {"index": index, "filename": name, "error": str(exc)}
+            finally:
+                slots.release()
+            results.put_nowait(result)
+
+        async def read() -> int:
+            index = 0
+            async for name, data in images:
+                await slots.acquire()
+                task = asyncio.create_task(run(index, name, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+                index += 1
+            return index
+
+        reader = asyncio.create_task(read())
+        received = 0
+        try:
+            while True:
+                if reader.done():
+                    if reader.exception() is not None:
+                        # A malformed upload: report it after what was inspected
+                        await asyncio.gather(*tasks, return_exceptions=True)
+                        while not results.empty():
+                            yield results.get_nowait()
+                        yield {"error": str(reader.exception())}
+                        return
+                    if received == reader.result():
+                        return
+
+                getter = asyncio.ensure_future(results.get())
+                waiting = {getter} if reader.done() else {getter, reader}
+                await asyncio.wait(waiting, return_when=asyncio.FIRST_COMPLETED)
+                if getter.done():
+                    received += 1
+                    yield getter.result()
+                else:
+                    getter.cancel()
+        finally:
+            reader.cancel()
+            for task in tasks:
+                task.cancel()
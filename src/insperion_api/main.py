@@ -1,3 +1,7 @@
+import asyncio
+import sys
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,24 +9,102 @@ from fastapi.responses import JSONResponse, RedirectResponse
 from pydantic import ValidationError
 
 from insperion_api.core.constants.error_response import ErrorResponse
+from insperion_api.modules.inspection.batch_scheduler import inference_scheduler
+from insperion_api.modules.inspection.decoding import decode_executor
+from insperion_api.modules.inspection.frame_archiver import frame_archiver
+from insperion_api.modules.inspection.model_registry import model_registry
+from insperion_api.modules.inspection.process_pool import inference_pool
+from insperion_api.modules.inspection.results_writer import results_writer
 from insperion_api.routers.developer.config import config_router
+from insperion_api.routers.health import health_router
 from insperion_api.routers.inspection import inspection_router
+from insperion_api.routers.metrics import metrics_router
 from insperion_api.routers.vehicle import vehicle_router
 from insperion_api.routers.vehicles.brand import brand_router
 from insperion_api.routers.vehicles.model import model_router
 from insperion_api.routers.vehicles.variant import variant_router
 from insperion_api.settings.config import settings
+from insperion_api.utils.common.cpu_topology import applied_thread_plan
+from insperion_api.utils.common.executors import MonitoredThreadPoolExecutor
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.loop_monitor import loop_lag_monitor
+from insperion_api.utils.common.memory import (
+    describe_memory,
+    memory_breakdown,
+    process_age_seconds,
+)
+from insperion_api.utils.common.metrics import metrics
 from insperion_api.utils.common.pydantic_error_parser import build_error_response
 
 description = """
 Insperion API
 """
 
+
+def forking_workers() -> bool:
+    """
+    Whether the app is being imported by the gunicorn master to fork its
+    workers from (``--preload``). Workers importing it themselves have
+    applied their thread plan by then, and uvicorn alone never loads the
+    arbiter.
+    """
+    return "gunicorn.arbiter" in sys.modules and applied_thread_plan() is None
+
+
+def report_worker_boot() -> None:
+    """
+    Logs and exposes how long this worker took to become ready and how much
+    of its memory is shared (e.g. weights preloaded before the fork).
+    """
+    boot_seconds = process_age_seconds()
+    metrics.gauge("worker.boot_seconds", lambda: boot_seconds)
+    for part in memory_breakdown():
+        metrics.gauge(
+            f"worker.{part}_mb",
+            lambda part=part: round(memory_breakdown()[part] / 1024 / 1024, 1),
+        )
+    logger.info(
+        f"Worker ready in {boot_seconds or 0:.1f}s "
+        f"({describe_memory(memory_breakdown())})"
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # asyncio.to_thread (unbatched inference, model loading) runs here
+    default_executor = MonitoredThreadPoolExecutor("default")
+    asyncio.get_running_loop().set_default_executor(default_executor)
+
+    # Load and warm up the inspection models once per worker (or once per
+    # inference process) before serving
+    if settings.inference_engine_mode == "process":
+        await inference_pool.start()
+    else:
+        await model_registry.startup()
+        if settings.inference_batching:
+            await inference_scheduler.start()
+    await results_writer.start()
+    if settings.frame_archive_enabled:
+        await frame_archiver.start()
+    await loop_lag_monitor.start()
+    report_worker_boot()
+    yield
+    await loop_lag_monitor.stop()
+    # Open sockets are closed by now; write what their sessions left buffered
+    await results_writer.stop()
+    await frame_archiver.stop(settings.frame_archive_drain_timeout_s)
+    await inference_scheduler.stop()
+    await inference_pool.stop()
+    decode_executor.shutdown(wait=False)
+    default_executor.shutdown(wait=False)
+
+
 app = FastAPI(
     title="Insperion API",
     description=description,
     version="0.0.1",
     responses={404: {"description": "Not found"}},
+    lifespan=lifespan,
 )
 
 
@@ -76,3 +158,13 @@ app.include_router(variant_router)
 app.include_router(vehicle_router)
 app.include_router(inspection_router)
 app.include_router(config_router)
+app.include_router(health_router)
+app.include_router(metrics_router)
+
+# Runs once in the gunicorn master with --preload, before the workers fork
+if (
+    settings.yolo_preload_before_fork
+    and settings.inference_engine_mode != "process"
+    and forking_workers()
+):
+    model_registry.preload()
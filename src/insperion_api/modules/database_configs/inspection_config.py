@@ -27,3 +27,7 @@ class InspectionConfig:
     @property
     async def flows(self):
         return await self._get_value("flows")
+
+    @property
+    async def inspection_types(self):
+        return await self._get_value("inspection_types")
@@ -0,0 +1,132 @@
+import time
+from collections import deque
+from typing import Optional
+
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+# WebSocket close code for "Try Again Later" (RFC 6455 registry)
+WS_CLOSE_TRY_AGAIN_LATER = 1013
+
+# Window over which the worker's frame throughput is measured
+THROUGHPUT_WINDOW_S = 5.0
+# Minimum delay between two throttle hints to the same session
+THROTTLE_HINT_INTERVAL_S = 1.0
+
+sessions_rejected = metrics.counter("admission.sessions_rejected")
+frames_shed = metrics.counter("admission.frames_shed")
+
+
+class AdmissionController:
+    """
+    Per-worker budget of concurrent inspection sessions and frames in
+    flight (received and not answered yet), so an overloaded worker sheds
+    load instead of slowing every camera down at once.
+
+    New sessions over ``max_sessions`` are turned away with a retry-after
+    hint, so the load balancer can place them on another node. Frames over
+    ``max_in_flight`` are dropped without being inferred, and once in-flight
+    frames pass ``throttle_ratio`` of the budget sessions are told the frame
+    rate this worker can sustain for them. A limit of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int,
+        max_in_flight: int,
+        throttle_ratio: float,
+        retry_after_s: int,
+    ) -> None:
+        self.max_sessions = max_sessions
+        self.max_in_flight = max_in_flight
+        self.throttle_ratio = throttle_ratio
+        self.retry_after_s = retry_after_s
+        self.sessions = 0
+        self.in_flight = 0
+        self._completed: deque[float] = deque()
+
+    def open_session(self) -> bool:
+        """Admits a new session, unless the worker already holds its maximum."""
+        if self.max_sessions and self.sessions >= self.max_sessions:
+            sessions_rejected.inc()
+            return False
+        self.sessions += 1
+        return True
+
+    def close_session(self) -> None:
+        self.sessions = max(0, self.sessions - 1)
+
+    def acquire_frame(self) -> bool:
+        """Takes an in-flight slot for a frame; False means shed the frame."""
+        if self.max_in_flight and self.in_flight >= self.max_in_flight:
+            frames_shed.inc()
+            return False
+        self.in_flight += 1
+        return True
+
+    def release_frame(self, completed: bool = True) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        if completed:
+            self._completed.append(time.monotonic())
+            self._prune()
+
+    def _prune(self) -> None:
+        horizon = time.monotonic() - THROUGHPUT_WINDOW_S
+        while self._completed and self._completed[0] < horizon:
+            self._completed.popleft()
+
+    @property
+    def overloaded(self) -> bool:
+        """Whether sessions should be asked to lower their frame rate."""
+        return bool(self.max_in_flight) and (
+            self.in_flight >= self.throttle_ratio * self.max_in_flight
+        )
+
+    def throughput(self) -> float:
+        """Frames answered per second over the last few seconds."""
+        self._prune()
+        return len(self._completed) / THROUGHPUT_WINDOW_S
+
+    def fair_fps(self) -> Optional[float]:
+        """This worker's throughput shared equally between its sessions."""
+        throughput = self.throughput()
+        if throughput == 0:
+            return None
+        return round(throughput / max(1, self.sessions), 1)
+
+    def throttle_message(self, dropped: bool = False) -> dict:
+        """Text message asking a session to slow down (or that a frame was shed)."""
+        message = {"type": "throttle", "dropped": dropped, "max_fps": self.fair_fps()}
+        if dropped:
+            message["retry_after_ms"] = self._retry_after_ms()
+        return message
+
+    def _retry_after_ms(self) -> int:
+        throughput = self.throughput()
+        if throughput == 0:
+            return self.retry_after_s * 1000
+        # Roughly how long the frames already in flight take to drain
+        return round(self.in_flight / throughput * 1000)
+
+    def rejection_reason(self) -> str:
+        """Close reason for a rejected session (at most 123 bytes)."""
+        return f"Server overloaded, retry after {self.retry_after_s}s"
+
+    def status(self) -> dict:
+        return {
+            "sessions": self.sessions,
+            "max_sessions": self.max_sessions,
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "throughput_fps": round(self.throughput(), 2),
+        }
+
+
+admission_controller = AdmissionController(
+    max_sessions=settings.admission_max_sessions,
+    max_in_flight=settings.admission_max_in_flight_frames,
+    throttle_ratio=settings.admission_throttle_ratio,
+    retry_after_s=settings.admission_retry_after_s,
+)
+metrics.gauge("admission.sessions", lambda: admission_controller.sessions)
+metrics.gauge("admission.in_flight", lambda: admission_controller.in_flight)
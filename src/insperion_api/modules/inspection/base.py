@@ -1,12 +1,14 @@
 import asyncio
-import os
-from pathlib import Path
 
 import cv2
 import numpy as np
-from ultralytics.models.yolo import YOLO
 
-from insperion_api.settings.config import settings
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.model_registry import model_registry
+from insperion_api.modules.inspection.postprocess import (
+    filter_detections,
+    format_detections,
+)
 
 
 class Inspection:
@@ -14,15 +16,9 @@ class Inspection:
     Encapsulates the YOLO model and all related processing logic.
     """
 
-    MODEL_PATH = Path(settings.yolo_model_path)
-
     def __init__(self):
-        # Load the model once during initialization
-        if not self.MODEL_PATH.exists():
-            raise FileNotFoundError(
-                f"Model not found: {self.MODEL_PATH} {os.getcwd()}, {','.join(os.listdir(os.getcwd()))}"
-            )
-        self.model = YOLO(self.MODEL_PATH)
+        # Shared, already warmed-up engine owned by the process-wide registry
+        self.engine = model_registry.get()
 
     def _decode_image(self, data: bytes) -> np.ndarray:
         """Decodes raw image bytes into an OpenCV image (frame)."""
@@ -30,37 +26,16 @@ class Inspection:
         frame = cv2.imdecode(img_np, cv2.IMREAD_COLOR)
         return frame
 
-    def _format_results(self, results) -> dict:
-        """Formats the raw YOLO results into a serializable JSON dictionary."""
-        detections = []
-        if results[0].boxes is not None:
-            for box in results[0].boxes:
-                # Get coordinates, class, and confidence
-                xyxy = box.xyxy[0].cpu().numpy()  # [x1, y1, x2, y2]
-                conf = box.conf[0].cpu().numpy()
-                cls_id = int(box.cls[0].cpu().numpy())
-
-                detections.append(
-                    {
-                        "class_id": cls_id,
-                        "class_name": self.model.names[cls_id],
-                        "confidence": float(conf),
-                        "box": [
-                            float(xyxy[0]),
-                            float(xyxy[1]),
-                            float(xyxy[2]),
-                            float(xyxy[3]),
-                        ],
-                    }
-                )
-        return {"detections": detections}
+    def _format_results(self, detections: Detections) -> dict:
+        """Formats the detection arrays into a serializable JSON dictionary."""
+        return format_detections(filter_detections(detections), self.engine.names)
 
-    def _run_inference_sync(self, frame: np.ndarray):
+    def _run_inference_sync(self, frame: np.ndarray) -> Detections:
         """
         Synchronous (blocking) inference call.
         This is separated to be run in a thread pool.
         """
-        return self.model(frame, verbose=False)  # Run YOLO detection
+        return self.engine.predict([frame])[0]  # Run YOLO detection
 
     async def inspect(self, data: bytes) -> dict:
         """
@@ -71,9 +46,9 @@ class Inspection:
 
         # 2. Run Inference in a separate thread to avoid blocking
         #    the main async event loop.
-        results = await asyncio.to_thread(self._run_inference_sync, frame)
+        detections = await asyncio.to_thread(self._run_inference_sync, frame)
 
         # 3. Format Results
-        detections_json = self._format_results(results)
+        detections_json = self._format_results(detections)
 
         return detections_json
@@ -0,0 +1,159 @@
+import asyncio
+import time
+from typing import Optional
+
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.inspection_params import InspectionParams
+from insperion_api.modules.inspection.model_registry import model_registry
+from insperion_api.modules.inspection.timings import FrameTimings
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.metrics import metrics
+
+# A frame waiting in the queue: frame, params, future, timings, queued at
+QueuedFrame = tuple[
+    np.ndarray, Optional[InspectionParams], asyncio.Future, FrameTimings, float
+]
+
+
+class InferenceScheduler:
+    """
+    Collects frames from every open inspection socket into micro-batches and
+    runs a single batched forward pass per batch.
+
+    A batch is closed as soon as it holds ``max_batch_size`` frames or
+    ``max_wait_ms`` has passed since its first frame arrived, whichever
+    comes first. Each caller awaits its own future and gets back only the
+    result for the frame it submitted. Frames submitted with different
+    inspection parameters (and so possibly models) are inferred in separate
+    forward passes.
+    """
+
+    def __init__(self, max_batch_size: int, max_wait_ms: float) -> None:
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def queue_depth(self) -> int:
+        """Frames waiting for a batch."""
+        return 0 if self._queue is None else self._queue.qsize()
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Inference scheduler started (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:g})"
+        )
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Fail whatever is still waiting so no socket hangs on shutdown
+        while self._queue is not None and not self._queue.empty():
+            future = self._queue.get_nowait()[2]
+            if not future.done():
+                future.set_exception(RuntimeError("Inference scheduler stopped"))
+
+    async def submit(
+        self,
+        frame: np.ndarray,
+        params: Optional[InspectionParams] = None,
+        timings: Optional[FrameTimings] = None,
+    ) -> Detections:
+        """
+        Queues a frame for the next batch and waits for its result. The
+        time until its batch runs is recorded as the ``queue`` stage, the
+        batch's forward pass as ``inference``.
+        """
+        if not self.running:
+            raise RuntimeError("Inference scheduler is not running")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put(
+            (frame, params, future, timings or FrameTimings(), time.perf_counter())
+        )
+        return await future
+
+    async def _collect_batch(self) -> list[QueuedFrame]:
+        loop = asyncio.get_running_loop()
+
+        # Block until the first frame arrives, then open the batch window
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        # Drop frames whose callers already went away
+        return [item for item in batch if not item[2].done()]
+
+    def _run_batch_sync(
+        self, frames: list[np.ndarray], params: Optional[InspectionParams]
+    ) -> list[Detections]:
+        """Synchronous (blocking) batched inference call."""
+        engine = model_registry.get(None if params is None else params.model)
+        return engine.predict(frames, params)
+
+    async def _run_group(
+        self, params: Optional[InspectionParams], group: list[QueuedFrame]
+    ) -> None:
+        start = time.perf_counter()
+        frames = [item[0] for item in group]
+        for _, _, _, timings, queued in group:
+            timings.since("queue", queued)
+        try:
+            results = await asyncio.to_thread(self._run_batch_sync, frames, params)
+        except Exception as exc:
+            logger.error(f"Batched inference failed: {exc}")
+            for _, _, future, _, _ in group:
+                if not future.done():
+                    future.set_exception(exc)
+            return
+
+        for (_, _, future, timings, _), result in zip(group, results):
+            timings.since("inference", start)
+            if not future.done():
+                future.set_result(result)
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect_batch()
+            if not batch:
+                continue
+
+            # One forward pass per distinct set of inspection parameters
+            groups: dict[Optional[InspectionParams], list[QueuedFrame]] = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+            for params, group in groups.items():
+                await self._run_group(params, group)
+
+
+inference_scheduler = InferenceScheduler(
+    max_batch_size=settings.inference_max_batch_size,
+    max_wait_ms=settings.inference_max_batch_wait_ms,
+)
+metrics.gauge(
+    "inspection.scheduler.queue_depth", lambda: inference_scheduler.queue_depth
+)
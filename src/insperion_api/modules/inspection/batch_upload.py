@@ -0,0 +1,264 @@
+"""
+Streaming readers for batch inspection uploads: a ``multipart/form-data``
+body (image parts, or zip archives of images), a bare zip archive or a
+single image. Images are handed out one at a time as the body is read, so
+memory stays bounded by one image per reader whatever the upload size.
+Zip archives are spooled to disk, up to a maximum size and entry count.
+"""
+
+import asyncio
+import re
+import zipfile
+from pathlib import PurePosixPath
+from tempfile import SpooledTemporaryFile
+from typing import AsyncIterator, Optional
+
+from fastapi import Request
+
+from insperion_api.settings.config import settings
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp", ".tif", ".tiff"}
+ZIP_CONTENT_TYPES = {"application/zip", "application/x-zip-compressed"}
+# Zip archives need random access: kept in memory up to this size, then on disk
+ZIP_SPOOL_BYTES = 8 * 1024 * 1024
+
+BOUNDARY_PATTERN = re.compile(r'boundary="?([^";]+)"?')
+FILENAME_PATTERN = re.compile(r'filename="([^"]*)"')
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class BatchUploadError(ValueError):
+    """The upload is malformed or holds something other than images."""
+
+
+class BatchUploadTooLarge(BatchUploadError):
+    """A zip archive over the maximum size or number of entries."""
+
+
+class _ChunkBuffer:
+    """Accumulates body chunks and reads up to delimiters from them."""
+
+    def __init__(self, chunks: AsyncIterator[bytes]) -> None:
+        self._chunks = chunks
+        self.data = bytearray()
+        self.exhausted = False
+
+    async def fill(self) -> bool:
+        """Reads one more chunk; False once the body is exhausted."""
+        if self.exhausted:
+            return False
+        try:
+            chunk = await anext(self._chunks)
+        except StopAsyncIteration:
+            self.exhausted = True
+            return False
+        self.data += chunk
+        return True
+
+    async def read_until(self, delimiter: bytes, limit: int) -> Optional[bytes]:
+        """
+        Returns everything before ``delimiter`` and consumes both, or None
+        if the body ends first. Fails past ``limit`` bytes.
+        """
+        searched = 0
+        while (index := self.data.find(delimiter, searched)) < 0:
+            if len(self.data) > limit + len(delimiter):
+                raise BatchUploadError(f"Multipart headers over {limit} bytes")
+            searched = max(0, len(self.data) - len(delimiter) + 1)
+            if not await self.fill():
+                return None
+        part = bytes(self.data[:index])
+        del self.data[: index + len(delimiter)]
+        return part
+
+    async def read_exactly(self, size: int) -> Optional[bytes]:
+        while len(self.data) < size:
+            if not await self.fill():
+                return None
+        part = bytes(self.data[:size])
+        del self.data[:size]
+        return part
+
+    async def stream_until(self, delimiter: bytes) -> AsyncIterator[bytes]:
+        """
+        Yields everything before ``delimiter`` chunk by chunk and consumes
+        the delimiter, holding back just enough bytes to find it across
+        chunk boundaries.
+        """
+        keep = len(delimiter) - 1
+        while (index := self.data.find(delimiter)) < 0:
+            if len(self.data) > keep:
+                yield bytes(self.data[:-keep])
+                del self.data[:-keep]
+            if not await self.fill():
+                raise BatchUploadError("Truncated multipart body")
+        if index:
+            yield bytes(self.data[:index])
+        del self.data[: index + len(delimiter)]
+
+
+def _parse_headers(raw: bytes) -> dict[str, str]:
+    headers = {}
+    for line in raw.decode("latin-1").split("\r\n"):
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return headers
+
+
+async def iter_multipart(
+    chunks: AsyncIterator[bytes], boundary: str
+) -> AsyncIterator[tuple[dict[str, str], AsyncIterator[bytes]]]:
+    """
+    Yields the headers and the streamed body of each part of a multipart
+    body. Whatever the caller leaves of a body is skipped.
+    """
+    buffer = _ChunkBuffer(chunks)
+    delimiter = b"--" + boundary.encode("latin-1")
+    async for _ in buffer.stream_until(delimiter):
+        pass  # Preamble
+
+    while True:
+        ending = await buffer.read_exactly(2)
+        if ending == b"--":
+            return
+        if ending != b"\r\n":
+            raise BatchUploadError("Malformed multipart body")
+        raw_headers = await buffer.read_until(b"\r\n\r\n", MAX_HEADER_BYTES)
+        if raw_headers is None:
+            raise BatchUploadError("Truncated multipart body")
+        body = buffer.stream_until(b"\r\n" + delimiter)
+        yield _parse_headers(raw_headers), body
+        async for _ in body:
+            pass
+
+
+async def _read_image(chunks: AsyncIterator[bytes], max_image_bytes: int) -> bytes:
+    data = bytearray()
+    async for chunk in chunks:
+        data += chunk
+        if len(data) > max_image_bytes:
+            raise BatchUploadError(f"Image larger than {max_image_bytes} bytes")
+    return bytes(data)
+
+
+def _is_image(name: str) -> bool:
+    return PurePosixPath(name).suffix.lower() in IMAGE_EXTENSIONS
+
+
+def _is_zip(name: str, content_type: str) -> bool:
+    return content_type in ZIP_CONTENT_TYPES or name.lower().endswith(".zip")
+
+
+def open_zip(archive: SpooledTemporaryFile, max_entries: int) -> zipfile.ZipFile:
+    """Opens a spooled zip archive, refusing one with over ``max_entries``."""
+    try:
+        zip_file = zipfile.ZipFile(archive)
+    except zipfile.BadZipFile as exc:
+        raise BatchUploadError(f"Invalid zip archive: {exc}") from exc
+    if len(zip_file.infolist()) > max_entries:
+        zip_file.close()
+        raise BatchUploadTooLarge(f"Zip archive with over {max_entries} entries")
+    return zip_file
+
+
+async def iter_zip_images(
+    zip_file: zipfile.ZipFile, max_image_bytes: int
+) -> AsyncIterator[tuple[str, bytes]]:
+    """Yields (name, bytes) of every image in a zip archive, in archive order."""
+    with zip_file:
+        for info in zip_file.infolist():
+            if info.is_dir() or not _is_image(info.filename):
+                continue
+            if info.file_size > max_image_bytes:
+                raise BatchUploadError(
+                    f"{info.filename} is larger than {max_image_bytes} bytes"
+                )
+            yield info.filename, await asyncio.to_thread(zip_file.read, info)
+
+
+async def _spooled(
+    chunks: AsyncIterator[bytes], max_bytes: int
+) -> SpooledTemporaryFile:
+    archive = SpooledTemporaryFile(max_size=ZIP_SPOOL_BYTES)
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > max_bytes:
+            archive.close()
+            raise BatchUploadTooLarge(f"Zip archive larger than {max_bytes} bytes")
+        await asyncio.to_thread(archive.write, chunk)
+    archive.seek(0)
+    return archive
+
+
+async def _open_archive(
+    chunks: AsyncIterator[bytes],
+) -> tuple[SpooledTemporaryFile, zipfile.ZipFile]:
+    archive = await _spooled(chunks, settings.batch_inspection_max_archive_bytes)
+    try:
+        return archive, open_zip(archive, settings.batch_inspection_max_archive_entries)
+    except BatchUploadError:
+        archive.close()
+        raise
+
+
+async def _multipart_images(
+    chunks: AsyncIterator[bytes], boundary: str, max_image_bytes: int
+) -> AsyncIterator[tuple[str, bytes]]:
+    index = 0
+    async for headers, body in iter_multipart(chunks, boundary):
+        match = FILENAME_PATTERN.search(headers.get("content-disposition", ""))
+        if match is None:
+            # A plain form field, not a file
+            continue
+        name = match.group(1) or f"part-{index}"
+        index += 1
+        if _is_zip(name, headers.get("content-type", "")):
+            async for image in _zip_images(*await _open_archive(body), max_image_bytes):
+                yield image
+        else:
+            yield name, await _read_image(body, max_image_bytes)
+
+
+async def _zip_images(
+    archive: SpooledTemporaryFile, zip_file: zipfile.ZipFile, max_image_bytes: int
+) -> AsyncIterator[tuple[str, bytes]]:
+    with archive:
+        async for image in iter_zip_images(zip_file, max_image_bytes):
+            yield image
+
+
+async def _raw_image(
+    chunks: AsyncIterator[bytes], max_image_bytes: int
+) -> AsyncIterator[tuple[str, bytes]]:
+    yield "image", await _read_image(chunks, max_image_bytes)
+
+
+async def upload_images(request: Request) -> AsyncIterator[tuple[str, bytes]]:
+    """
+    The images of a batch upload as (name, bytes), read lazily from the
+    request body. Raises ``BatchUploadError`` right away for a content type
+    that holds no images, and ``BatchUploadTooLarge`` for a bare zip upload
+    over the archive limits (it is spooled before any image is handed out);
+    other problems inside the body surface while iterating.
+    """
+    max_image_bytes = settings.batch_inspection_max_image_bytes
+    content_type = request.headers.get("content-type", "")
+    media_type = content_type.split(";")[0].strip().lower()
+    chunks = request.stream()
+
+    if media_type == "multipart/form-data":
+        match = BOUNDARY_PATTERN.search(content_type)
+        if match is None:
+            raise BatchUploadError("Multipart upload without a boundary")
+        return _multipart_images(chunks, match.group(1), max_image_bytes)
+    if media_type in ZIP_CONTENT_TYPES:
+        max_archive_bytes = settings.batch_inspection_max_archive_bytes
+        if int(request.headers.get("content-length") or 0) > max_archive_bytes:
+            raise BatchUploadTooLarge(
+                f"Zip archive larger than {max_archive_bytes} bytes"
+            )
+        return _zip_images(*await _open_archive(chunks), max_image_bytes)
+    if media_type.startswith("image/"):
+        return _raw_image(chunks, max_image_bytes)
+    raise BatchUploadError(f"Unsupported upload content type: {media_type!r}")
@@ -0,0 +1,181 @@
+from typing import NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.executors import MonitoredThreadPoolExecutor
+from insperion_api.utils.common.logger import logger
+
+# Start-of-frame markers carrying the image size (all SOFn but DHT/JPG/DAC)
+JPEG_SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+# Markers without a length field
+JPEG_STANDALONE_MARKERS = frozenset({0x01, 0xD8, *range(0xD0, 0xD8)})
+JPEG_APP1_MARKER = 0xE1
+JPEG_START_OF_SCAN = 0xDA
+EXIF_ORIENTATION_TAG = 0x0112
+
+# How to turn an image stored with an EXIF orientation upright, as OpenCV
+# does when decoding (1 is already upright)
+EXIF_TRANSFORMS = {
+    2: lambda image: cv2.flip(image, 1),
+    3: lambda image: cv2.rotate(image, cv2.ROTATE_180),
+    4: lambda image: cv2.flip(image, 0),
+    5: lambda image: cv2.transpose(image),
+    6: lambda image: cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE),
+    7: lambda image: cv2.rotate(cv2.transpose(image), cv2.ROTATE_180),
+    8: lambda image: cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE),
+}
+
+REDUCED_READ_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+
+class DecodedFrame(NamedTuple):
+    image: np.ndarray
+    # Original size / decoded size, to map boxes back to the original image
+    scale: float = 1.0
+
+
+def jpeg_dimensions(data: bytes) -> Optional[tuple[int, int]]:
+    """
+    Reads (width, height) from the JPEG start-of-frame header without
+    decoding anything. Returns None for anything that is not a JPEG.
+    """
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    index, size = 2, len(data)
+    while index + 9 < size:
+        if data[index] != 0xFF:
+            return None
+        marker = data[index + 1]
+        if marker == 0xFF:
+            # Fill byte before the actual marker
+            index += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            index += 2
+            continue
+        if marker in JPEG_SOF_MARKERS:
+            height = int.from_bytes(data[index + 5 : index + 7], "big")
+            width = int.from_bytes(data[index + 7 : index + 9], "big")
+            return width, height
+        index += 2 + int.from_bytes(data[index + 2 : index + 4], "big")
+    return None
+
+
+def _jpeg_segments(data: bytes):
+    """Yields (marker, payload) of the JPEG header segments, up to the scan."""
+    index, size = 2, len(data)
+    while index + 4 <= size:
+        if data[index] != 0xFF:
+            return
+        marker = data[index + 1]
+        if marker == 0xFF:
+            index += 1
+            continue
+        if marker in JPEG_STANDALONE_MARKERS:
+            index += 2
+            continue
+        if marker == JPEG_START_OF_SCAN:
+            return
+        length = int.from_bytes(data[index + 2 : index + 4], "big")
+        yield marker, data[index + 4 : index + 2 + length]
+        index += 2 + length
+
+
+def exif_orientation(data: bytes) -> int:
+    """
+    The EXIF orientation (1 to 8) of a JPEG, read from its APP1 segment;
+    1 (upright) when it has none.
+    """
+    for marker, payload in _jpeg_segments(data):
+        if marker != JPEG_APP1_MARKER or not payload.startswith(b"Exif\0\0"):
+            continue
+        tiff = payload[6:]
+        byteorder = {b"II": "little", b"MM": "big"}.get(tiff[:2])
+        if byteorder is None or len(tiff) < 8:
+            return 1
+        ifd = int.from_bytes(tiff[4:8], byteorder)
+        if ifd + 2 > len(tiff):
+            return 1
+        for entry in range(int.from_bytes(tiff[ifd : ifd + 2], byteorder)):
+            offset = ifd + 2 + entry * 12
+            if offset + 12 > len(tiff):
+                break
+            if int.from_bytes(tiff[offset : offset + 2], byteorder) == (
+                EXIF_ORIENTATION_TAG
+            ):
+                value = int.from_bytes(tiff[offset + 8 : offset + 10], byteorder)
+                return value if value in EXIF_TRANSFORMS else 1
+        return 1
+    return 1
+
+
+def choose_reduction(width: int, height: int, target_size: int) -> int:
+    """
+    Largest DCT scaling factor (8, 4 or 2) that keeps the longest side at
+    or above the model input size, so no detail the model sees is lost.
+    """
+    longest_side = max(width, height)
+    for factor in (8, 4, 2):
+        if longest_side // factor >= target_size:
+            return factor
+    return 1
+
+
+class FrameDecoder:
+    """
+    Decodes frames at the smallest resolution the model can still use,
+    letting libjpeg skip most of the IDCT work on large camera images.
+    """
+
+    def __init__(self) -> None:
+        self.target_size = settings.yolo_image_size
+        self.reduced = settings.image_reduced_decode
+        self._turbojpeg = None
+        if settings.image_decoder == "turbojpeg":
+            try:
+                from turbojpeg import TurboJPEG
+
+                self._turbojpeg = TurboJPEG()
+            except (ImportError, RuntimeError) as exc:
+                logger.warning(
+                    f"libjpeg-turbo decoder unavailable, using OpenCV instead: {exc}"
+                )
+
+    def decode(self, data: bytes) -> DecodedFrame:
+        dimensions = jpeg_dimensions(data)
+        factor = 1
+        if self.reduced and dimensions is not None:
+            factor = choose_reduction(*dimensions, self.target_size)
+
+        if self._turbojpeg is not None and dimensions is not None:
+            image = self._turbojpeg.decode(data, scaling_factor=(1, factor))
+            # Unlike OpenCV, libjpeg-turbo leaves the EXIF orientation to us
+            transform = EXIF_TRANSFORMS.get(exif_orientation(data))
+            if transform is not None:
+                image = transform(image)
+        else:
+            image = cv2.imdecode(
+                np.frombuffer(data, np.uint8), REDUCED_READ_FLAGS[factor]
+            )
+
+        if image is None or factor == 1:
+            return DecodedFrame(image)
+        # The longest side is orientation independent (EXIF may rotate)
+        return DecodedFrame(image, max(dimensions) / max(image.shape[:2]))
+
+
+frame_decoder = FrameDecoder()
+
+# Sized separately from the default executor, so decodes neither run on the
+# event loop nor queue behind inference threads
+decode_executor = MonitoredThreadPoolExecutor(
+    "decode", max_workers=settings.decode_workers, thread_name_prefix="frame-decode"
+)
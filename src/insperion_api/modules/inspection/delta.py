@@ -0,0 +1,130 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from insperion_api.modules.inspection.detections import (
+    Detections,
+    box_iou,
+    greedy_match,
+)
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+# Minimum overlap for a box to be the same object as one already sent
+DELTA_MATCH_IOU = 0.3
+
+keyframes_sent = metrics.counter("inspection.delta.keyframes")
+deltas_sent = metrics.counter("inspection.delta.deltas")
+boxes_unchanged = metrics.counter("inspection.delta.unchanged_boxes")
+
+
+class DetectionDelta(NamedTuple):
+    """What changed since the detections last sent to a client."""
+
+    keyframe: bool
+    # New boxes (every box on a keyframe) and the ids they are known by
+    added: Detections
+    added_ids: np.ndarray
+    # Boxes that moved beyond the tolerance, with their new position
+    updated: Detections
+    updated_ids: np.ndarray
+    removed_ids: np.ndarray
+
+
+class DeltaState:
+    """
+    The detection set one client holds, each box under a session-wide id,
+    so a frame only needs the boxes added, moved or removed since.
+
+    A box is the same object as a held one of the same class overlapping
+    it by ``DELTA_MATCH_IOU`` (greedy, best overlaps first). It counts as
+    moved once its IoU with the held box drops under ``iou_tolerance`` or
+    a corner shifts by more than ``pixel_tolerance`` pixels; smaller moves
+    are not sent, and the client's box stays the reference they add up
+    against. Every ``keyframe_interval``-th frame resends the full set.
+    """
+
+    def __init__(
+        self,
+        keyframe_interval: int = settings.delta_keyframe_interval,
+        iou_tolerance: float = settings.delta_iou_tolerance,
+        pixel_tolerance: float = settings.delta_pixel_tolerance,
+    ) -> None:
+        self.keyframe_interval = max(1, keyframe_interval)
+        self.iou_tolerance = iou_tolerance
+        self.pixel_tolerance = pixel_tolerance
+        self._held = Detections.empty()
+        self._ids = np.empty(0, dtype=np.int64)
+        self._next_id = 1
+        self._since_keyframe = 0
+
+    def _new_ids(self, count: int) -> np.ndarray:
+        ids = np.arange(self._next_id, self._next_id + count, dtype=np.int64)
+        self._next_id += count
+        return ids
+
+    def _match(self, detections: Detections) -> np.ndarray:
+        """Index of the held box each detection continues, -1 for new ones."""
+        if not detections.size or not self._held.size:
+            return np.full(detections.size, -1, dtype=np.int64)
+        iou = box_iou(detections.xyxy, self._held.xyxy)
+        iou[detections.class_id[:, None] != self._held.class_id[None, :]] = 0
+        return greedy_match(iou, DELTA_MATCH_IOU)
+
+    def _keyframe(self, detections: Detections) -> DetectionDelta:
+        self._held = detections
+        self._ids = self._new_ids(detections.size)
+        self._since_keyframe = 1
+        keyframes_sent.inc()
+        empty_ids = np.empty(0, dtype=np.int64)
+        return DetectionDelta(
+            True, detections, self._ids, Detections.empty(), empty_ids, empty_ids
+        )
+
+    def update(self, detections: Detections) -> DetectionDelta:
+        """The delta of a frame's detections, which become the held set."""
+        if self._since_keyframe == 0 or self._since_keyframe >= self.keyframe_interval:
+            return self._keyframe(detections)
+        self._since_keyframe += 1
+
+        match = self._match(detections)
+        matched = np.flatnonzero(match >= 0)
+        held = match[matched]
+        moved = np.zeros(matched.size, dtype=bool)
+        if matched.size:
+            new_boxes = detections.xyxy[matched]
+            held_boxes = self._held.xyxy[held]
+            overlap = box_iou(new_boxes, held_boxes)[
+                np.arange(matched.size), np.arange(matched.size)
+            ]
+            shift = np.abs(new_boxes - held_boxes).max(axis=1)
+            moved = (overlap < self.iou_tolerance) | (shift > self.pixel_tolerance)
+        boxes_unchanged.inc(int((~moved).sum()))
+
+        added = np.flatnonzero(match < 0)
+        removed = np.ones(self._held.size, dtype=bool)
+        removed[held] = False
+        updated, updated_held = matched[moved], held[moved]
+        delta = DetectionDelta(
+            False,
+            detections.take(added),
+            self._new_ids(added.size),
+            detections.take(updated),
+            self._ids[updated_held],
+            self._ids[removed],
+        )
+
+        # The client now holds the unchanged boxes as they were, the moved
+        # ones where they are now and the added ones
+        kept = held[~moved]
+        parts = [self._held.take(kept), delta.updated, delta.added]
+        self._held = Detections(
+            np.concatenate([part.xyxy for part in parts]),
+            np.concatenate([part.confidence for part in parts]),
+            np.concatenate([part.class_id for part in parts]),
+        )
+        self._ids = np.concatenate(
+            [self._ids[kept], delta.updated_ids, delta.added_ids]
+        )
+        deltas_sent.inc()
+        return delta
@@ -0,0 +1,95 @@
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """(N, M) IoU matrix between two sets of ``[x1, y1, x2, y2]`` boxes."""
+    top_left = np.maximum(a[:, None, :2], b[None, :, :2])
+    bottom_right = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(bottom_right - top_left, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def greedy_match(iou: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Pairs the rows and columns of an IoU matrix, best overlaps first, each
+    at most once. Returns the column matched to each row, -1 where no
+    column overlaps it by ``threshold``.
+    """
+    match = np.full(iou.shape[0], -1, dtype=np.int64)
+    taken = np.zeros(iou.shape[1], dtype=bool)
+    for flat in np.argsort(-iou, axis=None):
+        row, col = np.unravel_index(flat, iou.shape)
+        if iou[row, col] < threshold:
+            break
+        if match[row] >= 0 or taken[col]:
+            continue
+        match[row] = col
+        taken[col] = True
+    return match
+
+
+class Detections(NamedTuple):
+    """
+    Detections of a single frame as flat arrays, cheap to ship between
+    processes and to serialize without per-box Python objects.
+    """
+
+    xyxy: np.ndarray  # (N, 4) float32, [x1, y1, x2, y2]
+    confidence: np.ndarray  # (N,) float32
+    class_id: np.ndarray  # (N,) int32
+    track_id: Optional[np.ndarray] = None  # (N,) int64, set by the box tracker
+
+    @classmethod
+    def empty(cls) -> "Detections":
+        return cls(
+            np.empty((0, 4), dtype=np.float32),
+            np.empty((0,), dtype=np.float32),
+            np.empty((0,), dtype=np.int32),
+        )
+
+    @classmethod
+    def from_result(cls, result) -> "Detections":
+        """
+        Converts one ultralytics result with a single device-to-host transfer
+        of the whole ``[x1, y1, x2, y2, (track_id,) conf, cls]`` box tensor.
+        """
+        boxes = result.boxes
+        if boxes is None or len(boxes) == 0:
+            return cls.empty()
+        data = boxes.data.cpu().numpy()
+        return cls(
+            np.ascontiguousarray(data[:, :4], dtype=np.float32),
+            data[:, -2].astype(np.float32),
+            data[:, -1].astype(np.int32),
+        )
+
+    def scaled(self, scale: float) -> "Detections":
+        """Boxes multiplied by ``scale``, e.g. back to original image size."""
+        if scale == 1.0:
+            return self
+        return self._replace(xyxy=self.xyxy * np.float32(scale))
+
+    def shifted(self, offset: tuple[int, int]) -> "Detections":
+        """Boxes moved by a (dx, dy) offset, e.g. out of a cropped region."""
+        if offset == (0, 0):
+            return self
+        dx, dy = offset
+        return self._replace(xyxy=self.xyxy + np.float32([dx, dy, dx, dy]))
+
+    def take(self, index: np.ndarray) -> "Detections":
+        """The detections selected by an index or boolean mask."""
+        return Detections(
+            self.xyxy[index],
+            self.confidence[index],
+            self.class_id[index],
+            None if self.track_id is None else self.track_id[index],
+        )
+
+    @property
+    def size(self) -> int:
+        """Number of detections."""
+        return int(self.confidence.shape[0])
@@ -0,0 +1,231 @@
+import json
+import struct
+from abc import ABC, abstractmethod
+from typing import Union
+
+import numpy as np
+from fastapi import WebSocket
+
+from insperion_api.core.constants.constants import InspectionResultFormat
+from insperion_api.modules.inspection.delta import DeltaState
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.postprocess import format_detections
+
+BINARY_SUBPROTOCOL = "insperion.binary.v1"
+BINARY_MAGIC = b"INSP"
+BINARY_VERSION = 1
+
+# magic, version, flags, reserved, count, seq, dropped_frames, metadata length.
+# 24 bytes keeps the float32 arrays that follow 4-byte aligned.
+BINARY_HEADER = struct.Struct("<4sBBHIIII")
+
+# Header flag bits
+FLAG_REUSED = 0x01  # detections reused from a near-duplicate earlier frame
+FLAG_TRACK_IDS = 0x02  # a uint32 track id array follows the class ids
+FLAG_TRACKED = 0x04  # boxes propagated by the tracker rather than detected
+
+
+class ResultEncoder(ABC):
+    """Serializes one frame's detections for a single inspection session."""
+
+    def __init__(self, names: dict[int, str]) -> None:
+        self.names = names
+
+    async def send_preamble(self, websocket: WebSocket) -> None:
+        """Sends anything the client needs once, before the first result."""
+
+    @abstractmethod
+    def encode(self, detections: Detections, **fields) -> Union[str, bytes]:
+        """
+        Serializes the detections plus per-frame fields (seq,
+        dropped_frames...) into one text or binary message.
+        """
+
+    async def transmit(self, websocket: WebSocket, message: Union[str, bytes]) -> None:
+        if isinstance(message, bytes):
+            await websocket.send_bytes(message)
+        else:
+            await websocket.send_text(message)
+
+    async def send(
+        self, websocket: WebSocket, detections: Detections, **fields
+    ) -> None:
+        await self.transmit(websocket, self.encode(detections, **fields))
+
+
+class JsonResultEncoder(ResultEncoder):
+    """The default: one JSON object with a dict per detection."""
+
+    def encode(self, detections: Detections, **fields) -> str:
+        results_json = format_detections(detections, self.names)
+        results_json.update(fields)
+        return json.dumps(results_json, separators=(",", ":"), ensure_ascii=False)
+
+
+class DeltaJsonResultEncoder(ResultEncoder):
+    """
+    JSON results as changes to the detections last sent (``?delta=true``),
+    for mostly static scenes. A keyframe holds every detection:
+
+        {"keyframe": true, "detections": [{"id": 1, "class_id": ...}, ...]}
+
+    and the frames in between only what was added, moved or removed:
+
+        {"keyframe": false, "added": [...], "updated": [{"id", "confidence",
+        "box"}, ...], "removed": [ids]}
+
+    Boxes keep their id until removed; applying each message in order to
+    the last keyframe gives the current detections, within the tolerance.
+    """
+
+    def __init__(self, names: dict[int, str]) -> None:
+        super().__init__(names)
+        self.state = DeltaState()
+
+    def _with_ids(self, detections: Detections, ids: np.ndarray) -> list[dict]:
+        results = format_detections(detections, self.names)["detections"]
+        return [
+            {"id": box_id, **result} for box_id, result in zip(ids.tolist(), results)
+        ]
+
+    def encode(self, detections: Detections, **fields) -> str:
+        delta = self.state.update(detections)
+        if delta.keyframe:
+            message = {
+                "keyframe": True,
+                "detections": self._with_ids(delta.added, delta.added_ids),
+            }
+        else:
+            message = {
+                "keyframe": False,
+                "added": self._with_ids(delta.added, delta.added_ids),
+                "updated": [
+                    {"id": box_id, "confidence": confidence, "box": box}
+                    for box_id, confidence, box in zip(
+                        delta.updated_ids.tolist(),
+                        delta.updated.confidence.tolist(),
+                        delta.updated.xyxy.tolist(),
+                    )
+                ],
+                "removed": delta.removed_ids.tolist(),
+            }
+        message.update(fields)
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+class BinaryResultEncoder(ResultEncoder):
+    """
+    Compact little-endian binary frames, built straight from the detection
+    arrays without any per-detection Python objects:
+
+    - 24 byte header (``BINARY_HEADER``)
+    - ``count`` x 4 float32 boxes ``[x1, y1, x2, y2]``
+    - ``count`` float32 confidences
+    - ``count`` uint16 class ids
+    - ``count`` uint32 track ids, with ``FLAG_TRACK_IDS``
+    - optional UTF-8 JSON object with any other per-frame fields
+
+    The class-name table is sent once per session as a JSON text message.
+    """
+
+    def __init__(self, names: dict[int, str]) -> None:
+        super().__init__(names)
+        self._sent = 0
+
+    async def send_preamble(self, websocket: WebSocket) -> None:
+        await websocket.send_json(
+            {
+                "type": "classes",
+                "format": BINARY_SUBPROTOCOL,
+                "names": {str(cls_id): name for cls_id, name in self.names.items()},
+            }
+        )
+
+    def encode(self, detections: Detections, **fields) -> bytes:
+        seq = fields.pop("seq", self._sent)
+        self._sent += 1
+        dropped_frames = fields.pop("dropped_frames", 0)
+        flags = FLAG_REUSED if fields.pop("reused", False) else 0
+        if fields.pop("source", None) == "tracked":
+            flags |= FLAG_TRACKED
+        track_ids = b""
+        if detections.track_id is not None:
+            flags |= FLAG_TRACK_IDS
+            track_ids = detections.track_id.astype("<u4").tobytes()
+        metadata = json.dumps(fields, separators=(",", ":")).encode() if fields else b""
+        header = BINARY_HEADER.pack(
+            BINARY_MAGIC,
+            BINARY_VERSION,
+            flags,
+            0,
+            detections.size,
+            seq,
+            dropped_frames,
+            len(metadata),
+        )
+        return b"".join(
+            (
+                header,
+                detections.xyxy.astype("<f4", copy=False).tobytes(),
+                detections.confidence.astype("<f4", copy=False).tobytes(),
+                detections.class_id.astype("<u2").tobytes(),
+                track_ids,
+                metadata,
+            )
+        )
+
+
+def decode_binary_result(payload: bytes) -> dict:
+    """Reference decoder for the binary format, for clients and tools."""
+    magic, version, flags, _, count, seq, dropped_frames, metadata_length = (
+        BINARY_HEADER.unpack_from(payload)
+    )
+    if magic != BINARY_MAGIC or version != BINARY_VERSION:
+        raise ValueError("Not an inspection result payload")
+
+    offset = BINARY_HEADER.size
+    boxes = np.frombuffer(payload, "<f4", count * 4, offset).reshape(count, 4)
+    offset += boxes.nbytes
+    confidence = np.frombuffer(payload, "<f4", count, offset)
+    offset += confidence.nbytes
+    class_id = np.frombuffer(payload, "<u2", count, offset)
+    offset += class_id.nbytes
+    track_id, tracking = None, {}
+    if flags & FLAG_TRACK_IDS:
+        track_id = np.frombuffer(payload, "<u4", count, offset)
+        offset += track_id.nbytes
+        track_id = track_id.astype(np.int64)
+        tracking = {"source": "tracked" if flags & FLAG_TRACKED else "detected"}
+    metadata = (
+        json.loads(payload[offset : offset + metadata_length])
+        if metadata_length
+        else {}
+    )
+    return {
+        "seq": seq,
+        "dropped_frames": dropped_frames,
+        "reused": bool(flags & FLAG_REUSED),
+        "detections": Detections(
+            boxes, confidence, class_id.astype(np.int32), track_id
+        ),
+        **tracking,
+        **metadata,
+    }
+
+
+ENCODERS: dict[InspectionResultFormat, type[ResultEncoder]] = {
+    InspectionResultFormat.JSON: JsonResultEncoder,
+    InspectionResultFormat.BINARY: BinaryResultEncoder,
+}
+
+
+def build_encoder(
+    result_format: InspectionResultFormat,
+    names: dict[int, str],
+    delta: bool = False,
+) -> ResultEncoder:
+    if delta:
+        if result_format != InspectionResultFormat.JSON:
+            raise ValueError("Delta results are only available in the JSON format")
+        return DeltaJsonResultEncoder(names)
+    return ENCODERS[result_format](names)
@@ -0,0 +1,371 @@
+import ast
+import copy
+import fcntl
+import hashlib
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.inspection_params import InspectionParams
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.cpu_topology import applied_thread_plan
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.metrics import LatencyStats
+
+LETTERBOX_COLOR = (114, 114, 114)
+# Per-class box offset for class-aware NMS in one pass (as ultralytics'
+# max_wh): far beyond any box, even raw ones reaching past the canvas
+NMS_CLASS_OFFSET = 7680
+
+
+class InferenceEngine(ABC):
+    """
+    Backend-agnostic detector: takes decoded BGR frames and returns one
+    ``Detections`` per frame in original image coordinates.
+    """
+
+    backend: str
+
+    def __init__(self, model_path: Path) -> None:
+        self.model_path = model_path
+        self.names: dict[int, str] = {}
+        self.latency = LatencyStats()
+        # Monotonic time of the last inference, for the registry's eviction
+        self.last_used = time.monotonic()
+
+    @abstractmethod
+    def _predict(
+        self, frames: list[np.ndarray], params: Optional[InspectionParams]
+    ) -> list[Detections]:
+        """Runs the backend on a batch of frames (blocking)."""
+
+    def predict(
+        self, frames: list[np.ndarray], params: Optional[InspectionParams] = None
+    ) -> list[Detections]:
+        """
+        Runs inference on a batch of frames and records its latency. With
+        ``params``, only their classes are detected, above their confidence.
+        """
+        self.last_used = time.monotonic()
+        start = time.perf_counter()
+        detections = self._predict(frames, params)
+        self.latency.observe((time.perf_counter() - start) * 1000)
+        return detections
+
+    def warm_up(self, runs: int, image_size: int) -> None:
+        dummy_frame = np.zeros((image_size, image_size, 3), dtype=np.uint8)
+        for _ in range(runs):
+            self._predict([dummy_frame], None)
+
+    @staticmethod
+    def _conf_threshold(params: Optional[InspectionParams]) -> float:
+        if params is None:
+            return settings.yolo_conf_threshold
+        return max(settings.yolo_conf_threshold, params.min_confidence)
+
+    def stats(self) -> dict:
+        return {"backend": self.backend, "latency": self.latency.snapshot()}
+
+
+class TorchEngine(InferenceEngine):
+    """Runs the ``ultralytics`` PyTorch model in eager mode."""
+
+    backend = "torch"
+
+    def __init__(self, model_path: Path) -> None:
+        from ultralytics.models.yolo import YOLO
+
+        super().__init__(model_path)
+        self.model = YOLO(model_path)
+        self.names = self.model.names
+        # Copies of the model sharing its weights, one per class filter
+        self._class_models: dict[tuple[int, ...], YOLO] = {}
+        self._class_models_lock = threading.Lock()
+
+    def _model_for(self, classes: Optional[tuple[int, ...]]):
+        """
+        The model to run with only ``classes`` kept by NMS. ``predict`` stores
+        its arguments on the model's predictor, which every session's threads
+        share, so each class filter gets a shallow copy of the model with a
+        predictor of its own (the weights stay shared) and calls it always
+        with the same arguments.
+        """
+        if classes is None:
+            return self.model
+        with self._class_models_lock:
+            model = self._class_models.get(classes)
+            if model is None:
+                model = copy.copy(self.model)
+                model.predictor = None
+                self._class_models[classes] = model
+        return model
+
+    def _predict(
+        self, frames: list[np.ndarray], params: Optional[InspectionParams]
+    ) -> list[Detections]:
+        # A session's confidence floor is applied afterwards, NMS runs at the
+        # lowest one so that the predictor arguments stay the same
+        classes = None if params is None else params.classes
+        results = self._model_for(classes)(
+            frames,
+            imgsz=settings.yolo_image_size,
+            conf=settings.yolo_conf_threshold,
+            iou=settings.yolo_iou_threshold,
+            classes=None if classes is None else list(classes),
+            verbose=False,
+        )
+        return [
+            self._filter(Detections.from_result(result), params) for result in results
+        ]
+
+    def _filter(
+        self, detections: Detections, params: Optional[InspectionParams]
+    ) -> Detections:
+        if params is None:
+            return detections
+        return detections.take(detections.confidence >= self._conf_threshold(params))
+
+
+def weights_digest(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as weights:
+        for chunk in iter(lambda: weights.read(1024 * 1024), b""):
+            sha.update(chunk)
+    return sha.hexdigest()[:16]
+
+
+def export_onnx(model_path: Path) -> Path:
+    """
+    Exports the PyTorch weights to ONNX once and caches the file on disk,
+    keyed by the hash of the weights so a new model is never served stale.
+    """
+    cache_dir = Path(settings.onnx_cache_dir or model_path.parent)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    onnx_path = cache_dir / f"{model_path.stem}-{weights_digest(model_path)}.onnx"
+    if onnx_path.exists():
+        return onnx_path
+
+    # Serialize the export across workers starting at the same time
+    with open(cache_dir / f"{onnx_path.name}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if not onnx_path.exists():
+            from ultralytics.models.yolo import YOLO
+
+            logger.info(f"Exporting {model_path} to ONNX, caching at {onnx_path}")
+            exported = YOLO(model_path).export(
+                format="onnx", imgsz=settings.yolo_image_size, dynamic=True
+            )
+            os.replace(exported, onnx_path)
+    return onnx_path
+
+
+def onnx_model_path(model_path: Path) -> Path:
+    """
+    The ONNX file to serve for some weights: the FP32 export, or its INT8
+    version when ``ONNX_QUANTIZATION`` is set.
+    """
+    if settings.onnx_quantization == "none":
+        return export_onnx(model_path)
+
+    from insperion_api.modules.inspection.quantization import quantized_model
+
+    return quantized_model(model_path)
+
+
+def letterbox(
+    frame: np.ndarray, size: int
+) -> tuple[np.ndarray, float, tuple[int, int]]:
+    """
+    Resizes a frame to fit a ``size`` x ``size`` square keeping the aspect
+    ratio and pads the rest, like the ``ultralytics`` preprocessing.
+    Returns the padded image, the scale ratio and the (left, top) padding.
+    """
+    height, width = frame.shape[:2]
+    ratio = min(size / height, size / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    if (new_width, new_height) != (width, height):
+        frame = cv2.resize(
+            frame, (new_width, new_height), interpolation=cv2.INTER_LINEAR
+        )
+
+    pad_w, pad_h = (size - new_width) / 2, (size - new_height) / 2
+    top, bottom = round(pad_h - 0.1), round(pad_h + 0.1)
+    left, right = round(pad_w - 0.1), round(pad_w + 0.1)
+    frame = cv2.copyMakeBorder(
+        frame, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR
+    )
+    return frame, ratio, (left, top)
+
+
+def non_max_suppression(
+    boxes: np.ndarray, scores: np.ndarray, iou_threshold: float
+) -> np.ndarray:
+    """
+    Greedy NMS with the IoU of each kept box computed against all remaining
+    boxes at once. Returns the kept indices sorted by descending score.
+    """
+    x1, y1, x2, y2 = boxes.T
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        inter_w = np.clip(
+            np.minimum(x2[best], x2[rest]) - np.maximum(x1[best], x1[rest]), 0, None
+        )
+        inter_h = np.clip(
+            np.minimum(y2[best], y2[rest]) - np.maximum(y1[best], y1[rest]), 0, None
+        )
+        inter = inter_w * inter_h
+        iou = inter / (areas[best] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.int64)
+
+
+class OnnxEngine(InferenceEngine):
+    """
+    Runs an ONNX export of the YOLO weights on ONNX Runtime, with its own
+    NumPy letterbox preprocessing and NMS. OpenVINO can be used by listing
+    ``OpenVINOExecutionProvider`` in ``ONNX_PROVIDERS``.
+    """
+
+    backend = "onnx"
+    MAX_DETECTIONS = 300
+
+    def __init__(self, model_path: Path, onnx_path: Optional[Path] = None) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:
+            raise RuntimeError(
+                "INFERENCE_BACKEND=onnx requires the onnx and onnxruntime packages"
+            ) from exc
+
+        super().__init__(model_path)
+        self.onnx_path = onnx_path or onnx_model_path(model_path)
+
+        options = ort.SessionOptions()
+        plan = applied_thread_plan()
+        if settings.onnx_intra_op_threads > 0:
+            options.intra_op_num_threads = settings.onnx_intra_op_threads
+        elif plan is not None:
+            options.intra_op_num_threads = plan.intra_op_threads
+        self.session = ort.InferenceSession(
+            str(self.onnx_path), sess_options=options, providers=settings.onnx_providers
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        # Exports without ``dynamic=True`` only accept a batch of one
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.image_size = settings.yolo_image_size
+
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def stats(self) -> dict:
+        return {**super().stats(), "model_file": self.onnx_path.name}
+
+    def _preprocess(
+        self, frames: list[np.ndarray]
+    ) -> tuple[np.ndarray, list[tuple[float, tuple[int, int]]]]:
+        images, transforms = [], []
+        for frame in frames:
+            image, ratio, padding = letterbox(frame, self.image_size)
+            images.append(image)
+            transforms.append((ratio, padding))
+
+        # BGR HWC uint8 -> RGB NCHW float32 in [0, 1]
+        batch = np.stack(images)[..., ::-1].transpose(0, 3, 1, 2)
+        batch = np.ascontiguousarray(batch, dtype=np.float32) / 255.0
+        return batch, transforms
+
+    def _postprocess(
+        self,
+        prediction: np.ndarray,
+        frame_shape: tuple[int, ...],
+        ratio: float,
+        padding: tuple[int, int],
+        params: Optional[InspectionParams],
+    ) -> Detections:
+        # (4 + num_classes, anchors) -> (anchors, 4 + num_classes)
+        prediction = prediction.T
+        class_scores = prediction[:, 4:]
+        classes = None if params is None else params.classes
+        if classes is not None:
+            # Only score the classes this inspection type cares about
+            if not classes:
+                return Detections.empty()
+            class_scores = class_scores[:, classes]
+        class_id = class_scores.argmax(axis=1)
+        confidence = class_scores[np.arange(class_scores.shape[0]), class_id]
+        if classes is not None:
+            class_id = np.asarray(classes)[class_id]
+
+        candidates = confidence >= self._conf_threshold(params)
+        if not candidates.any():
+            return Detections.empty()
+        cx, cy, w, h = prediction[candidates, :4].T
+        boxes = np.stack((cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2), axis=1)
+        confidence, class_id = confidence[candidates], class_id[candidates]
+
+        # Offset boxes per class so one NMS pass never suppresses across classes
+        offsets = class_id[:, None] * NMS_CLASS_OFFSET
+        keep = non_max_suppression(
+            boxes + offsets, confidence, settings.yolo_iou_threshold
+        )[: self.MAX_DETECTIONS]
+
+        # Undo the letterbox back to original image coordinates
+        boxes = (boxes[keep] - np.array(padding * 2)) / ratio
+        height, width = frame_shape[:2]
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return Detections(
+            boxes.astype(np.float32),
+            confidence[keep].astype(np.float32),
+            class_id[keep].astype(np.int32),
+        )
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        if self.dynamic_batch:
+            return self.session.run(None, {self.input_name: batch})[0]
+        return np.concatenate(
+            [
+                self.session.run(None, {self.input_name: image[None]})[0]
+                for image in batch
+            ]
+        )
+
+    def _predict(
+        self, frames: list[np.ndarray], params: Optional[InspectionParams]
+    ) -> list[Detections]:
+        batch, transforms = self._preprocess(frames)
+        predictions = self._run(batch)
+        return [
+            self._postprocess(prediction, frame.shape, ratio, padding, params)
+            for prediction, frame, (ratio, padding) in zip(
+                predictions, frames, transforms
+            )
+        ]
+
+
+ENGINES: dict[str, type[InferenceEngine]] = {
+    TorchEngine.backend: TorchEngine,
+    OnnxEngine.backend: OnnxEngine,
+}
+
+
+def build_engine(model_path: Path, backend: Optional[str] = None) -> InferenceEngine:
+    """Creates the inference engine selected for this deployment."""
+    engine_cls = ENGINES[backend or settings.inference_backend]
+    engine = engine_cls(model_path)
+    logger.info(f"Loaded {model_path} with the '{engine.backend}' inference engine")
+    return engine
@@ -0,0 +1,394 @@
+import asyncio
+import itertools
+import json
+import os
+import tempfile
+import time
+import uuid
+from collections import deque
+from contextlib import AsyncExitStack, asynccontextmanager
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.executors import MonitoredThreadPoolExecutor
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.metrics import metrics
+
+# S3 rejects multipart parts under 5 MiB (except the last one)
+MIN_PART_BYTES = 5 * 1024 * 1024
+# Window over which the upload rate is measured
+RATE_WINDOW_S = 10.0
+# Pause of an uploader after a failed upload, so an outage does not spin
+FAILURE_BACKOFF_S = 1.0
+SPILL_SUFFIX = ".frame"
+
+# Leading bytes of the image formats cameras send, and how to store them
+IMAGE_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "png", "image/png"),
+    (b"RIFF", "webp", "image/webp"),
+    (b"BM", "bmp", "image/bmp"),
+)
+
+frames_uploaded = metrics.counter("archive.frames_uploaded")
+frames_spilled = metrics.counter("archive.frames_spilled")
+frames_dropped = metrics.counter("archive.frames_dropped")
+upload_errors = metrics.counter("archive.upload_errors")
+upload_latency = metrics.latency("archive.upload")
+
+
+class ArchivedFrame(NamedTuple):
+    key: str
+    data: bytes
+    content_type: str
+    metadata: dict[str, str]
+
+
+def image_type(data: bytes) -> tuple[str, str]:
+    """File extension and content type of an encoded frame."""
+    for signature, extension, content_type in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension, content_type
+    return "bin", "application/octet-stream"
+
+
+class FrameArchiver:
+    """
+    Uploads inspection frames to S3 in the background. ``submit`` only
+    queues a frame and never waits: when the bounded in-memory queue is
+    full the frame is spilled to local disk (up to ``spill_max_bytes``,
+    beyond which frames are dropped), and spilled frames are uploaded once
+    the queue is empty again. Frames failing to upload are spilled for a
+    later attempt too.
+
+    Each of ``uploaders`` tasks owns a long-lived S3 client. Frames larger
+    than ``part_bytes`` are sent as multipart uploads with up to
+    ``part_concurrency`` parts in flight. On shutdown the queue is drained
+    for a while and whatever is left is spilled, to be uploaded by the next
+    worker using the same spill directory.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str,
+        queue_size: int,
+        spill_dir: Path,
+        spill_max_bytes: int,
+        uploaders: int,
+        part_bytes: int,
+        part_concurrency: int,
+    ) -> None:
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self.queue_size = max(1, queue_size)
+        self.spill_dir = spill_dir
+        self.spill_max_bytes = spill_max_bytes
+        self.uploaders = max(1, uploaders)
+        self.part_bytes = max(MIN_PART_BYTES, part_bytes)
+        self.part_concurrency = max(1, part_concurrency)
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: list[asyncio.Task] = []
+        self._spills: set[asyncio.Future] = set()
+        # Spill files are written and read by this one thread, in order
+        self._disk = MonitoredThreadPoolExecutor("archive_disk", max_workers=1)
+        self._clients: Optional[AsyncExitStack] = None
+        # Spilled frames waiting for upload, oldest first, and their size
+        self._spilled: deque[Path] = deque()
+        self.spilled_bytes = 0
+        self._spill_seq = itertools.count()
+        self._uploaded: deque[tuple[float, int]] = deque()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    @property
+    def queue_depth(self) -> int:
+        return 0 if self._queue is None else self._queue.qsize()
+
+    @property
+    def spilled_frames(self) -> int:
+        return len(self._spilled)
+
+    def bytes_per_second(self) -> float:
+        """Bytes uploaded per second over the last few seconds."""
+        horizon = time.monotonic() - RATE_WINDOW_S
+        while self._uploaded and self._uploaded[0][0] < horizon:
+            self._uploaded.popleft()
+        return sum(size for _, size in self._uploaded) / RATE_WINDOW_S
+
+    async def start(self) -> None:
+        from insperion_api.utils.aws.aws_client import AWSServices, get_client
+
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        await self._on_disk(self._claim_leftovers)
+
+        self._clients = AsyncExitStack()
+        client_context = asynccontextmanager(get_client)
+        clients = [
+            await self._clients.enter_async_context(
+                client_context(AWSServices.S3.value)
+            )
+            for _ in range(self.uploaders)
+        ]
+        await self._ensure_bucket(clients[0])
+
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._tasks = [asyncio.create_task(self._upload_loop(c)) for c in clients]
+        logger.info(
+            f"Frame archiver started (bucket={self.bucket}, "
+            f"uploaders={self.uploaders}, queue_size={self.queue_size}, "
+            f"spilled_frames={self.spilled_frames})"
+        )
+
+    async def stop(self, drain_timeout_s: float) -> None:
+        """
+        Gives the uploaders ``drain_timeout_s`` to empty the queue, then
+        spills what is left and closes the clients.
+        """
+        if not self._tasks:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), drain_timeout_s)
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Frame archiver drain timed out, spilling the frames in flight "
+                f"and {self.queue_depth} queued"
+            )
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._spills, return_exceptions=True)
+        self._tasks = []
+
+        while not self._queue.empty():
+            await self._on_disk(self._spill, self._queue.get_nowait())
+        await self._clients.aclose()
+        self._clients = None
+
+    def session_key(self, inspection_id: int) -> str:
+        """Key prefix for the frames of one session streaming an inspection."""
+        started = time.strftime("%Y%m%dT%H%M%S", time.gmtime())
+        return f"{self.prefix}/{inspection_id}/{started}-{uuid.uuid4().hex[:8]}"
+
+    def submit(
+        self, key: str, data: bytes, metadata: Optional[dict[str, str]] = None
+    ) -> None:
+        """
+        Queues an encoded frame for upload under ``key`` (its extension is
+        added from the image format). Returns at once.
+        """
+        if self._queue is None or not self._tasks:
+            return
+        extension, content_type = image_type(data)
+        frame = ArchivedFrame(f"{key}.{extension}", data, content_type, metadata or {})
+        try:
+            self._queue.put_nowait(frame)
+        except asyncio.QueueFull:
+            self._spill_later(frame)
+
+    def _spill_later(self, frame: ArchivedFrame) -> None:
+        spill = asyncio.ensure_future(self._on_disk(self._spill, frame))
+        self._spills.add(spill)
+        spill.add_done_callback(self._spills.discard)
+
+    async def _on_disk(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(
+            self._disk, function, *args
+        )
+
+    async def _next_frame(self) -> tuple[ArchivedFrame, Optional[Path]]:
+        """The next frame to upload, and its spill file if it was spilled."""
+        while self._queue.empty() and self._spilled:
+            path = self._spilled.popleft()
+            if (frame := await self._on_disk(self._read_spilled, path)) is not None:
+                return frame, path
+        return await self._queue.get(), None
+
+    async def _upload_loop(self, client: Any) -> None:
+        while True:
+            frame, spill_path = await self._next_frame()
+            try:
+                start = time.perf_counter()
+                await self._upload(client, frame)
+            except asyncio.CancelledError:
+                # Shut down mid-upload: a queued frame is kept on disk
+                if spill_path is None:
+                    await self._on_disk(self._spill, frame)
+                raise
+            except Exception as exc:
+                upload_errors.inc()
+                logger.warning(f"Archiving {frame.key} failed: {exc}")
+                if spill_path is None:
+                    await self._on_disk(self._spill, frame)
+                else:
+                    self._spilled.append(spill_path)
+                await asyncio.sleep(FAILURE_BACKOFF_S)
+            else:
+                upload_latency.observe((time.perf_counter() - start) * 1000)
+                frames_uploaded.inc()
+                self._uploaded.append((time.monotonic(), len(frame.data)))
+                if spill_path is not None:
+                    await self._on_disk(self._remove_spilled, spill_path)
+            finally:
+                if spill_path is None:
+                    self._queue.task_done()
+
+    async def _upload(self, client: Any, frame: ArchivedFrame) -> None:
+        extra = {"ContentType": frame.content_type, "Metadata": frame.metadata}
+        if len(frame.data) <= self.part_bytes:
+            await client.put_object(
+                Bucket=self.bucket, Key=frame.key, Body=frame.data, **extra
+            )
+            return
+
+        upload = await client.create_multipart_upload(
+            Bucket=self.bucket, Key=frame.key, **extra
+        )
+        upload_id = upload["UploadId"]
+        slots = asyncio.Semaphore(self.part_concurrency)
+
+        async def upload_part(number: int, offset: int) -> dict:
+            async with slots:
+                part = await client.upload_part(
+                    Bucket=self.bucket,
+                    Key=frame.key,
+                    UploadId=upload_id,
+                    PartNumber=number,
+                    Body=frame.data[offset : offset + self.part_bytes],
+                )
+            return {"PartNumber": number, "ETag": part["ETag"]}
+
+        try:
+            parts = await asyncio.gather(
+                *(
+                    upload_part(number, offset)
+                    for number, offset in enumerate(
+                        range(0, len(frame.data), self.part_bytes), start=1
+                    )
+                )
+            )
+            await client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=frame.key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except BaseException:
+            await client.abort_multipart_upload(
+                Bucket=self.bucket, Key=frame.key, UploadId=upload_id
+            )
+            raise
+
+    async def _ensure_bucket(self, client: Any) -> None:
+        try:
+            await client.head_bucket(Bucket=self.bucket)
+            return
+        except Exception as exc:
+            if not settings.s3_endpoint_url:
+                logger.error(f"Archive bucket {self.bucket} is not reachable: {exc}")
+                return
+        # A local S3 stand-in (MinIO) starts empty
+        try:
+            await client.create_bucket(Bucket=self.bucket)
+            logger.info(f"Created archive bucket {self.bucket}")
+        except Exception as exc:
+            logger.error(f"Creating archive bucket {self.bucket} failed: {exc}")
+
+    # Spill files hold a JSON header line (key, content type, metadata)
+    # followed by the frame bytes, named <pid>-<seq>.frame. They are only
+    # touched from the single disk thread, and deleted once uploaded.
+
+    def _spill(self, frame: ArchivedFrame) -> None:
+        """Writes a frame to the spill directory, or drops it when full."""
+        header = json.dumps(
+            {
+                "key": frame.key,
+                "content_type": frame.content_type,
+                "metadata": frame.metadata,
+            }
+        ).encode()
+        content = header + b"\n" + frame.data
+        if self.spilled_bytes + len(content) > self.spill_max_bytes:
+            frames_dropped.inc()
+            return
+        path = self.spill_dir / f"{os.getpid()}-{next(self._spill_seq)}{SPILL_SUFFIX}"
+        try:
+            path.write_bytes(content)
+        except OSError as exc:
+            frames_dropped.inc()
+            logger.warning(f"Spilling {frame.key} failed: {exc}")
+            return
+        frames_spilled.inc()
+        self.spilled_bytes += len(content)
+        self._spilled.append(path)
+
+    def _read_spilled(self, path: Path) -> Optional[ArchivedFrame]:
+        try:
+            header, _, data = path.read_bytes().partition(b"\n")
+            fields = json.loads(header)
+        except (OSError, ValueError) as exc:
+            logger.warning(f"Dropping unreadable spilled frame {path.name}: {exc}")
+            frames_dropped.inc()
+            self._remove_spilled(path)
+            return None
+        return ArchivedFrame(
+            fields["key"], data, fields["content_type"], fields["metadata"]
+        )
+
+    def _remove_spilled(self, path: Path) -> None:
+        try:
+            self.spilled_bytes -= path.stat().st_size
+            path.unlink()
+        except OSError:
+            pass
+
+    def _claim_leftovers(self) -> None:
+        """Takes over frames spilled by workers that are no longer running."""
+        leftovers = sorted(
+            self.spill_dir.glob(f"*{SPILL_SUFFIX}"), key=lambda path: path.name
+        )
+        for path in leftovers:
+            pid = int(path.name.split("-", 1)[0])
+            if pid != os.getpid() and _process_alive(pid):
+                continue
+            claimed = path.with_name(
+                f"{os.getpid()}-{next(self._spill_seq)}{SPILL_SUFFIX}"
+            )
+            try:
+                os.rename(path, claimed)
+                self.spilled_bytes += claimed.stat().st_size
+            except OSError:
+                # Claimed by another worker starting at the same time
+                continue
+            self._spilled.append(claimed)
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+frame_archiver = FrameArchiver(
+    bucket=settings.frame_archive_bucket or settings.s3_bucket,
+    prefix=settings.frame_archive_prefix,
+    queue_size=settings.frame_archive_queue_size,
+    spill_dir=Path(
+        settings.frame_archive_spill_dir
+        or Path(tempfile.gettempdir()) / "insperion-frame-archive"
+    ),
+    spill_max_bytes=settings.frame_archive_spill_max_bytes,
+    uploaders=settings.frame_archive_uploaders,
+    part_bytes=settings.frame_archive_part_bytes,
+    part_concurrency=settings.frame_archive_part_concurrency,
+)
+metrics.gauge("archive.queue_depth", lambda: frame_archiver.queue_depth)
+metrics.gauge("archive.spilled_frames", lambda: frame_archiver.spilled_frames)
+metrics.gauge("archive.spilled_bytes", lambda: frame_archiver.spilled_bytes)
+metrics.gauge("archive.bytes_per_second", frame_archiver.bytes_per_second)
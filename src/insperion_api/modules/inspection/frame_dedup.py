@@ -0,0 +1,85 @@
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+DHASH_SIZE = 8
+
+frames_checked = metrics.counter("inspection.dedup.frames")
+frames_reused = metrics.counter("inspection.dedup.reused")
+hash_latency = metrics.latency("inspection.dedup.hash")
+metrics.gauge(
+    "inspection.dedup.skip_rate",
+    lambda: frames_reused.value / frames_checked.value if frames_checked.value else 0.0,
+)
+
+
+def dhash(image: np.ndarray) -> int:
+    """
+    64-bit difference hash: shrink to 9x8 grayscale and compare horizontally
+    adjacent pixels. Visually near-identical frames differ in only a few bits.
+    """
+    start = time.perf_counter()
+    # A cheap linear pre-shrink first: INTER_AREA over a full frame costs ms
+    small = cv2.resize(
+        image,
+        ((DHASH_SIZE + 1) * 8, DHASH_SIZE * 8),
+        interpolation=cv2.INTER_LINEAR,
+    )
+    small = cv2.resize(
+        small, (DHASH_SIZE + 1, DHASH_SIZE), interpolation=cv2.INTER_AREA
+    )
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    bits = small[:, 1:] > small[:, :-1]
+    frame_hash = int.from_bytes(np.packbits(bits).tobytes(), "big")
+    hash_latency.observe((time.perf_counter() - start) * 1000)
+    return frame_hash
+
+
+class FrameDeduplicator:
+    """
+    Per-session cache of the last inferred frame's hash and detections.
+    Frames within ``threshold`` bits of it reuse those detections instead
+    of running the model, up to ``max_reuse`` frames in a row.
+    """
+
+    def __init__(
+        self,
+        threshold: int = settings.frame_dedup_threshold,
+        max_reuse: int = settings.frame_dedup_max_reuse,
+    ) -> None:
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self._last_hash: Optional[int] = None
+        self._last_detections: Optional[Detections] = None
+        self._reused_in_row = 0
+        self.checked = 0
+        self.reused = 0
+
+    def lookup(self, frame_hash: int) -> Optional[Detections]:
+        """Returns the cached detections if this frame is a near duplicate."""
+        self.checked += 1
+        frames_checked.inc()
+        if (
+            self._last_hash is None
+            or self._reused_in_row >= self.max_reuse
+            or (frame_hash ^ self._last_hash).bit_count() > self.threshold
+        ):
+            return None
+
+        self._reused_in_row += 1
+        self.reused += 1
+        frames_reused.inc()
+        return self._last_detections
+
+    def store(self, frame_hash: int, detections: Detections) -> None:
+        """Remembers the frame that was actually inferred."""
+        self._last_hash = frame_hash
+        self._last_detections = detections
+        self._reused_in_row = 0
@@ -0,0 +1,72 @@
+import math
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from insperion_api.utils.common.logger import logger
+
+
+class InspectionParams(NamedTuple):
+    """
+    Inference parameters of one inspection type. Hashable, so frames of
+    sessions bound to the same type can be batched together.
+    """
+
+    # Class ids to detect, None for every class the model knows
+    classes: Optional[tuple[int, ...]] = None
+    min_confidence: float = 0.0
+    # Region of interest as fractions of the frame: [x1, y1, x2, y2]
+    roi: Optional[tuple[float, float, float, float]] = None
+    # Model registry key, None for the default model
+    model: Optional[str] = None
+
+    @classmethod
+    def from_config(
+        cls, entry: dict, names: dict[int, str], model: Optional[str] = None
+    ) -> "InspectionParams":
+        """
+        Builds the parameters from an ``inspection_types`` config entry, e.g.
+        ``{"model": "tyre", "classes": ["wheel", "tyre"], "min_confidence": 0.4,
+        "roi": [0, 0.5, 1, 1]}``. Classes may be given by id or by name, of
+        the model the entry runs on (its ``names``).
+        """
+        classes = None
+        if entry.get("classes") is not None:
+            ids_by_name = {name: cls_id for cls_id, name in names.items()}
+            class_ids = set()
+            for class_ref in entry["classes"]:
+                if isinstance(class_ref, str):
+                    cls_id = ids_by_name.get(class_ref)
+                else:
+                    cls_id = int(class_ref)
+                if cls_id is None or cls_id not in names:
+                    logger.warning(
+                        f"Ignoring unknown class in inspection config: {class_ref}"
+                    )
+                    continue
+                class_ids.add(cls_id)
+            classes = tuple(sorted(class_ids))
+
+        roi = None
+        if entry.get("roi") is not None:
+            x1, y1, x2, y2 = (float(value) for value in entry["roi"])
+            if not 0 <= x1 < x2 <= 1 or not 0 <= y1 < y2 <= 1:
+                raise ValueError(
+                    f"Invalid inspection region of interest: {entry['roi']}"
+                )
+            roi = (x1, y1, x2, y2)
+
+        return cls(classes, float(entry.get("min_confidence", 0.0)), roi, model)
+
+    def crop(self, image: np.ndarray) -> tuple[np.ndarray, tuple[int, int]]:
+        """
+        The region of interest of a frame (a view, no copy) and its
+        (left, top) offset in the frame.
+        """
+        if self.roi is None:
+            return image, (0, 0)
+        height, width = image.shape[:2]
+        x1, y1, x2, y2 = self.roi
+        left, top = int(x1 * width), int(y1 * height)
+        right, bottom = math.ceil(x2 * width), math.ceil(y2 * height)
+        return image[top:bottom, left:right], (left, top)
@@ -0,0 +1,296 @@
+import asyncio
+import gc
+import os
+import threading
+import time
+import weakref
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Optional
+
+from insperion_api.modules.inspection.engines import (
+    InferenceEngine,
+    build_engine,
+    onnx_model_path,
+)
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.memory import (
+    describe_memory,
+    memory_breakdown,
+    rss_bytes,
+)
+
+DEFAULT_MODEL = "default"
+
+
+class ModelRegistry:
+    """
+    Loads YOLO models on first use, once per worker process, and hands out
+    shared references to their inference engines to the inspection
+    controllers.
+
+    Models are keyed by name (``DEFAULT_MODEL`` or a ``YOLO_MODELS`` key,
+    which may simply be an inspection type). At most ``max_models`` models,
+    and at most ``max_memory_mb`` of their estimated memory, stay resident;
+    the least recently used ones are evicted first. The default and
+    preloaded models are never evicted, nor are models a session still
+    holds, since dropping them would not free their memory and the next
+    session would load a second copy. Concurrent first uses of the same
+    model share a single load, and loads run one at a time so each one's
+    memory growth can be put down to its model.
+    """
+
+    def __init__(self, max_models: int, max_memory_mb: int) -> None:
+        self.max_models = max(1, max_models)
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self._models: dict[str, InferenceEngine] = {}
+        # Resident memory grown by loading each model, as its footprint
+        self._footprints: dict[str, int] = {}
+        self._loading: dict[str, Future] = {}
+        # Models taken out for eviction, until a collection shows they are free
+        self._evicting: dict[str, weakref.ref] = {}
+        # Models loaded without their warm-up (before the fork)
+        self._cold: set[str] = set()
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        """True once the preloaded models are loaded and warmed up."""
+        return self._ready
+
+    def _model_paths(self) -> dict[str, Path]:
+        paths = {name: Path(path) for name, path in settings.yolo_models.items()}
+        paths[DEFAULT_MODEL] = Path(settings.yolo_model_path)
+        return paths
+
+    def has(self, name: str) -> bool:
+        """Whether a model with this name is configured."""
+        return name in self._model_paths()
+
+    def version(self, name: Optional[str] = None) -> str:
+        """
+        Identifies the weights a model name serves (file, size and mtime),
+        without loading them, e.g. to key cached results.
+        """
+        name = name or DEFAULT_MODEL
+        path = self._model_paths()[name]
+        try:
+            stat = path.stat()
+        except OSError:
+            return f"{name}:{path.name}"
+        return f"{name}:{path.name}:{stat.st_size}:{stat.st_mtime_ns}"
+
+    def _warm_up(self, name: str, engine: InferenceEngine) -> None:
+        """Runs dummy inferences so the first real frame does not pay for them."""
+        engine.warm_up(settings.yolo_warmup_runs, settings.yolo_warmup_image_size)
+        logger.info(
+            f"Model '{name}' warmed up with {settings.yolo_warmup_runs} inference(s)"
+        )
+
+    def _load(self, name: str, path: Path, warm_up: bool) -> InferenceEngine:
+        if not path.exists():
+            raise FileNotFoundError(
+                f"Model not found: {path} {os.getcwd()}, {','.join(os.listdir(os.getcwd()))}"
+            )
+        engine = build_engine(path)
+        if warm_up:
+            self._warm_up(name, engine)
+        else:
+            self._cold.add(name)
+        return engine
+
+    @staticmethod
+    def _pinned() -> set[str]:
+        return {DEFAULT_MODEL, *settings.yolo_preload_models}
+
+    def _over_limits(self) -> bool:
+        return len(self._models) > self.max_models or (
+            self.max_memory > 0 and sum(self._footprints.values()) > self.max_memory
+        )
+
+    def _evict(self, keep: str) -> None:
+        """
+        Drops the least recently used models, skipping pinned ones and ones
+        still in use, until within the limits. The garbage collection that
+        tells whether a model is still in use runs outside the lock, which
+        the event loop takes too.
+        """
+        with self._lock:
+            candidates = sorted(
+                (
+                    name
+                    for name in self._models
+                    if name != keep and name not in self._pinned()
+                ),
+                key=lambda name: self._models[name].last_used,
+            )
+        for name in candidates:
+            with self._lock:
+                if not self._over_limits():
+                    break
+                if name not in self._models:
+                    continue
+                dropped = self._evicting[name] = weakref.ref(self._models.pop(name))
+
+            gc.collect()
+
+            with self._lock:
+                del self._evicting[name]
+                if (engine := dropped()) is not None:
+                    # A session still holds it: keep sharing this copy
+                    self._models[name] = engine
+                    continue
+                if name in self._models:
+                    # Freed, but loaded again in the meantime
+                    continue
+                footprint = self._footprints.pop(name, 0)
+            logger.info(f"Evicted model '{name}' (~{footprint / 1024 / 1024:.0f} MB)")
+
+        with self._lock:
+            if self._over_limits():
+                logger.warning(
+                    f"{len(self._models)} models resident over the limits, "
+                    f"the others being pinned or in use"
+                )
+
+    def get(self, name: Optional[str] = None, warm_up: bool = True) -> InferenceEngine:
+        """
+        Returns the shared engine for a model (the default one for None),
+        loading it on first use (blocking), and warming it up unless
+        ``warm_up`` is False. Only one thread loads a given model, the
+        others wait for it.
+        """
+        name = name or DEFAULT_MODEL
+        with self._lock:
+            engine = self._models.get(name)
+            if engine is None and name in self._evicting:
+                # Being evicted but still alive: put the same copy back
+                engine = self._evicting[name]()
+                if engine is not None:
+                    self._models[name] = engine
+            if engine is not None:
+                engine.last_used = time.monotonic()
+                return engine
+            future = self._loading.get(name)
+            loader = future is None
+            if loader:
+                future = self._loading[name] = Future()
+
+        if not loader:
+            return future.result()
+
+        try:
+            paths = self._model_paths()
+            if name not in paths:
+                raise KeyError(f"Unknown model: {name}")
+            with self._load_lock:
+                rss_before = rss_bytes()
+                engine = self._load(name, paths[name], warm_up)
+                footprint = max(0, rss_bytes() - rss_before)
+        except BaseException as exc:
+            with self._lock:
+                del self._loading[name]
+            future.set_exception(exc)
+            raise
+
+        with self._lock:
+            self._models[name] = engine
+            self._footprints[name] = footprint
+            del self._loading[name]
+        future.set_result(engine)
+        logger.info(f"Model '{name}' resident (~{footprint / 1024 / 1024:.0f} MB)")
+        self._evict(keep=name)
+        return engine
+
+    async def aget(self, name: Optional[str] = None) -> InferenceEngine:
+        """``get`` without blocking the event loop when the model must load."""
+        if (name or DEFAULT_MODEL) in self._models:
+            return self.get(name)
+        return await asyncio.to_thread(self.get, name)
+
+    def load_all(self, warm_up: bool = True) -> None:
+        """
+        Loads the default and preloaded models (blocking), and warms up
+        those not warmed up yet unless ``warm_up`` is False.
+        """
+        for name in (DEFAULT_MODEL, *settings.yolo_preload_models):
+            engine = self.get(name, warm_up)
+            if warm_up and name in self._cold:
+                self._warm_up(name, engine)
+                self._cold.discard(name)
+        self._ready = warm_up
+
+    def preload(self) -> None:
+        """
+        Loads the models in the gunicorn master (with ``--preload``) before
+        the workers are forked, so they share the weights copy-on-write
+        instead of each loading its own copy.
+
+        Each model also runs one inference here, on a single thread, so the
+        workers share the fused weights and the predictor it sets up rather
+        than each building (and so copying) them on its first frame. With
+        one thread torch runs it inline, without starting the OpenMP/MKL
+        thread pools that do not survive a fork; each worker still warms the
+        models up in its lifespan, after sizing its own thread pools.
+
+        ONNX Runtime sessions do not survive a fork: with that backend only
+        the export (and quantization) is done up front, each worker still
+        creates its own sessions.
+        """
+        start = time.perf_counter()
+        if settings.inference_backend == "onnx":
+            paths = self._model_paths()
+            for name in (DEFAULT_MODEL, *settings.yolo_preload_models):
+                onnx_model_path(paths[name])
+        else:
+            import torch
+
+            torch.set_num_threads(1)
+            self.load_all(warm_up=False)
+            for name in (DEFAULT_MODEL, *settings.yolo_preload_models):
+                self._models[name].warm_up(1, settings.yolo_warmup_image_size)
+        # Keep the garbage collector from touching (and so copying) the
+        # preloaded objects in every worker
+        gc.collect()
+        gc.freeze()
+        logger.info(
+            f"Models preloaded before fork in {time.perf_counter() - start:.1f}s "
+            f"({describe_memory(memory_breakdown())})"
+        )
+
+    def after_fork(self) -> None:
+        """Resets the locking state inherited by a forked worker."""
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loading = {}
+        self._evicting = {}
+
+    async def startup(self) -> None:
+        """Loads models off the event loop; called from the app lifespan hook."""
+        await asyncio.to_thread(self.load_all)
+
+    def status(self) -> dict:
+        return {
+            "ready": self._ready,
+            "models": list(self._models),
+            "available": sorted(self._model_paths()),
+        }
+
+    def engine_stats(self) -> dict:
+        """Backend, inference latency and memory of every loaded model."""
+        return {
+            name: {
+                **engine.stats(),
+                "memory_mb": round(self._footprints.get(name, 0) / 1024 / 1024, 1),
+            }
+            for name, engine in list(self._models.items())
+        }
+
+
+model_registry = ModelRegistry(
+    max_models=settings.yolo_max_loaded_models,
+    max_memory_mb=settings.yolo_max_models_memory_mb,
+)
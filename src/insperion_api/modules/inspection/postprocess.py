@@ -0,0 +1,57 @@
+from typing import Optional
+
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.settings.config import settings
+
+
+def filter_detections(
+    detections: Detections,
+    min_confidence: Optional[float] = None,
+    top_k: Optional[int] = None,
+) -> Detections:
+    """
+    Applies the confidence floor and keeps at most ``top_k`` detections
+    (highest confidence first), before anything is serialized.
+    """
+    min_confidence = (
+        settings.inference_min_confidence if min_confidence is None else min_confidence
+    )
+    top_k = settings.inference_top_k if top_k is None else top_k
+
+    keep = None
+    if min_confidence > 0:
+        keep = np.flatnonzero(detections.confidence >= min_confidence)
+    if top_k > 0:
+        candidates = (
+            keep if keep is not None else np.arange(detections.confidence.shape[0])
+        )
+        if candidates.shape[0] > top_k:
+            order = np.argsort(-detections.confidence[candidates], kind="stable")
+            keep = candidates[order[:top_k]]
+    if keep is None:
+        return detections
+    return detections.take(keep)
+
+
+def format_detections(detections: Detections, names: dict[int, str]) -> dict:
+    """Formats detection arrays into a serializable JSON dictionary."""
+    class_ids = detections.class_id.tolist()
+    results = [
+        {
+            "class_id": cls_id,
+            "class_name": names[cls_id],
+            "confidence": conf,
+            "box": box,
+        }
+        for cls_id, conf, box in zip(
+            class_ids,
+            detections.confidence.tolist(),
+            detections.xyxy.tolist(),
+        )
+    ]
+    if detections.track_id is not None:
+        for result, track_id in zip(results, detections.track_id.tolist()):
+            result["track_id"] = track_id
+    return {"detections": results}
@@ -0,0 +1,413 @@
+import asyncio
+import itertools
+import multiprocessing as mp
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from multiprocessing import connection, shared_memory
+from typing import Any, Optional
+
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.inspection_params import InspectionParams
+from insperion_api.modules.inspection.timings import FrameTimings
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.metrics import metrics
+
+# Shared-memory slots per inference process: one being inferred, one being filled
+SLOTS_PER_PROCESS = 2
+READY = "__ready__"
+FAILED = "__failed__"
+# How often the reader thread picks up replaced processes and checks for stop
+READER_INTERVAL_S = 0.5
+
+
+def _worker_main(
+    torch_threads: int,
+    slot_names: list[str],
+    task_queue: mp.Queue,
+    results: connection.Connection,
+) -> None:
+    """
+    Entry point of a dedicated inference process. Reads frames out of the
+    shared-memory slots and sends back only the small detection arrays,
+    with how long the forward pass took. Both the task queue and the
+    result pipe are this process's own, so it dying never leaves a lock
+    held that other processes wait on.
+    """
+    import cv2
+    import torch
+
+    from insperion_api.modules.inspection.model_registry import model_registry
+
+    torch.set_num_threads(torch_threads)
+    cv2.setNumThreads(1)
+
+    # Load the default model up front, others on first use
+    try:
+        default_engine = model_registry.get()
+    except Exception as exc:
+        results.send((FAILED, os.getpid(), repr(exc)))
+        return
+    slots = [shared_memory.SharedMemory(name=name) for name in slot_names]
+    results.send((READY, os.getpid(), default_engine.names))
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+
+            task_id, slot_index, shape, dtype, pickled_frame, params = task
+            try:
+                engine = model_registry.get(None if params is None else params.model)
+                if shape is None:
+                    # Not a frame: a request for the model's class names
+                    results.send((task_id, engine.names, None, 0.0))
+                    continue
+                if slot_index is None:
+                    frame = pickled_frame
+                else:
+                    frame = np.ndarray(shape, dtype=dtype, buffer=slots[slot_index].buf)
+                start = time.perf_counter()
+                detections = engine.predict([frame], params)[0]
+                inference_ms = (time.perf_counter() - start) * 1000
+                # Release the view before the parent reuses the slot
+                del frame
+                results.send((task_id, detections, None, inference_ms))
+            except Exception as exc:
+                results.send((task_id, None, repr(exc), 0.0))
+    finally:
+        for slot in slots:
+            slot.close()
+
+
+@dataclass(eq=False)
+class _WorkerProcess:
+    process: Any
+    task_queue: mp.Queue
+    # Read end of the process's result pipe
+    results: connection.Connection
+    # Ids of the tasks handed to the process and not answered yet
+    tasks: set[int] = field(default_factory=set)
+    ready: bool = False
+
+
+class ProcessInferencePool:
+    """
+    Runs inference in a pool of dedicated processes so YOLO pre- and
+    post-processing never competes with the event loop for the GIL.
+
+    Decoded frames are copied into pre-allocated shared-memory slots instead
+    of being pickled; the number of free slots also bounds the frames in
+    flight. Frames larger than a slot fall back to being pickled.
+
+    Each process has its own task queue and result pipe, and tasks go to
+    the process with the fewest outstanding. A process dying fails the
+    frames handed to it and frees their slots; one that dies after
+    becoming ready is replaced. ``start`` fails if a process cannot load
+    its model.
+    """
+
+    def __init__(self, processes: int, torch_threads: int, slot_bytes: int) -> None:
+        self.processes = max(1, processes)
+        self.torch_threads = max(1, torch_threads)
+        self.slot_bytes = slot_bytes
+        self.names: dict[int, str] = {}
+        self._model_names: dict[Optional[str], dict[int, str]] = {}
+
+        self._context = mp.get_context("spawn")
+        self._workers: list[_WorkerProcess] = []
+        self._slots: list[shared_memory.SharedMemory] = []
+        self._free_slots: Optional[asyncio.Queue] = None
+        self._reader: Optional[threading.Thread] = None
+        self._reading = False
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: dict[
+            int, tuple[asyncio.Future, Optional[int], _WorkerProcess]
+        ] = {}
+        self._task_ids = itertools.count()
+        self._ready = False
+        self._startup: Optional[asyncio.Future] = None
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    @property
+    def running(self) -> bool:
+        return self.ready and bool(self._workers)
+
+    @property
+    def in_flight(self) -> int:
+        """Frames handed to the inference processes and not answered yet."""
+        return len(self._pending)
+
+    @property
+    def free_slots(self) -> int:
+        return 0 if self._free_slots is None else self._free_slots.qsize()
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._startup = self._loop.create_future()
+
+        slot_count = self.processes * SLOTS_PER_PROCESS
+        self._slots = [
+            shared_memory.SharedMemory(create=True, size=self.slot_bytes)
+            for _ in range(slot_count)
+        ]
+        self._free_slots = asyncio.Queue()
+        for index in range(slot_count):
+            self._free_slots.put_nowait(index)
+
+        self._workers = [self._spawn() for _ in range(self.processes)]
+        self._reading = True
+        self._reader = threading.Thread(target=self._read_results, daemon=True)
+        self._reader.start()
+        try:
+            await self._startup
+        except Exception:
+            await self.stop()
+            raise
+        self._ready = True
+        logger.info(
+            f"Inference process pool ready (processes={self.processes}, "
+            f"torch_threads={self.torch_threads}, slots={slot_count})"
+        )
+
+    def _spawn(self) -> _WorkerProcess:
+        task_queue = self._context.Queue()
+        results, child_results = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=_worker_main,
+            args=(
+                self.torch_threads,
+                [slot.name for slot in self._slots],
+                task_queue,
+                child_results,
+            ),
+            daemon=True,
+        )
+        process.start()
+        # Only the child writes, so the pipe hits EOF once it is gone
+        child_results.close()
+        return _WorkerProcess(process, task_queue, results)
+
+    async def stop(self) -> None:
+        if not self._slots:
+            return
+        workers, self._workers = self._workers, []
+        self._ready = False
+        self._reading = False
+        for worker in workers:
+            worker.task_queue.put(None)
+        for worker in workers:
+            await asyncio.to_thread(worker.process.join, 10)
+            if worker.process.is_alive():
+                worker.process.terminate()
+        if self._reader is not None:
+            await asyncio.to_thread(self._reader.join)
+            self._reader = None
+        for worker in workers:
+            worker.results.close()
+            worker.task_queue.close()
+
+        # Fail whatever never came back
+        for future, _, _ in self._pending.values():
+            if not future.done():
+                future.set_exception(RuntimeError("Inference process pool stopped"))
+        self._pending.clear()
+
+        for slot in self._slots:
+            slot.close()
+            slot.unlink()
+        self._slots = []
+
+    async def submit(
+        self,
+        frame: np.ndarray,
+        params: Optional[InspectionParams] = None,
+        timings: Optional[FrameTimings] = None,
+    ) -> Detections:
+        """
+        Hands a decoded frame to the least busy inference process. The forward
+        pass is recorded as the ``inference`` stage, the rest of the round
+        trip (waiting for a slot and a process) as ``queue``.
+        """
+        if not self.running:
+            raise RuntimeError("Inference process pool is not running")
+
+        start = time.perf_counter()
+        slot_index = await self._free_slots.get()
+        task_id = next(self._task_ids)
+        frame = np.ascontiguousarray(frame)
+        if frame.nbytes <= self.slot_bytes:
+            view = np.ndarray(
+                frame.shape, dtype=frame.dtype, buffer=self._slots[slot_index].buf
+            )
+            view[...] = frame
+            task = (task_id, slot_index, frame.shape, frame.dtype.str, None, params)
+        else:
+            task = (task_id, None, frame.shape, frame.dtype.str, frame, params)
+
+        # The slot is only released once the worker has answered, even if the
+        # caller goes away in the meantime
+        detections, inference_ms = await self._dispatch(task_id, task, slot_index)
+
+        timings = timings or FrameTimings()
+        timings.record("inference", inference_ms)
+        timings.record(
+            "queue", max(0.0, (time.perf_counter() - start) * 1000 - inference_ms)
+        )
+        return detections
+
+    async def model_names(self, model: Optional[str]) -> dict[int, str]:
+        """Class names of a model, asking an inference process to load it."""
+        if model is None:
+            return self.names
+        if model not in self._model_names:
+            task_id = next(self._task_ids)
+            params = InspectionParams(model=model)
+            task = (task_id, None, None, None, None, params)
+            self._model_names[model], _ = await self._dispatch(task_id, task, None)
+        return self._model_names[model]
+
+    def _dispatch(
+        self, task_id: int, task: tuple, slot_index: Optional[int]
+    ) -> asyncio.Future:
+        """
+        Queues a task on the process with the fewest outstanding, preferring
+        ones that have loaded their model over replacements still starting.
+        """
+        if not self._workers:
+            if slot_index is not None:
+                self._free_slots.put_nowait(slot_index)
+            raise RuntimeError("No inference process is running")
+        worker = min(self._workers, key=lambda w: (not w.ready, len(w.tasks)))
+        future = self._loop.create_future()
+        self._pending[task_id] = (future, slot_index, worker)
+        worker.tasks.add(task_id)
+        worker.task_queue.put(task)
+        return future
+
+    def _read_results(self) -> None:
+        """
+        Waits on the result pipes and the process sentinels together, handing
+        results back to the event loop and reporting a process as soon as it
+        exits, after whatever it sent before.
+        """
+        exited: set[_WorkerProcess] = set()
+        while self._reading:
+            current = set(self._workers)
+            # Reported already, waiting for the event loop to drop them
+            exited &= current
+            waitables = {}
+            for worker in current - exited:
+                waitables[worker.results] = worker
+                waitables[worker.process.sentinel] = worker
+            for ready in connection.wait(list(waitables), timeout=READER_INTERVAL_S):
+                worker = waitables[ready]
+                if worker in exited:
+                    continue
+                self._drain(worker)
+                if ready == worker.process.sentinel:
+                    exited.add(worker)
+                    self._loop.call_soon_threadsafe(self._on_exit, worker)
+
+    def _drain(self, worker: _WorkerProcess) -> None:
+        try:
+            while worker.results.poll():
+                message = worker.results.recv()
+                self._loop.call_soon_threadsafe(self._on_message, message)
+        except (EOFError, OSError):
+            # The process is gone; its sentinel reports it
+            pass
+
+    def _worker(self, pid: int) -> Optional[_WorkerProcess]:
+        for worker in self._workers:
+            if worker.process.pid == pid:
+                return worker
+        return None
+
+    def _on_message(self, message: tuple) -> None:
+        if message[0] == READY:
+            _, pid, names = message
+            self.names = names
+            worker = self._worker(pid)
+            if worker is not None:
+                worker.ready = True
+            logger.info(f"Inference process {pid} ready")
+            if not self._startup.done() and all(w.ready for w in self._workers):
+                self._startup.set_result(None)
+            return
+        if message[0] == FAILED:
+            _, pid, error = message
+            logger.error(f"Inference process {pid} could not load its model: {error}")
+            if not self._startup.done():
+                self._startup.set_exception(
+                    RuntimeError(f"Inference process failed to start: {error}")
+                )
+            return
+
+        task_id, payload, error, inference_ms = message
+        self._finish(task_id, payload, error, inference_ms)
+
+    def _on_exit(self, worker: _WorkerProcess) -> None:
+        """Fails the tasks of an inference process that died, and replaces it."""
+        if worker not in self._workers:
+            return
+        self._workers = [w for w in self._workers if w is not worker]
+        worker.process.join()
+        pid, exitcode = worker.process.pid, worker.process.exitcode
+        for task_id in tuple(worker.tasks):
+            self._finish(task_id, None, f"process exited with code {exitcode}", 0.0)
+        worker.results.close()
+        # Nobody reads what is left in the queue, don't wait to flush it
+        worker.task_queue.cancel_join_thread()
+        worker.task_queue.close()
+        if not self._startup.done():
+            self._startup.set_exception(
+                RuntimeError(
+                    f"Inference process {pid} exited with code {exitcode} "
+                    f"before it was ready"
+                )
+            )
+            return
+        logger.error(f"Inference process {pid} exited with code {exitcode}")
+        # Only replace processes that got as far as loading their model, so
+        # one failing to start is not respawned over and over
+        if worker.ready and self._ready:
+            self._workers = [*self._workers, self._spawn()]
+
+    def _finish(
+        self,
+        task_id: int,
+        payload: Any,
+        error: Optional[str],
+        inference_ms: float,
+    ) -> None:
+        pending = self._pending.pop(task_id, None)
+        if pending is None:
+            return
+        future, slot_index, worker = pending
+        worker.tasks.discard(task_id)
+        if slot_index is not None:
+            self._free_slots.put_nowait(slot_index)
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(RuntimeError(f"Inference process failed: {error}"))
+        else:
+            future.set_result((payload, inference_ms))
+
+
+inference_pool = ProcessInferencePool(
+    processes=settings.inference_processes,
+    torch_threads=settings.inference_torch_threads,
+    slot_bytes=settings.inference_shm_slot_bytes,
+)
+metrics.gauge("inspection.pool.in_flight", lambda: inference_pool.in_flight)
+metrics.gauge("inspection.pool.free_slots", lambda: inference_pool.free_slots)
@@ -0,0 +1,309 @@
+"""
+INT8 quantization of the ONNX export for CPU inference.
+
+Dynamic quantization needs no data and is built on first use. Static
+quantization calibrates activation ranges on sample frames and is built
+ahead of time with:
+
+    python -m insperion_api.modules.inspection.quantization --frames <dir>
+
+which also writes a report comparing the INT8 model against FP32.
+"""
+
+import argparse
+import fcntl
+import json
+import os
+import re
+import time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import cv2
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections, box_iou
+from insperion_api.modules.inspection.engines import (
+    OnnxEngine,
+    export_onnx,
+    weights_digest,
+)
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+
+QUANTIZATION_MODES = ("dynamic", "static")
+# Only the heavy ops are quantized, and not those of the box regression
+# head, whose distribution bins lose too much precision in INT8
+QUANTIZED_OP_TYPES = ["Conv", "MatMul"]
+# Bumped when what is quantized changes, so cached INT8 models are rebuilt
+QUANTIZATION_RECIPE = 3
+# Layers of the ultralytics export are named /model.<index>/..., the Detect
+# head being the last; cv2 are its box branches and dfl decodes them
+LAYER_NAME = re.compile(r"/model\.(\d+)/")
+BOX_HEAD_BRANCHES = ("cv2.", "dfl/")
+FRAME_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp"}
+
+
+def quantized_path(model_path: Path, mode: str) -> Path:
+    """Where the INT8 model of some weights is cached: next to the weights."""
+    digest = weights_digest(model_path)
+    name = f"{model_path.stem}-{digest}.{mode}-int8-r{QUANTIZATION_RECIPE}.onnx"
+    return model_path.parent / name
+
+
+def _import_quantization():
+    try:
+        from onnxruntime import quantization
+    except ImportError as exc:
+        raise RuntimeError(
+            "ONNX_QUANTIZATION requires the onnx and onnxruntime packages"
+        ) from exc
+    return quantization
+
+
+def _preprocessed(fp32_path: Path, output_path: Path) -> Path:
+    """Runs ORT's recommended shape inference and graph optimization pass."""
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    try:
+        # Symbolic shape inference cannot resolve the Detect head's dynamic
+        # shapes: it fails the whole pass and leaves its partial model in the
+        # working directory. The ONNX shape inference that follows suffices.
+        quant_pre_process(str(fp32_path), str(output_path), skip_symbolic_shape=True)
+        return output_path
+    except Exception as exc:
+        logger.warning(f"Quantization pre-processing skipped: {exc}")
+        return fp32_path
+
+
+def box_head_nodes(onnx_path: Path) -> list[str]:
+    """Names of the box regression ops of the Detect head, kept in FP32."""
+    import onnx
+
+    nodes = [
+        node
+        for node in onnx.load(str(onnx_path), load_external_data=False).graph.node
+        if node.op_type in QUANTIZED_OP_TYPES
+    ]
+    layers = [
+        int(match.group(1)) for node in nodes if (match := LAYER_NAME.match(node.name))
+    ]
+    if not layers:
+        logger.warning(f"No Detect head found in {onnx_path}, quantizing all of it")
+        return []
+    head = f"/model.{max(layers)}/"
+    return [
+        node.name
+        for node in nodes
+        if node.name.startswith(tuple(head + branch for branch in BOX_HEAD_BRANCHES))
+    ]
+
+
+def read_frames(frames_dir: Path, limit: int) -> list[np.ndarray]:
+    """Decoded sample frames from a directory, in name order."""
+    paths = sorted(
+        path for path in frames_dir.iterdir() if path.suffix.lower() in FRAME_EXTENSIONS
+    )[:limit]
+    frames = [cv2.imread(str(path), cv2.IMREAD_COLOR) for path in paths]
+    frames = [frame for frame in frames if frame is not None]
+    if not frames:
+        raise ValueError(f"No readable frames in {frames_dir}")
+    return frames
+
+
+def _calibration_reader(engine: OnnxEngine, frames: list[np.ndarray]):
+    """Feeds preprocessed frames to the static quantization calibrator."""
+    quantization = _import_quantization()
+
+    class FrameCalibrationReader(quantization.CalibrationDataReader):
+        def __init__(self) -> None:
+            self._batches: Iterator[np.ndarray] = (
+                engine._preprocess([frame])[0] for frame in frames
+            )
+
+        def get_next(self) -> Optional[dict]:
+            batch = next(self._batches, None)
+            return None if batch is None else {engine.input_name: batch}
+
+    return FrameCalibrationReader()
+
+
+def quantize(
+    model_path: Path,
+    mode: str,
+    frames: Optional[list[np.ndarray]] = None,
+    force: bool = False,
+) -> Path:
+    """
+    Builds the INT8 model of some weights (once; cached next to them) and
+    returns its path. Static quantization needs calibration ``frames``.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode: {mode}")
+    output_path = quantized_path(model_path, mode)
+    if output_path.exists() and not force:
+        return output_path
+    if mode == "static" and not frames:
+        raise RuntimeError(
+            f"No static INT8 model for {model_path}: calibrate it with "
+            "python -m insperion_api.modules.inspection.quantization --frames <dir>"
+        )
+
+    quantization = _import_quantization()
+    fp32_path = export_onnx(model_path)
+
+    # Serialize the build across workers starting at the same time
+    with open(output_path.parent / f"{output_path.name}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if output_path.exists() and not force:
+            return output_path
+
+        logger.info(f"Quantizing {fp32_path} ({mode} INT8) to {output_path}")
+        staging_path = output_path.with_suffix(".tmp.onnx")
+        source_path = _preprocessed(fp32_path, output_path.with_suffix(".pre.onnx"))
+        excluded = box_head_nodes(source_path)
+        if mode == "dynamic":
+            quantization.quantize_dynamic(
+                str(source_path),
+                str(staging_path),
+                op_types_to_quantize=QUANTIZED_OP_TYPES,
+                nodes_to_exclude=excluded,
+                weight_type=quantization.QuantType.QInt8,
+            )
+        else:
+            fp32_engine = OnnxEngine(model_path, onnx_path=fp32_path)
+            quantization.quantize_static(
+                str(source_path),
+                str(staging_path),
+                _calibration_reader(fp32_engine, frames),
+                quant_format=quantization.QuantFormat.QDQ,
+                op_types_to_quantize=QUANTIZED_OP_TYPES,
+                nodes_to_exclude=excluded,
+                per_channel=True,
+                activation_type=quantization.QuantType.QUInt8,
+                weight_type=quantization.QuantType.QInt8,
+            )
+        os.replace(staging_path, output_path)
+        if source_path != fp32_path:
+            source_path.unlink(missing_ok=True)
+    return output_path
+
+
+def quantized_model(model_path: Path) -> Path:
+    """The INT8 model to serve for ``ONNX_QUANTIZATION``."""
+    return quantize(model_path, settings.onnx_quantization)
+
+
+def mean_average_precision(
+    predictions: list[Detections],
+    references: list[Detections],
+    iou_threshold: float = 0.5,
+) -> float:
+    """
+    mAP of ``predictions`` against ``references`` taken as ground truth,
+    with all-point interpolated AP per class.
+    """
+    classes = np.unique(np.concatenate([ref.class_id for ref in references]))
+    average_precisions = []
+    for cls_id in classes:
+        scores, hits, total = [], [], 0
+        for prediction, reference in zip(predictions, references):
+            truth = reference.xyxy[reference.class_id == cls_id]
+            mask = prediction.class_id == cls_id
+            boxes, confidence = prediction.xyxy[mask], prediction.confidence[mask]
+            total += truth.shape[0]
+
+            order = np.argsort(-confidence)
+            iou = box_iou(boxes[order], truth) if truth.shape[0] else None
+            matched = np.zeros(truth.shape[0], dtype=bool)
+            for rank, index in enumerate(order):
+                scores.append(confidence[index])
+                hit = False
+                if iou is not None:
+                    candidates = np.where(matched, -1.0, iou[rank])
+                    best = int(candidates.argmax())
+                    if candidates[best] >= iou_threshold:
+                        matched[best] = hit = True
+                hits.append(hit)
+        if total == 0:
+            continue
+
+        order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+        hits_sorted = np.asarray(hits, dtype=bool)[order]
+        true_positives = np.cumsum(hits_sorted)
+        false_positives = np.cumsum(~hits_sorted)
+        recall = np.concatenate(([0.0], true_positives / total, [1.0]))
+        precision = np.concatenate(
+            (
+                [1.0],
+                true_positives / np.maximum(true_positives + false_positives, 1),
+                [0.0],
+            )
+        )
+        precision = np.maximum.accumulate(precision[::-1])[::-1]
+        average_precisions.append(float(np.sum(np.diff(recall) * precision[1:])))
+
+    return float(np.mean(average_precisions)) if average_precisions else 1.0
+
+
+def _timed_predictions(
+    engine: OnnxEngine, frames: list[np.ndarray]
+) -> tuple[list[Detections], float]:
+    engine.warm_up(settings.yolo_warmup_runs, settings.yolo_warmup_image_size)
+    detections, start = [], time.perf_counter()
+    for frame in frames:
+        detections.extend(engine.predict([frame]))
+    return detections, (time.perf_counter() - start) * 1000 / len(frames)
+
+
+def compare(model_path: Path, int8_path: Path, frames: list[np.ndarray]) -> dict:
+    """
+    Latency of the INT8 model against FP32 on the same frames, and its
+    accuracy drift: mAP@0.5 of the INT8 detections with the FP32 ones as
+    reference (1.0 means identical detections).
+    """
+    fp32_engine = OnnxEngine(model_path, onnx_path=export_onnx(model_path))
+    int8_engine = OnnxEngine(model_path, onnx_path=int8_path)
+    fp32_detections, fp32_ms = _timed_predictions(fp32_engine, frames)
+    int8_detections, int8_ms = _timed_predictions(int8_engine, frames)
+
+    map50 = mean_average_precision(int8_detections, fp32_detections)
+    return {
+        "model": str(model_path),
+        "quantized_model": str(int8_path),
+        "frames": len(frames),
+        "fp32_mean_ms": round(fp32_ms, 3),
+        "int8_mean_ms": round(int8_ms, 3),
+        "speedup": round(fp32_ms / int8_ms, 3),
+        "map50_vs_fp32": round(map50, 4),
+        "map50_drift": round(1.0 - map50, 4),
+        "fp32_detections": sum(d.size for d in fp32_detections),
+        "int8_detections": sum(d.size for d in int8_detections),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Build an INT8 ONNX model and compare it against FP32."
+    )
+    parser.add_argument(
+        "--frames", type=Path, required=True, help="directory of sample frames"
+    )
+    parser.add_argument("--mode", choices=QUANTIZATION_MODES, default="static")
+    parser.add_argument("--weights", type=Path, default=Path(settings.yolo_model_path))
+    parser.add_argument("--max-frames", type=int, default=300)
+    parser.add_argument("--force", action="store_true", help="rebuild if cached")
+    args = parser.parse_args()
+
+    frames = read_frames(args.frames, args.max_frames)
+    int8_path = quantize(args.weights, args.mode, frames, force=args.force)
+    report = compare(args.weights, int8_path, frames)
+
+    report_path = int8_path.with_suffix(".report.json")
+    report_path.write_text(json.dumps(report, indent=2))
+    print(json.dumps(report, indent=2))
+    logger.info(f"Quantization report written to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
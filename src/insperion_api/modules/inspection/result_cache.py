@@ -0,0 +1,90 @@
+import hashlib
+import time
+from typing import Callable, Hashable, Optional
+
+import cachetools
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+# Approximate per-entry cost besides the arrays: key, tuple and dict slot
+ENTRY_OVERHEAD_BYTES = 256
+
+cache_hits = metrics.counter("inspection.result_cache.hits")
+cache_misses = metrics.counter("inspection.result_cache.misses")
+
+
+def _entry_size(detections: Detections) -> int:
+    return ENTRY_OVERHEAD_BYTES + sum(
+        array.nbytes for array in detections if array is not None
+    )
+
+
+class ResultCache:
+    """
+    Per-worker LRU cache of the detections of frames by the hash of their
+    raw bytes, so a frame sent again (a client retrying after a reconnect,
+    an image reprocessed in a batch) skips decoding and inference. Keys
+    also hold the model version and inference parameters, as the same bytes
+    give other detections under another model or inspection type.
+
+    Bounded by ``max_bytes`` of cached detections, least recently used
+    first, and entries expire after ``ttl_s``. A bound of 0 disables it.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl_s: float,
+        timer: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self._cache: Optional[cachetools.TTLCache] = None
+        if max_bytes > 0:
+            self._cache = cachetools.TTLCache(
+                maxsize=max_bytes, ttl=ttl_s, timer=timer, getsizeof=_entry_size
+            )
+
+    @property
+    def enabled(self) -> bool:
+        return self._cache is not None
+
+    @property
+    def size_bytes(self) -> int:
+        return 0 if self._cache is None else int(self._cache.currsize)
+
+    @property
+    def entries(self) -> int:
+        return 0 if self._cache is None else len(self._cache)
+
+    @staticmethod
+    def key(data: bytes, scope: Hashable) -> tuple:
+        """Cache key of a frame's bytes within a model/parameters scope."""
+        return hashlib.blake2b(data, digest_size=16).digest(), scope
+
+    def get(self, key: tuple) -> Optional[Detections]:
+        detections = self._cache.get(key)
+        if detections is None:
+            cache_misses.inc()
+        else:
+            cache_hits.inc()
+        return detections
+
+    def put(self, key: tuple, detections: Detections) -> None:
+        # Entries larger than the whole cache are silently skipped
+        if _entry_size(detections) <= self.max_bytes:
+            self._cache[key] = detections
+
+    @staticmethod
+    def hit_ratio() -> float:
+        lookups = cache_hits.value + cache_misses.value
+        return cache_hits.value / lookups if lookups else 0.0
+
+
+result_cache = ResultCache(
+    max_bytes=settings.result_cache_max_bytes, ttl_s=settings.result_cache_ttl_s
+)
+metrics.gauge("inspection.result_cache.hit_ratio", result_cache.hit_ratio)
+metrics.gauge("inspection.result_cache.bytes", lambda: result_cache.size_bytes)
+metrics.gauge("inspection.result_cache.entries", lambda: result_cache.entries)
@@ -0,0 +1,358 @@
+import asyncio
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import bindparam, select, update
+
+from insperion_api.core.constants.constants import InspectionStatus
+from insperion_api.core.models.vehicle import Inspection
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+from insperion_api.utils.common.metrics import metrics
+from insperion_api.utils.database.connections import get_async_engine
+from insperion_api.utils.database.session_context_manager import session_context
+
+# Statuses an inspection may move to from the write-behind buffer, and the
+# statuses it may move from. Anything else (e.g. a cancelled inspection)
+# keeps its status, though its results are still saved. A camera streaming
+# again after its inspection completed or failed puts it back in progress.
+STATUS_TRANSITIONS = {
+    InspectionStatus.IN_PROGRESS: (
+        InspectionStatus.PENDING,
+        InspectionStatus.ON_HOLD,
+        InspectionStatus.IN_PROGRESS,
+        InspectionStatus.COMPLETED,
+        InspectionStatus.FAILED,
+    ),
+    InspectionStatus.COMPLETED: (
+        InspectionStatus.PENDING,
+        InspectionStatus.IN_PROGRESS,
+    ),
+    InspectionStatus.FAILED: (
+        InspectionStatus.PENDING,
+        InspectionStatus.IN_PROGRESS,
+    ),
+}
+
+flushes = metrics.counter("results_writer.flushes")
+flushed_rows = metrics.counter("results_writer.rows")
+flush_errors = metrics.counter("results_writer.errors")
+flush_latency = metrics.latency("results_writer.flush")
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+
+
+@dataclass
+class InspectionSummary:
+    """
+    Running summary of the detections answered for one inspection: frame
+    count and, per class, how many boxes and frames it was detected in and
+    its highest confidence. Stored as is in ``Inspection.results``.
+    """
+
+    frames: int = 0
+    classes: dict[str, dict] = field(default_factory=dict)
+    first_frame_at: Optional[str] = None
+    last_frame_at: Optional[str] = None
+
+    @classmethod
+    def from_results(cls, results: Optional[dict]) -> "InspectionSummary":
+        """Resumes from the results saved by an earlier session, if any."""
+        if not isinstance(results, dict) or "frames" not in results:
+            return cls()
+        return cls(
+            frames=results["frames"],
+            classes={name: dict(stats) for name, stats in results["classes"].items()},
+            first_frame_at=results.get("first_frame_at"),
+            last_frame_at=results.get("last_frame_at"),
+        )
+
+    def merge(self, other: "InspectionSummary") -> None:
+        """Adds the frames summarized by ``other``."""
+        self.frames += other.frames
+        self.first_frame_at = min(
+            filter(None, (self.first_frame_at, other.first_frame_at)), default=None
+        )
+        self.last_frame_at = max(
+            filter(None, (self.last_frame_at, other.last_frame_at)), default=None
+        )
+        for name, other_stats in other.classes.items():
+            stats = self.classes.setdefault(
+                name, {"detections": 0, "frames": 0, "max_confidence": 0.0}
+            )
+            stats["detections"] += other_stats["detections"]
+            stats["frames"] += other_stats["frames"]
+            stats["max_confidence"] = max(
+                stats["max_confidence"], other_stats["max_confidence"]
+            )
+
+    def add(self, detections: Detections, names: dict[int, str]) -> None:
+        now = _now()
+        self.frames += 1
+        self.first_frame_at = self.first_frame_at or now
+        self.last_frame_at = now
+
+        class_ids, counts = np.unique(detections.class_id, return_counts=True)
+        for class_id, count in zip(class_ids.tolist(), counts.tolist()):
+            name = names.get(class_id, str(class_id))
+            confidence = float(
+                detections.confidence[detections.class_id == class_id].max()
+            )
+            stats = self.classes.setdefault(
+                name, {"detections": 0, "frames": 0, "max_confidence": 0.0}
+            )
+            stats["detections"] += count
+            stats["frames"] += 1
+            stats["max_confidence"] = round(max(stats["max_confidence"], confidence), 4)
+
+    def as_dict(self) -> dict:
+        return {
+            "frames": self.frames,
+            "classes": {name: dict(stats) for name, stats in self.classes.items()},
+            "first_frame_at": self.first_frame_at,
+            "last_frame_at": self.last_frame_at,
+        }
+
+
+@dataclass
+class _PendingInspection:
+    # Frames answered by this worker since the last flush
+    summary: InspectionSummary = field(default_factory=InspectionSummary)
+    status: InspectionStatus = InspectionStatus.IN_PROGRESS
+    # Sessions of this worker currently writing to the inspection
+    sessions: int = 0
+    dirty: bool = False
+
+
+class ResultsWriter:
+    """
+    Write-behind buffer for the results of inspections streamed over
+    /v1/inspect. Each answered frame only updates an in-memory summary of
+    the frames since the last flush; a background task merges the changed
+    summaries (and status) into the saved results every
+    ``flush_interval_ms``, or sooner once ``max_records`` frames are
+    waiting, so the database is never on a frame's path. Closing a session
+    flushes its inspection before returning.
+
+    A flush locks the rows it merges into, so workers streaming the same
+    inspection add up their counts instead of overwriting each other's.
+    Failed flushes are retried on the next tick, keeping the summaries.
+    """
+
+    def __init__(self, flush_interval_ms: float, max_records: int) -> None:
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_records = max(1, max_records)
+        self._inspections: dict[int, _PendingInspection] = {}
+        self._records = 0
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending_records(self) -> int:
+        """Frames recorded since the last successful flush."""
+        return self._records
+
+    @property
+    def inspections(self) -> int:
+        """Inspections with a summary buffered in this worker."""
+        return len(self._inspections)
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"Results writer started (flush_interval_ms="
+            f"{self.flush_interval * 1000:g}, max_records={self.max_records})"
+        )
+
+    async def stop(self) -> None:
+        """Stops the background task and writes whatever is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+        if self._records:
+            logger.error(
+                f"Results writer stopped with {self._records} frames not saved"
+            )
+
+    def open(self, inspection_id: int) -> None:
+        """Starts buffering for a session streaming an inspection."""
+        pending = self._inspections.get(inspection_id)
+        if pending is None:
+            pending = _PendingInspection()
+            self._inspections[inspection_id] = pending
+        pending.sessions += 1
+        pending.status = InspectionStatus.IN_PROGRESS
+        pending.dirty = True
+
+    def record(
+        self, inspection_id: int, detections: Detections, names: dict[int, str]
+    ) -> None:
+        """Adds an answered frame to its inspection's summary (never blocks)."""
+        pending = self._inspections.get(inspection_id)
+        if pending is None:
+            return
+        pending.summary.add(detections, names)
+        pending.dirty = True
+        self._records += 1
+        if self._records >= self.max_records:
+            self._wake.set()
+
+    async def close(
+        self,
+        inspection_id: int,
+        status: InspectionStatus = InspectionStatus.IN_PROGRESS,
+    ) -> None:
+        """
+        Ends a session: the inspection takes ``status`` once its last session
+        on this worker closes, and is written out before this returns. A
+        session ending without the client finishing the inspection leaves it
+        in progress, for the camera to reconnect.
+        """
+        pending = self._inspections.get(inspection_id)
+        if pending is None:
+            return
+        pending.sessions -= 1
+        if pending.sessions <= 0:
+            pending.status = status
+        pending.dirty = True
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """
+        Merges every changed summary into its saved results, with one locking
+        SELECT and one batched UPDATE.
+        """
+        async with self._lock:
+            dirty = {
+                inspection_id: pending
+                for inspection_id, pending in self._inspections.items()
+                if pending.dirty
+            }
+            if not dirty:
+                return
+
+            flushing = {}
+            for inspection_id, pending in dirty.items():
+                flushing[inspection_id] = pending.summary
+                pending.summary = InspectionSummary()
+                pending.dirty = False
+            records, self._records = self._records, 0
+
+            start = time.perf_counter()
+            try:
+                async with session_context(get_async_engine()) as session:
+                    saved = await session.execute(_select_statement(list(dirty)))
+                    rows = [
+                        _merged_row(
+                            inspection_id,
+                            results,
+                            status,
+                            flushing[inspection_id],
+                            dirty[inspection_id].status,
+                        )
+                        for inspection_id, results, status in saved
+                    ]
+                    if rows:
+                        await session.execute(_update_statement(), rows)
+                    await session.commit()
+            except Exception as exc:
+                # Keep everything for the next attempt
+                for inspection_id, pending in dirty.items():
+                    flushing[inspection_id].merge(pending.summary)
+                    pending.summary = flushing[inspection_id]
+                    pending.dirty = True
+                self._records += records
+                flush_errors.inc()
+                logger.error(f"Saving the results of {len(dirty)} inspections: {exc}")
+                return
+            flush_latency.observe((time.perf_counter() - start) * 1000)
+            flushes.inc()
+            flushed_rows.inc(len(rows))
+
+            # Forget inspections no session of this worker streams any more
+            for inspection_id, pending in dirty.items():
+                if pending.sessions <= 0 and not pending.dirty:
+                    del self._inspections[inspection_id]
+
+
+def _select_statement(inspection_ids: list[int]):
+    """
+    The saved results and status of the flushed inspections, locked until
+    the flush commits (in id order, so concurrent flushes cannot deadlock).
+    """
+    table = Inspection.__table__
+    return (
+        select(table.c.id, table.c.results, table.c.status)
+        .where(table.c.id.in_(inspection_ids))
+        .order_by(table.c.id)
+        .with_for_update()
+    )
+
+
+def _merged_row(
+    inspection_id: int,
+    results: Optional[dict],
+    status: str,
+    summary: InspectionSummary,
+    target: InspectionStatus,
+) -> dict:
+    """
+    Parameters of the UPDATE of one inspection: its saved results plus the
+    flushed frames, and ``target`` as status if ``STATUS_TRANSITIONS``
+    allows moving there from its saved one.
+    """
+    merged = InspectionSummary.from_results(results)
+    merged.merge(summary)
+    return {
+        "inspection_id": inspection_id,
+        "merged_results": merged.as_dict(),
+        "next_status": (
+            target.value if status in STATUS_TRANSITIONS[target] else status
+        ),
+    }
+
+
+def _update_statement():
+    """Executemany UPDATE of ``results`` and ``status`` by id."""
+    table = Inspection.__table__
+    return (
+        update(table)
+        .where(table.c.id == bindparam("inspection_id"))
+        .values(
+            results=bindparam("merged_results"),
+            status=bindparam("next_status"),
+        )
+    )
+
+
+results_writer = ResultsWriter(
+    flush_interval_ms=settings.results_flush_interval_ms,
+    max_records=settings.results_flush_max_records,
+)
+metrics.gauge("results_writer.pending_records", lambda: results_writer.pending_records)
+metrics.gauge("results_writer.inspections", lambda: results_writer.inspections)
@@ -0,0 +1,314 @@
+import asyncio
+import itertools
+import time
+from dataclasses import dataclass, field
+from typing import Coroutine, Optional
+
+from fastapi import WebSocket
+
+from insperion_api.core.controllers.inspection_controller import InspectionController
+from insperion_api.modules.inspection.admission import (
+    THROTTLE_HINT_INTERVAL_S,
+    admission_controller,
+)
+from insperion_api.modules.inspection.decoding import DecodedFrame, decode_executor
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.encoding import ResultEncoder
+from insperion_api.modules.inspection.frame_archiver import frame_archiver
+from insperion_api.modules.inspection.frame_dedup import FrameDeduplicator, dhash
+from insperion_api.modules.inspection.result_cache import result_cache
+from insperion_api.modules.inspection.results_writer import results_writer
+from insperion_api.modules.inspection.timings import FrameTimings
+from insperion_api.modules.inspection.tracking import BoxTracker
+from insperion_api.settings.config import settings
+
+
+@dataclass
+class InspectionSession:
+    """Everything one /v1/inspect connection needs to process its frames."""
+
+    websocket: WebSocket
+    controller: InspectionController
+    encoder: ResultEncoder
+    deduplicator: Optional[FrameDeduplicator] = None
+    tracker: Optional[BoxTracker] = None
+    # Add each frame's stage timings to its result (?timings=true)
+    report_timings: bool = False
+    # Inspection row whose results the answered frames are summarized into
+    inspection_id: Optional[int] = None
+    # Key prefix the received frames are archived under, None to not archive
+    archive_key: Optional[str] = None
+    # In-flight frame slots held, and when the client was last asked to slow down
+    _held: int = field(default=0, init=False)
+    _last_throttle: float = field(default=0.0, init=False)
+    _received: int = field(default=0, init=False)
+
+    async def receive(self) -> bytes:
+        data = await self.websocket.receive_bytes()
+        if self.archive_key is not None:
+            # Queued for a background upload, never waited for
+            frame_archiver.submit(
+                f"{self.archive_key}/{self._received:06d}",
+                data,
+                {
+                    "inspection-id": str(self.inspection_id),
+                    "frame": str(self._received),
+                },
+            )
+        self._received += 1
+        return data
+
+    async def admit(self) -> bool:
+        """
+        Takes one of the worker's in-flight frame slots for a received frame
+        (given back once it is answered). Over budget the frame is shed and
+        the client is told so, with how long to back off.
+        """
+        if admission_controller.acquire_frame():
+            self._held += 1
+            return True
+        await self._send_throttle(dropped=True)
+        return False
+
+    def _release(self, completed: bool = True) -> None:
+        self._held -= 1
+        admission_controller.release_frame(completed)
+
+    def release_all(self) -> None:
+        """Gives back the slots of frames still in flight when the session ends."""
+        while self._held > 0:
+            self._release(completed=False)
+
+    async def _send_throttle(self, dropped: bool = False) -> None:
+        self._last_throttle = time.monotonic()
+        await self.websocket.send_json(admission_controller.throttle_message(dropped))
+
+    async def _infer(
+        self, frame: DecodedFrame, timings: FrameTimings
+    ) -> tuple[Detections, dict]:
+        """Runs the detector, or only the tracker when tracking is on."""
+        if self.tracker is None:
+            return await self.controller.detect(frame, timings), {}
+
+        tracked = await asyncio.get_running_loop().run_in_executor(
+            decode_executor, self.tracker.step, frame
+        )
+        if tracked is not None:
+            return tracked, {"source": "tracked"}
+        detections = self.tracker.update(await self.controller.detect(frame, timings))
+        return detections, {"source": "detected"}
+
+    async def detect(
+        self, frame: DecodedFrame, timings: FrameTimings
+    ) -> tuple[Detections, dict]:
+        """
+        Infers a decoded frame, or reuses the last detections when frame
+        skipping is on and the frame is a near duplicate of the last one
+        inferred. Returns the detections and any extra per-frame fields.
+        """
+        if self.deduplicator is None:
+            return await self._infer(frame, timings)
+
+        frame_hash = dhash(frame.image)
+        if (detections := self.deduplicator.lookup(frame_hash)) is not None:
+            fields = {"reused": True}
+            if self.tracker is not None:
+                fields["source"] = "tracked"
+            return detections, fields
+
+        detections, fields = await self._infer(frame, timings)
+        self.deduplicator.store(frame_hash, detections)
+        return detections, {"reused": False, **fields}
+
+    async def process(
+        self, data: bytes, timings: FrameTimings
+    ) -> tuple[Detections, dict]:
+        if self.deduplicator is None and self.tracker is None:
+            # Plain detection, which a frame sent again gets from the cache
+            return await self.controller.analyze(data, timings), {}
+        return await self.detect(await self.controller.decode(data, timings), timings)
+
+    async def send(
+        self, detections: Detections, timings: FrameTimings, **fields
+    ) -> None:
+        if self.report_timings:
+            fields["timings"] = timings.as_dict()
+        start = time.perf_counter()
+        message = self.encoder.encode(detections, **fields)
+        timings.since("format", start)
+
+        start = time.perf_counter()
+        await self.encoder.transmit(self.websocket, message)
+        timings.since("send", start)
+        timings.finish()
+
+        self._release()
+        if self.inspection_id is not None:
+            results_writer.record(self.inspection_id, detections, self.controller.names)
+        if (
+            admission_controller.overloaded
+            and time.monotonic() - self._last_throttle >= THROTTLE_HINT_INTERVAL_S
+        ):
+            await self._send_throttle()
+
+
+class LatestFrameSlot:
+    """
+    One-slot frame buffer: a new frame replaces the one still waiting, so
+    the consumer always gets the freshest frame and stale ones are dropped.
+    """
+
+    def __init__(self) -> None:
+        self._frame: Optional[tuple[bytes, FrameTimings]] = None
+        self._available = asyncio.Event()
+        self._closed = False
+        self.dropped = 0
+
+    def put(self, frame: tuple[bytes, FrameTimings]) -> None:
+        if self._frame is not None:
+            self.dropped += 1
+        self._frame = frame
+        self._available.set()
+
+    def close(self) -> None:
+        self._closed = True
+        self._available.set()
+
+    async def get(self) -> Optional[tuple[bytes, FrameTimings]]:
+        """Waits for the next frame; returns None once the slot is closed."""
+        await self._available.wait()
+        if self._closed:
+            return None
+        frame, self._frame = self._frame, None
+        self._available.clear()
+        return frame
+
+
+async def run_sequential(session: InspectionSession):
+    """Receives, infers and answers every frame strictly in turn."""
+    while True:
+        data = await session.receive()
+        if not await session.admit():
+            continue
+        timings = FrameTimings()
+
+        detections, fields = await session.process(data, timings)
+
+        await session.send(detections, timings, **fields)
+
+
+async def run_latest_frame(session: InspectionSession):
+    """
+    Keeps receiving while inference runs and only ever infers the newest
+    frame, trading completeness for end-to-end latency.
+    """
+    slot = LatestFrameSlot()
+
+    async def receive() -> None:
+        try:
+            while True:
+                data = await session.receive()
+                slot.put((data, FrameTimings()))
+        finally:
+            slot.close()
+
+    receiver = asyncio.create_task(receive())
+    try:
+        while (frame := await slot.get()) is not None:
+            if not await session.admit():
+                continue
+            data, timings = frame
+            detections, fields = await session.process(data, timings)
+            await session.send(
+                detections, timings, dropped_frames=slot.dropped, **fields
+            )
+    except BaseException:
+        receiver.cancel()
+        raise
+
+    # Re-raise whatever ended the receiver (usually the client disconnecting)
+    await receiver
+
+
+async def _run_stages(*stages: Coroutine) -> None:
+    """
+    Runs pipeline stages concurrently until one of them fails (usually the
+    receiver, on disconnect), then cancels the rest and re-raises.
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    for task in done:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+
+
+async def run_pipelined(session: InspectionSession):
+    """
+    Splits the session into receive, decode, infer and send stages joined
+    by bounded queues, so the socket keeps moving while frames are decoded
+    and inferred. Frames carry a sequence number and results are always
+    sent back in frame order.
+
+    Tracking and frame skipping compare each frame with the ones before,
+    so those sessions decode and infer with a single worker each to keep
+    the frames in order. Other sessions look frames up in the result cache
+    before decoding, and hits go straight to the send stage.
+    """
+    depth = settings.inspection_pipeline_queue_depth
+    decode_queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    infer_queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    send_queue: asyncio.Queue = asyncio.Queue(maxsize=depth)
+    in_order = session.tracker is not None or session.deduplicator is not None
+    decode_workers = 1 if in_order else settings.inspection_pipeline_decode_workers
+    infer_workers = 1 if in_order else settings.inspection_pipeline_infer_workers
+
+    async def receive() -> None:
+        seq = itertools.count()
+        while True:
+            data = await session.receive()
+            if await session.admit():
+                await decode_queue.put((next(seq), data, FrameTimings()))
+
+    async def decode() -> None:
+        while True:
+            seq, data, timings = await decode_queue.get()
+            cache_key = None
+            if not in_order:
+                cached, cache_key = session.controller.cached(data, timings)
+                if cached is not None:
+                    await send_queue.put((seq, (cached, {}, timings)))
+                    continue
+            frame = await session.controller.decode(data, timings)
+            await infer_queue.put((seq, frame, cache_key, timings))
+
+    async def infer() -> None:
+        while True:
+            seq, frame, cache_key, timings = await infer_queue.get()
+            detections, fields = await session.detect(frame, timings)
+            if cache_key is not None:
+                result_cache.put(cache_key, detections)
+            await send_queue.put((seq, (detections, fields, timings)))
+
+    async def send() -> None:
+        # Several decode/infer workers may finish out of order
+        next_seq, ready = 0, {}
+        while True:
+            seq, result = await send_queue.get()
+            ready[seq] = result
+            while next_seq in ready:
+                detections, fields, timings = ready.pop(next_seq)
+                await session.send(detections, timings, seq=next_seq, **fields)
+                next_seq += 1
+
+    await _run_stages(
+        receive(),
+        *(decode() for _ in range(decode_workers)),
+        *(infer() for _ in range(infer_workers)),
+        send(),
+    )
@@ -0,0 +1,42 @@
+import time
+
+from insperion_api.utils.common.metrics import metrics
+
+
+class FrameTimings:
+    """
+    Monotonic per-stage durations of one frame, from the moment it was
+    received. Each stage is also fed to the ``inspection.<stage>``
+    latency histogram, whether or not the client asked for the timings.
+
+    Stages: ``cache`` (result cache lookup), ``decode``, ``queue``
+    (waiting for the batch scheduler or an inference process),
+    ``inference``, ``format``, ``send`` and ``total``.
+    """
+
+    def __init__(self) -> None:
+        self.received = time.perf_counter()
+        self.stages: dict[str, float] = {}
+
+    def record(self, stage: str, elapsed_ms: float) -> None:
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed_ms
+        metrics.latency(f"inspection.{stage}").observe(elapsed_ms)
+
+    def since(self, stage: str, start: float) -> None:
+        """Records a stage that started at ``start`` (``time.perf_counter``)."""
+        self.record(stage, (time.perf_counter() - start) * 1000)
+
+    def finish(self) -> None:
+        """Records the whole server-side time of the frame."""
+        self.since("total", self.received)
+
+    def as_dict(self) -> dict:
+        """
+        The stages so far and the elapsed time since the frame arrived, in
+        milliseconds. It goes into the response itself, so it cannot hold
+        the ``format`` and ``send`` stages of its own frame.
+        """
+        return {
+            **{f"{stage}_ms": round(value, 3) for stage, value in self.stages.items()},
+            "elapsed_ms": round((time.perf_counter() - self.received) * 1000, 3),
+        }
@@ -0,0 +1,188 @@
+import time
+from typing import Optional
+
+import cv2
+import numpy as np
+
+from insperion_api.modules.inspection.decoding import DecodedFrame
+from insperion_api.modules.inspection.detections import (
+    Detections,
+    box_iou,
+    greedy_match,
+)
+from insperion_api.modules.inspection.frame_dedup import dhash
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+# A box needs this many tracked feature points to be moved, and a frame
+# this many overall to be tracked at all instead of re-detected
+MIN_BOX_POINTS = 3
+MIN_FRAME_POINTS = 8
+# Per-frame box scale change allowed from optical flow
+MAX_SCALE_STEP = 1.25
+
+LK_PARAMS = {
+    "winSize": (15, 15),
+    "maxLevel": 2,
+    "criteria": (cv2.TERM_CRITERIA_EPS | cv2.TERM_CRITERIA_COUNT, 10, 0.03),
+}
+FEATURE_PARAMS = {"maxCorners": 200, "qualityLevel": 0.01, "minDistance": 5}
+
+frames_detected = metrics.counter("inspection.tracking.detected")
+frames_tracked = metrics.counter("inspection.tracking.tracked")
+tracking_latency = metrics.latency("inspection.tracking.step")
+
+
+class BoxTracker:
+    """
+    Per-session detect-every-N-frames tracker. The detector runs on every
+    ``detect_interval``-th frame, on a scene change (dHash distance to the
+    last detected frame above ``scene_change_threshold`` bits) or when
+    tracking is lost; in between, boxes are moved by the median sparse
+    optical flow (Lucas-Kanade) of the feature points inside them.
+
+    Detected boxes are matched to the current tracks by IoU so track ids
+    stay stable across detections.
+    """
+
+    def __init__(
+        self,
+        detect_interval: int = settings.tracking_detect_interval,
+        scene_change_threshold: int = settings.tracking_scene_change_threshold,
+        width: int = settings.tracking_width,
+        match_iou: float = settings.tracking_match_iou,
+    ) -> None:
+        self.detect_interval = max(1, detect_interval)
+        self.scene_change_threshold = scene_change_threshold
+        self.width = width
+        self.match_iou = match_iou
+        self._tracks: Optional[Detections] = None
+        self._prev_gray: Optional[np.ndarray] = None
+        self._prev_ratio = 1.0
+        self._detect_hash = 0
+        self._since_detect = 0
+        self._next_id = 1
+        self._pending: Optional[tuple[np.ndarray, float, int]] = None
+
+    def _prepare(self, frame: DecodedFrame) -> tuple[np.ndarray, float]:
+        """Small grayscale copy of the frame and its original-to-small ratio."""
+        image = frame.image
+        height, width = image.shape[:2]
+        resize = min(1.0, self.width / width)
+        if resize < 1.0:
+            image = cv2.resize(
+                image,
+                (self.width, round(height * resize)),
+                interpolation=cv2.INTER_AREA,
+            )
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+        return gray, resize / frame.scale
+
+    def step(self, frame: DecodedFrame) -> Optional[Detections]:
+        """
+        Returns the tracked boxes for this frame, or None when it has to go
+        through the detector (then pass the result to ``update``).
+        """
+        start = time.perf_counter()
+        gray, ratio = self._prepare(frame)
+        frame_hash = dhash(gray)
+        due = (
+            self._tracks is None
+            or self._since_detect + 1 >= self.detect_interval
+            or (frame_hash ^ self._detect_hash).bit_count()
+            > self.scene_change_threshold
+        )
+        tracked = None if due else self._propagate(gray, ratio)
+        tracking_latency.observe((time.perf_counter() - start) * 1000)
+
+        if tracked is None:
+            self._pending = (gray, ratio, frame_hash)
+            return None
+
+        frames_tracked.inc()
+        self._tracks = tracked
+        self._prev_gray, self._prev_ratio = gray, ratio
+        self._since_detect += 1
+        return tracked
+
+    def _propagate(self, gray: np.ndarray, ratio: float) -> Optional[Detections]:
+        tracks = self._tracks
+        if tracks.size == 0:
+            return tracks
+        if gray.shape != self._prev_gray.shape:
+            return None
+
+        # Only look for features inside the boxes being tracked
+        boxes = tracks.xyxy * np.float32(self._prev_ratio)
+        mask = np.zeros_like(self._prev_gray)
+        for x1, y1, x2, y2 in boxes.round().astype(np.int32):
+            mask[max(y1, 0) : y2, max(x1, 0) : x2] = 255
+        points = cv2.goodFeaturesToTrack(self._prev_gray, mask=mask, **FEATURE_PARAMS)
+        if points is None:
+            return None
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            self._prev_gray, gray, points, None, **LK_PARAMS
+        )
+        found = status.ravel() == 1
+        if found.sum() < MIN_FRAME_POINTS:
+            return None
+        before = points.reshape(-1, 2)[found]
+        after = moved.reshape(-1, 2)[found]
+
+        inside = (
+            (before[None, :, 0] >= boxes[:, None, 0])
+            & (before[None, :, 0] <= boxes[:, None, 2])
+            & (before[None, :, 1] >= boxes[:, None, 1])
+            & (before[None, :, 1] <= boxes[:, None, 3])
+        )
+        for index, mask in enumerate(inside):
+            if mask.sum() < MIN_BOX_POINTS:
+                # Too little texture to follow: leave the box where it was
+                continue
+            box_before, box_after = before[mask], after[mask]
+            shift = np.median(box_after - box_before, axis=0)
+            spread_before = np.median(
+                np.linalg.norm(box_before - np.median(box_before, axis=0), axis=1)
+            )
+            spread_after = np.median(
+                np.linalg.norm(box_after - np.median(box_after, axis=0), axis=1)
+            )
+            scale = np.clip(
+                spread_after / spread_before if spread_before > 0 else 1.0,
+                1 / MAX_SCALE_STEP,
+                MAX_SCALE_STEP,
+            )
+            center = (boxes[index, :2] + boxes[index, 2:]) / 2 + shift
+            half = (boxes[index, 2:] - boxes[index, :2]) / 2 * scale
+            boxes[index] = np.concatenate((center - half, center + half))
+
+        height, width = gray.shape
+        boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+        boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+        return tracks._replace(xyxy=(boxes / np.float32(ratio)).astype(np.float32))
+
+    def update(self, detections: Detections) -> Detections:
+        """
+        Takes the detector's result for the frame ``step`` declined, gives
+        each box the id of the overlapping track of the same class (or a
+        new one) and makes it the new tracking reference.
+        """
+        track_id = np.zeros(detections.size, dtype=np.int64)
+        if self._tracks is not None and self._tracks.size and detections.size:
+            iou = box_iou(detections.xyxy, self._tracks.xyxy)
+            iou[detections.class_id[:, None] != self._tracks.class_id[None, :]] = 0
+            match = greedy_match(iou, self.match_iou)
+            matched = match >= 0
+            track_id[matched] = self._tracks.track_id[match[matched]]
+
+        new = track_id == 0
+        track_id[new] = np.arange(self._next_id, self._next_id + new.sum())
+        self._next_id += int(new.sum())
+
+        frames_detected.inc()
+        self._tracks = detections._replace(track_id=track_id)
+        if self._pending is not None:
+            self._prev_gray, self._prev_ratio, self._detect_hash = self._pending
+            self._pending = None
+        self._since_detect = 0
+        return self._tracks
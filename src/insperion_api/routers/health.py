@@ -0,0 +1,41 @@
+from fastapi import APIRouter
+
+from insperion_api.core.constants.error_response import ErrorResponse
+from insperion_api.modules.inspection.admission import admission_controller
+from insperion_api.modules.inspection.model_registry import model_registry
+from insperion_api.modules.inspection.process_pool import inference_pool
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.custom_http_exception import CustomHTTPException
+
+health_router = APIRouter(prefix="/health", tags=["health"])
+
+
+@health_router.get("/live")
+async def liveness() -> dict:
+    return {"status": "ok"}
+
+
+@health_router.get("/ready")
+async def readiness() -> dict:
+    """
+    Only reports ready once the worker's models are loaded and warmed up.
+    Also reports the worker's admission load, for load balancers to weigh.
+    """
+    if settings.inference_engine_mode == "process":
+        if not inference_pool.ready:
+            raise CustomHTTPException(ErrorResponse.MODEL_NOT_READY).to_http_exception()
+        return {
+            "ready": True,
+            "processes": inference_pool.processes,
+            "admission": admission_controller.status(),
+        }
+
+    if not model_registry.ready:
+        raise CustomHTTPException(ErrorResponse.MODEL_NOT_READY).to_http_exception()
+    return {**model_registry.status(), "admission": admission_controller.status()}
+
+
+@health_router.get("/engine")
+async def engine_stats() -> dict:
+    """Inference backend and latency per model, to compare backends per SKU."""
+    return model_registry.engine_stats()
@@ -1,28 +1,181 @@
-from typing import Annotated
+import json
+from typing import Annotated, Optional
 
-from fastapi import APIRouter, Depends, WebSocket, WebSocketDisconnect
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
+from fastapi.responses import StreamingResponse
 
+from insperion_api.core.constants.constants import (
+    InspectionResultFormat,
+    InspectionStatus,
+    InspectionStreamMode,
+)
+from insperion_api.core.constants.error_response import ErrorResponse
 from insperion_api.core.controllers.inspection_controller import InspectionController
+from insperion_api.modules.inspection.admission import (
+    WS_CLOSE_TRY_AGAIN_LATER,
+    admission_controller,
+)
+from insperion_api.modules.inspection.batch_upload import (
+    BatchUploadError,
+    BatchUploadTooLarge,
+    upload_images,
+)
+from insperion_api.modules.inspection.encoding import BINARY_SUBPROTOCOL, build_encoder
+from insperion_api.modules.inspection.frame_archiver import frame_archiver
+from insperion_api.modules.inspection.frame_dedup import FrameDeduplicator
+from insperion_api.modules.inspection.results_writer import results_writer
+from insperion_api.modules.inspection.streaming import (
+    InspectionSession,
+    run_latest_frame,
+    run_pipelined,
+    run_sequential,
+)
+from insperion_api.modules.inspection.tracking import BoxTracker
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.custom_http_exception import CustomHTTPException
 from insperion_api.utils.common.logger import logger
 
 inspection_router = APIRouter(prefix="/v1/inspect", tags=["inspect"])
 
+STREAM_RUNNERS = {
+    InspectionStreamMode.SEQUENTIAL: run_sequential,
+    InspectionStreamMode.LATEST: run_latest_frame,
+    InspectionStreamMode.PIPELINE: run_pipelined,
+}
+
 
 @inspection_router.websocket("")
 async def inspect(
-    request: WebSocket, controller: Annotated[InspectionController, Depends()]
+    request: WebSocket,
+    controller: Annotated[InspectionController, Depends()],
+    mode: InspectionStreamMode = InspectionStreamMode.SEQUENTIAL,
+    result_format: InspectionResultFormat = Query(
+        InspectionResultFormat.JSON, alias="format"
+    ),
+    dedup: bool = False,
+    track: bool = False,
+    timings: bool = False,
+    delta: bool = False,
+    inspection_id: Optional[int] = None,
+    inspection_type: Optional[str] = None,
 ):
-    await request.accept()
-    try:
-        while True:
-            data = await request.receive_bytes()
+    # Binary results can be negotiated either as a subprotocol or ?format=binary
+    subprotocol = None
+    if BINARY_SUBPROTOCOL in request.scope.get("subprotocols", []):
+        subprotocol = BINARY_SUBPROTOCOL
+        result_format = InspectionResultFormat.BINARY
+    invalid_reason = None
+    if delta and result_format != InspectionResultFormat.JSON:
+        invalid_reason = "Delta results are only available in the JSON format"
 
-            results_json = await controller.inspect(data)
+    # Rejected only once accepted, so the client sees the close code and
+    # not a bare 403
+    await request.accept(subprotocol=subprotocol)
+    if invalid_reason is not None:
+        await request.close(code=1008, reason=invalid_reason)
+        return
+    if not admission_controller.open_session():
+        logger.warning("Inspection session rejected: worker at capacity")
+        await request.send_json(
+            {"type": "rejected", "retry_after_s": admission_controller.retry_after_s}
+        )
+        await request.close(
+            code=WS_CLOSE_TRY_AGAIN_LATER,
+            reason=admission_controller.rejection_reason(),
+        )
+        return
 
-            await request.send_json(results_json)
-    except WebSocketDisconnect:
-        logger.warning("Client disconnected")
+    session = None
+    inspection = None
+    # Stays in progress unless the client ends the inspection or it fails
+    status = InspectionStatus.IN_PROGRESS
+    try:
+        await controller.bind(inspection_id, inspection_type)
+        inspection = controller.inspection
+        if inspection is not None:
+            results_writer.open(inspection.id)
+        session = InspectionSession(
+            websocket=request,
+            controller=controller,
+            encoder=build_encoder(result_format, controller.names, delta),
+            deduplicator=FrameDeduplicator() if dedup else None,
+            tracker=BoxTracker() if track else None,
+            report_timings=timings,
+            inspection_id=None if inspection is None else inspection.id,
+            archive_key=(
+                frame_archiver.session_key(inspection.id)
+                if inspection is not None and frame_archiver.running
+                else None
+            ),
+        )
+        await session.encoder.send_preamble(request)
+        await STREAM_RUNNERS[mode](session)
+    except WebSocketDisconnect as exc:
+        if exc.code == 1000:
+            # A normal close is the client's signal that the inspection is done
+            status = InspectionStatus.COMPLETED
+        else:
+            logger.warning(f"Client disconnected (code {exc.code})")
+
+    except HTTPException as exc:
+        # An unknown inspection or inspection type: a bad request, which
+        # leaves the inspection as it was
+        logger.warning(f"Inspection session refused: {exc.detail}")
+        await request.close(code=1008, reason=str(exc.detail))
 
     except Exception as exc:
         logger.error(f"An error occurred: {exc}")
+        status = InspectionStatus.FAILED
         await request.close(code=1011, reason=str(exc))
+
+    finally:
+        if session is not None:
+            session.release_all()
+        admission_controller.close_session()
+        if inspection is not None:
+            # Saves the session's last results before the handler returns
+            await results_writer.close(inspection.id, status)
+
+
+@inspection_router.post("/batch")
+async def inspect_batch(
+    request: Request,
+    controller: Annotated[InspectionController, Depends()],
+    inspection_id: Optional[int] = None,
+    inspection_type: Optional[str] = None,
+) -> StreamingResponse:
+    """
+    Inspects a batch of images uploaded as multipart/form-data (image files
+    and/or zip archives), as a zip archive or as a single image. Streams one
+    NDJSON line per image, in completion order, as soon as it is inferred.
+    Zip archives over the size or entry limits are refused with a 413 when
+    uploaded on their own; inside a multipart body, once results stream,
+    they end it with an error line.
+    """
+    await controller.bind(inspection_id, inspection_type)
+    try:
+        images = await upload_images(request)
+    except BatchUploadTooLarge as exc:
+        raise CustomHTTPException(
+            ErrorResponse.BATCH_UPLOAD_TOO_LARGE, details={"reason": str(exc)}
+        ).to_http_exception()
+    except BatchUploadError as exc:
+        raise CustomHTTPException(
+            ErrorResponse.UNSUPPORTED_BATCH_UPLOAD, details={"reason": str(exc)}
+        ).to_http_exception()
+
+    results = controller.inspect_batch(images, settings.batch_inspection_concurrency)
+    # Results stream while the body is still being read, which relies on
+    # the server not listening for disconnects itself (ASGI spec 2.4)
+    return StreamingResponse(
+        (json.dumps(result) + "\n" async for result in results),
+        media_type="application/x-ndjson",
+    )
@@ -0,0 +1,10 @@
+from fastapi import APIRouter
+
+from insperion_api.utils.common.metrics import metrics
+
+metrics_router = APIRouter(prefix="/v1/metrics", tags=["metrics"])
+
+
+@metrics_router.get("")
+async def get_metrics() -> dict:
+    return metrics.snapshot()
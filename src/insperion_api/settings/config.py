@@ -1,5 +1,5 @@
 import json
-from typing import List
+from typing import Dict, List
 
 from pydantic import Field, field_validator, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -23,12 +23,154 @@ class Settings(BaseSettings):
     aws_secret_access_key: str = Field(..., alias="AWS_SECRET_ACCESS_KEY")
     cognito_user_pool_id: str = Field("", alias="COGNITO_USER_POOL_ID")
     s3_bucket: str = Field("insperion", alias="S3_BUCKET")
+    # S3-compatible endpoint, e.g. the local MinIO (http://minio:9002)
+    s3_endpoint_url: str = Field("", alias="S3_ENDPOINT_URL")
 
     # Application Configuration
     allowed_origins: List[str] = Field(default_factory=list, alias="ALLOWED_ORIGINS")
 
     # Yolo model
     yolo_model_path: str = Field(..., alias="YOLO_MODEL_PATH")
+    # Extra models by name (or inspection type), loaded on first use
+    yolo_models: Dict[str, str] = Field(default_factory=dict, alias="YOLO_MODELS")
+    yolo_preload_models: List[str] = Field(
+        default_factory=list, alias="YOLO_PRELOAD_MODELS"
+    )
+    yolo_max_loaded_models: int = Field(4, alias="YOLO_MAX_LOADED_MODELS")
+    # Load models at import, so gunicorn --preload shares them copy-on-write
+    yolo_preload_before_fork: bool = Field(False, alias="YOLO_PRELOAD_BEFORE_FORK")
+    yolo_max_models_memory_mb: int = Field(0, alias="YOLO_MAX_MODELS_MEMORY_MB")
+    yolo_warmup_runs: int = Field(2, alias="YOLO_WARMUP_RUNS")
+    yolo_warmup_image_size: int = Field(640, alias="YOLO_WARMUP_IMAGE_SIZE")
+    yolo_image_size: int = Field(640, alias="YOLO_IMAGE_SIZE")
+    yolo_conf_threshold: float = Field(0.25, alias="YOLO_CONF_THRESHOLD")
+    yolo_iou_threshold: float = Field(0.7, alias="YOLO_IOU_THRESHOLD")
+
+    # Frame decoding: "opencv" or "turbojpeg" (needs PyTurboJPEG + libjpeg-turbo)
+    image_decoder: str = Field("opencv", alias="IMAGE_DECODER")
+    image_reduced_decode: bool = Field(True, alias="IMAGE_REDUCED_DECODE")
+    decode_workers: int = Field(2, alias="DECODE_WORKERS")
+
+    # Near-duplicate frame skipping (?dedup=true)
+    frame_dedup_threshold: int = Field(4, alias="FRAME_DEDUP_THRESHOLD")
+    frame_dedup_max_reuse: int = Field(30, alias="FRAME_DEDUP_MAX_REUSE")
+
+    # Detect-every-N-frames tracking (?track=true)
+    tracking_detect_interval: int = Field(5, alias="TRACKING_DETECT_INTERVAL")
+    tracking_scene_change_threshold: int = Field(
+        12, alias="TRACKING_SCENE_CHANGE_THRESHOLD"
+    )
+    tracking_width: int = Field(320, alias="TRACKING_WIDTH")
+    tracking_match_iou: float = Field(0.3, alias="TRACKING_MATCH_IOU")
+
+    # Delta-encoded results (?delta=true): full keyframe every N frames, and
+    # how far a box may move before its new position is sent
+    delta_keyframe_interval: int = Field(30, alias="DELTA_KEYFRAME_INTERVAL")
+    delta_iou_tolerance: float = Field(0.9, alias="DELTA_IOU_TOLERANCE")
+    delta_pixel_tolerance: float = Field(4.0, alias="DELTA_PIXEL_TOLERANCE")
+
+    # Per-worker thread planning under gunicorn (0 computes from the cores)
+    worker_cpu_count: int = Field(0, alias="WORKER_CPU_COUNT")
+    worker_intra_op_threads: int = Field(0, alias="WORKER_INTRA_OP_THREADS")
+    worker_opencv_threads: int = Field(0, alias="WORKER_OPENCV_THREADS")
+    worker_cpu_affinity: bool = Field(False, alias="WORKER_CPU_AFFINITY")
+
+    # Monitoring
+    event_loop_lag_interval_ms: float = Field(100.0, alias="EVENT_LOOP_LAG_INTERVAL_MS")
+
+    # Post-processing applied before serialization (0 disables)
+    inference_min_confidence: float = Field(0.0, alias="INFERENCE_MIN_CONFIDENCE")
+    inference_top_k: int = Field(0, alias="INFERENCE_TOP_K")
+
+    # Inference backend: "torch" (ultralytics eager) or "onnx" (ONNX Runtime)
+    inference_backend: str = Field("torch", alias="INFERENCE_BACKEND")
+    onnx_cache_dir: str = Field("", alias="ONNX_CACHE_DIR")
+    onnx_providers: List[str] = Field(
+        default_factory=lambda: ["CPUExecutionProvider"], alias="ONNX_PROVIDERS"
+    )
+    onnx_intra_op_threads: int = Field(0, alias="ONNX_INTRA_OP_THREADS")
+    # INT8 CPU inference: "none", "dynamic" or "static" (calibrated ahead of time)
+    onnx_quantization: str = Field("none", alias="ONNX_QUANTIZATION")
+
+    # Inference micro-batching
+    inference_batching: bool = Field(False, alias="INFERENCE_BATCHING")
+    inference_max_batch_size: int = Field(8, alias="INFERENCE_MAX_BATCH_SIZE")
+    inference_max_batch_wait_ms: float = Field(
+        10.0, alias="INFERENCE_MAX_BATCH_WAIT_MS"
+    )
+
+    # Inference engine: "thread" runs in the worker, "process" in a process pool
+    inference_engine_mode: str = Field("thread", alias="INFERENCE_ENGINE_MODE")
+    inference_processes: int = Field(2, alias="INFERENCE_PROCESSES")
+    inference_torch_threads: int = Field(1, alias="INFERENCE_TORCH_THREADS")
+    inference_shm_slot_bytes: int = Field(
+        3840 * 2160 * 3, alias="INFERENCE_SHM_SLOT_BYTES"
+    )
+
+    # Pipelined inspection sessions (?mode=pipeline)
+    inspection_pipeline_queue_depth: int = Field(
+        4, alias="INSPECTION_PIPELINE_QUEUE_DEPTH"
+    )
+    inspection_pipeline_decode_workers: int = Field(
+        1, alias="INSPECTION_PIPELINE_DECODE_WORKERS"
+    )
+    inspection_pipeline_infer_workers: int = Field(
+        2, alias="INSPECTION_PIPELINE_INFER_WORKERS"
+    )
+
+    # Batch inspection uploads (POST /v1/inspect/batch)
+    batch_inspection_concurrency: int = Field(8, alias="BATCH_INSPECTION_CONCURRENCY")
+    batch_inspection_max_image_bytes: int = Field(
+        32 * 1024 * 1024, alias="BATCH_INSPECTION_MAX_IMAGE_BYTES"
+    )
+    batch_inspection_max_archive_bytes: int = Field(
+        1024 * 1024 * 1024, alias="BATCH_INSPECTION_MAX_ARCHIVE_BYTES"
+    )
+    batch_inspection_max_archive_entries: int = Field(
+        10000, alias="BATCH_INSPECTION_MAX_ARCHIVE_ENTRIES"
+    )
+
+    # Per-worker admission control (0 disables a limit)
+    admission_max_sessions: int = Field(0, alias="ADMISSION_MAX_SESSIONS")
+    admission_max_in_flight_frames: int = Field(
+        0, alias="ADMISSION_MAX_IN_FLIGHT_FRAMES"
+    )
+    # Share of the in-flight budget above which sessions are asked to slow down
+    admission_throttle_ratio: float = Field(0.8, alias="ADMISSION_THROTTLE_RATIO")
+    admission_retry_after_s: int = Field(5, alias="ADMISSION_RETRY_AFTER_S")
+
+    # Write-behind of streamed inspection results into Inspection.results
+    results_flush_interval_ms: float = Field(1000, alias="RESULTS_FLUSH_INTERVAL_MS")
+    results_flush_max_records: int = Field(200, alias="RESULTS_FLUSH_MAX_RECORDS")
+
+    # Per-worker cache of detections by frame content (0 bytes disables it)
+    result_cache_max_bytes: int = Field(
+        64 * 1024 * 1024, alias="RESULT_CACHE_MAX_BYTES"
+    )
+    result_cache_ttl_s: float = Field(300, alias="RESULT_CACHE_TTL_S")
+
+    # Background archiving of inspection frames to S3 (empty bucket: S3_BUCKET)
+    frame_archive_enabled: bool = Field(False, alias="FRAME_ARCHIVE_ENABLED")
+    frame_archive_bucket: str = Field("", alias="FRAME_ARCHIVE_BUCKET")
+    frame_archive_prefix: str = Field("inspections", alias="FRAME_ARCHIVE_PREFIX")
+    frame_archive_queue_size: int = Field(256, alias="FRAME_ARCHIVE_QUEUE_SIZE")
+    # Frames overflowing the queue wait here (empty: a temporary directory)
+    frame_archive_spill_dir: str = Field("", alias="FRAME_ARCHIVE_SPILL_DIR")
+    frame_archive_spill_max_bytes: int = Field(
+        1024 * 1024 * 1024, alias="FRAME_ARCHIVE_SPILL_MAX_BYTES"
+    )
+    # Long-lived S3 clients, each uploading one frame at a time
+    frame_archive_uploaders: int = Field(2, alias="FRAME_ARCHIVE_UPLOADERS")
+    # Frames over one part are uploaded in parts of this size, several at once
+    frame_archive_part_bytes: int = Field(
+        8 * 1024 * 1024, alias="FRAME_ARCHIVE_PART_BYTES"
+    )
+    frame_archive_part_concurrency: int = Field(
+        4, alias="FRAME_ARCHIVE_PART_CONCURRENCY"
+    )
+    frame_archive_drain_timeout_s: float = Field(
+        10, alias="FRAME_ARCHIVE_DRAIN_TIMEOUT_S"
+    )
 
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -46,6 +188,30 @@ class Settings(BaseSettings):
             f"@{self.db_host}:{self.db_port}/{self.db_name}"
         )
 
+    @field_validator("inference_engine_mode")
+    def validate_inference_engine_mode(cls, v):
+        if v not in ("thread", "process"):
+            raise ValueError("Inference engine mode must be 'thread' or 'process'")
+        return v
+
+    @field_validator("inference_backend")
+    def validate_inference_backend(cls, v):
+        if v not in ("torch", "onnx"):
+            raise ValueError("Inference backend must be 'torch' or 'onnx'")
+        return v
+
+    @field_validator("onnx_quantization")
+    def validate_onnx_quantization(cls, v):
+        if v not in ("none", "dynamic", "static"):
+            raise ValueError("ONNX quantization must be 'none', 'dynamic' or 'static'")
+        return v
+
+    @field_validator("image_decoder")
+    def validate_image_decoder(cls, v):
+        if v not in ("opencv", "turbojpeg"):
+            raise ValueError("Image decoder must be 'opencv' or 'turbojpeg'")
+        return v
+
     @field_validator("db_port")
     def validate_db_port(cls, v):
         if not 1 <= v <= 65535:
@@ -29,7 +29,14 @@ async def get_client(service: str):
         if v
     }
     if service == AWSServices.S3.value:
-        aws_credentials["config"] = Config(signature_version="s3v4")  # type: ignore
+        s3_options = {}
+        if settings.s3_endpoint_url:
+            # S3-compatible stores (MinIO) serve buckets by path, not subdomain
+            aws_credentials["endpoint_url"] = settings.s3_endpoint_url
+            s3_options["addressing_style"] = "path"
+        aws_credentials["config"] = Config(  # type: ignore
+            signature_version="s3v4", s3=s3_options
+        )
     async with session.client(
         service,
         **aws_credentials,  # type: ignore
@@ -0,0 +1,167 @@
+import math
+import os
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.logger import logger
+
+# Native thread pools sized by environment variables when they start
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+class ThreadPlan(NamedTuple):
+    """How many threads one server worker runs inference with, and where."""
+
+    worker_index: int
+    workers: int
+    # Logical CPUs the worker is pinned to, None when not pinned
+    cpus: Optional[tuple[int, ...]]
+    # Physical cores the worker's share amounts to
+    cores: int
+    intra_op_threads: int
+    opencv_threads: int
+
+
+def allowed_cpus() -> list[int]:
+    """Logical CPUs this process may run on."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cgroup_cpu_limit() -> Optional[int]:
+    """CPUs allowed by a container CPU quota (cgroup v2 or v1), if any."""
+    try:
+        quota, period = Path("/sys/fs/cgroup/cpu.max").read_text().split()
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+        return None
+    except (OSError, ValueError):
+        pass
+    try:
+        quota = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_quota_us").read_text())
+        period = int(Path("/sys/fs/cgroup/cpu/cpu.cfs_period_us").read_text())
+        return max(1, math.ceil(quota / period)) if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def physical_cores(cpus: list[int]) -> list[tuple[int, ...]]:
+    """
+    Groups logical CPUs into physical cores (SMT siblings together), in
+    CPU order. Without topology information every CPU is its own core.
+    """
+    allowed, seen, cores = set(cpus), set(), []
+    for cpu in cpus:
+        if cpu in seen:
+            continue
+        siblings_path = Path(
+            f"/sys/devices/system/cpu/cpu{cpu}/topology/thread_siblings_list"
+        )
+        try:
+            siblings = _parse_cpu_list(siblings_path.read_text())
+        except (OSError, ValueError):
+            siblings = [cpu]
+        core = tuple(sorted(set(siblings) & allowed)) or (cpu,)
+        seen.update(core)
+        cores.append(core)
+    return cores
+
+
+def _parse_cpu_list(text: str) -> list[int]:
+    """Parses the kernel's CPU list format, e.g. ``0-3,8,10-11``."""
+    cpus = []
+    for part in text.strip().split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            cpus.extend(range(int(first), int(last) + 1))
+        elif part:
+            cpus.append(int(part))
+    return cpus
+
+
+def plan_threads(worker_index: int, workers: int) -> ThreadPlan:
+    """
+    Splits the machine's physical cores evenly between ``workers`` server
+    workers. Each gets one intra-op thread per physical core of its share
+    (SMT siblings add little to GEMM-bound inference). A container CPU
+    quota caps the cores considered. ``WORKER_*`` settings override the
+    computed values.
+    """
+    workers = max(1, workers)
+    cores = physical_cores(allowed_cpus())
+    if settings.worker_cpu_count > 0:
+        cores = cores[: settings.worker_cpu_count]
+    elif (limit := cgroup_cpu_limit()) is not None:
+        cores = cores[:limit]
+
+    if workers <= len(cores):
+        # The first len(cores) % workers workers get one core more
+        per_worker, extra = divmod(len(cores), workers)
+        start = worker_index * per_worker + min(worker_index, extra)
+        share = cores[start : start + per_worker + (worker_index < extra)]
+    else:
+        # More workers than cores: workers share cores round-robin
+        share = [cores[worker_index % len(cores)]]
+
+    cpus = None
+    if settings.worker_cpu_affinity:
+        cpus = tuple(cpu for core in share for cpu in core)
+    return ThreadPlan(
+        worker_index=worker_index,
+        workers=workers,
+        cpus=cpus,
+        cores=len(share),
+        intra_op_threads=settings.worker_intra_op_threads or len(share),
+        # Frames are already decoded in parallel by DECODE_WORKERS threads
+        opencv_threads=settings.worker_opencv_threads or 1,
+    )
+
+
+_applied_plan: Optional[ThreadPlan] = None
+
+
+def applied_thread_plan() -> Optional[ThreadPlan]:
+    """The plan this process applied at startup, None if it did not plan."""
+    return _applied_plan
+
+
+def apply_thread_plan(plan: ThreadPlan) -> None:
+    """
+    Applies a plan to the current process: CPU affinity, the OpenMP/BLAS
+    pool sizes (inherited by inference processes it spawns) and the torch
+    and OpenCV thread counts. Call it before any model is loaded.
+    """
+    global _applied_plan
+
+    if plan.cpus is not None and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan.cpus)
+    for name in THREAD_ENV_VARS:
+        os.environ[name] = str(plan.intra_op_threads)
+
+    try:
+        import torch
+
+        torch.set_num_threads(plan.intra_op_threads)
+        torch.set_num_interop_threads(1)
+    except ImportError:
+        pass
+    except RuntimeError:
+        # The inter-op pool already started, e.g. in a model preloaded
+        # before the fork; only the intra-op count could be changed
+        logger.info("Torch inter-op thread count left unchanged")
+    try:
+        import cv2
+
+        cv2.setNumThreads(plan.opencv_threads)
+    except ImportError:
+        pass
+
+    _applied_plan = plan
+    logger.info(
+        f"Worker {plan.worker_index + 1}/{plan.workers} thread plan: "
+        f"cores={plan.cores}, intra_op_threads={plan.intra_op_threads}, "
+        f"opencv_threads={plan.opencv_threads}, "
+        f"cpus={'unpinned' if plan.cpus is None else list(plan.cpus)}"
+    )
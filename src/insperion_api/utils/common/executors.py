@@ -0,0 +1,60 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from insperion_api.utils.common.metrics import metrics
+
+
+class MonitoredThreadPoolExecutor(ThreadPoolExecutor):
+    """
+    Thread pool reporting how many tasks wait for a thread and how many
+    run, as ``executor.<name>.*`` gauges, to spot a saturated pool.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_workers: Optional[int] = None,
+        thread_name_prefix: str = "",
+    ) -> None:
+        super().__init__(max_workers, thread_name_prefix or name)
+        self._count_lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        metrics.gauge(f"executor.{name}.queued", lambda: self.queued)
+        metrics.gauge(f"executor.{name}.active", lambda: self.active)
+        metrics.gauge(
+            f"executor.{name}.saturation",
+            lambda: round(self.active / self._max_workers, 3),
+        )
+
+    def _moved(self, queued: int, active: int) -> None:
+        with self._count_lock:
+            self.queued += queued
+            self.active += active
+
+    def submit(self, fn: Callable, /, *args, **kwargs) -> Future:
+        started = False
+
+        def run():
+            nonlocal started
+            started = True
+            self._moved(-1, 1)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._moved(0, -1)
+
+        def done(_: Future) -> None:
+            # Cancelled before a thread picked it up
+            if not started:
+                self._moved(-1, 0)
+
+        self._moved(1, 0)
+        try:
+            future = super().submit(run)
+        except BaseException:
+            self._moved(-1, 0)
+            raise
+        future.add_done_callback(done)
+        return future
@@ -0,0 +1,41 @@
+import asyncio
+from typing import Optional
+
+from insperion_api.settings.config import settings
+from insperion_api.utils.common.metrics import metrics
+
+
+class EventLoopLagMonitor:
+    """
+    Measures how late the event loop wakes up a periodic sleep. Anything
+    blocking the loop (e.g. a decode run inline) shows up as lag.
+    """
+
+    def __init__(self, interval_ms: float) -> None:
+        self.interval = interval_ms / 1000
+        self.lag = metrics.latency("event_loop.lag")
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = loop.time() - start - self.interval
+            self.lag.observe(max(lag, 0.0) * 1000)
+
+
+loop_lag_monitor = EventLoopLagMonitor(settings.event_loop_lag_interval_ms)
@@ -0,0 +1,68 @@
+import os
+import resource
+from typing import Optional
+
+# smaps_rollup fields (kB) summed into each part of the breakdown
+SMAPS_PARTS = {
+    "rss": ("Rss",),
+    "pss": ("Pss",),
+    "shared": ("Shared_Clean", "Shared_Dirty"),
+    "private": ("Private_Clean", "Private_Dirty"),
+}
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # No procfs (e.g. macOS): fall back to the peak, reported in bytes there
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def peak_rss_bytes() -> int:
+    """Peak resident set size of this process, in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak * 1024 if os.uname().sysname == "Linux" else peak
+
+
+def memory_breakdown() -> dict[str, int]:
+    """
+    Resident memory of this process in bytes, split into pages shared with
+    other processes (e.g. inherited copy-on-write from the gunicorn master)
+    and pages of its own. PSS charges each shared page in equal parts to
+    the processes mapping it, so it sums up correctly across workers.
+    """
+    try:
+        with open("/proc/self/smaps_rollup") as smaps:
+            fields = {}
+            for line in smaps:
+                name, _, value = line.partition(":")
+                if value.strip().endswith("kB"):
+                    fields[name] = int(value.split()[0]) * 1024
+    except OSError:
+        return {"rss": rss_bytes()}
+    return {
+        part: sum(fields.get(name, 0) for name in names)
+        for part, names in SMAPS_PARTS.items()
+    }
+
+
+def describe_memory(breakdown: dict[str, int]) -> str:
+    return ", ".join(
+        f"{part}={value / 1024 / 1024:.0f} MB" for part, value in breakdown.items()
+    )
+
+
+def process_age_seconds() -> Optional[float]:
+    """Seconds since this process started (for a forked worker, since the fork)."""
+    try:
+        with open("/proc/self/stat") as stat:
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            uptime_seconds = float(uptime.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return uptime_seconds - start_ticks / os.sysconf("SC_CLK_TCK")
@@ -0,0 +1,126 @@
+import threading
+from bisect import bisect_left
+from typing import Callable
+
+# Upper bounds of the latency histogram buckets, in milliseconds. Values
+# above the last bound fall into an overflow bucket.
+LATENCY_BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+class LatencyStats:
+    """
+    Thread-safe running latency summary (in milliseconds) with a fixed-bucket
+    histogram, from which percentiles are estimated.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.count = 0
+        self.total_ms = 0.0
+        self.min_ms = float("inf")
+        self.max_ms = 0.0
+        self.last_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, value_ms: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.total_ms += value_ms
+            self.min_ms = min(self.min_ms, value_ms)
+            self.max_ms = max(self.max_ms, value_ms)
+            self.last_ms = value_ms
+            self.buckets[bisect_left(LATENCY_BUCKETS_MS, value_ms)] += 1
+
+    def _percentile(self, quantile: float) -> float:
+        """Interpolates a percentile linearly within its histogram bucket."""
+        rank = quantile * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            if count and seen + count >= rank:
+                lower = LATENCY_BUCKETS_MS[index - 1] if index else 0.0
+                upper = (
+                    LATENCY_BUCKETS_MS[index]
+                    if index < len(LATENCY_BUCKETS_MS)
+                    else self.max_ms
+                )
+                value = lower + (upper - lower) * (rank - seen) / count
+                return min(max(value, self.min_ms), self.max_ms)
+            seen += count
+        return self.max_ms
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            if self.count == 0:
+                return {"count": 0}
+            return {
+                "count": self.count,
+                "mean_ms": round(self.total_ms / self.count, 3),
+                "min_ms": round(self.min_ms, 3),
+                "max_ms": round(self.max_ms, 3),
+                "last_ms": round(self.last_ms, 3),
+                "p50_ms": round(self._percentile(0.50), 3),
+                "p95_ms": round(self._percentile(0.95), 3),
+                "p99_ms": round(self._percentile(0.99), 3),
+                "histogram": {
+                    **{
+                        f"le_{bound:g}": count
+                        for bound, count in zip(LATENCY_BUCKETS_MS, self.buckets)
+                    },
+                    "le_inf": self.buckets[-1],
+                },
+            }
+
+
+class Counter:
+    """Thread-safe monotonically increasing counter."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class MetricsRegistry:
+    """
+    In-process registry of named metrics, exposed on the metrics endpoint.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._latencies: dict[str, LatencyStats] = {}
+        self._counters: dict[str, Counter] = {}
+        self._gauges: dict[str, Callable[[], float]] = {}
+
+    def counter(self, name: str) -> Counter:
+        with self._lock:
+            if name not in self._counters:
+                self._counters[name] = Counter()
+            return self._counters[name]
+
+    def gauge(self, name: str, read: Callable[[], float]) -> None:
+        """Registers a value computed when the metrics are read."""
+        with self._lock:
+            self._gauges[name] = read
+
+    def latency(self, name: str) -> LatencyStats:
+        with self._lock:
+            if name not in self._latencies:
+                self._latencies[name] = LatencyStats()
+            return self._latencies[name]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            latencies = dict(self._latencies)
+            counters = dict(self._counters)
+            gauges = dict(self._gauges)
+        return {
+            "counters": {name: counter.value for name, counter in counters.items()},
+            "gauges": {name: read() for name, read in gauges.items()},
+            "latency": {name: stats.snapshot() for name, stats in latencies.items()},
+        }
+
+
+metrics = MetricsRegistry()
@@ -1,11 +1,33 @@
+import fcntl
 import os
+import shutil
 import signal
+import tempfile
 import threading
 import time
-from typing import Any, Dict, List
+from typing import IO, Any, Dict, List, Optional
 
 from uvicorn.workers import UvicornWorker
 
+from insperion_api.utils.common.cpu_topology import apply_thread_plan, plan_threads
+
+SLOT_DIR_PREFIX = "insperion-worker-slots-"
+
+
+def _remove_stale_slot_dirs(base_dir: str) -> None:
+    """Removes the slot lock directories of masters that are gone."""
+    for entry in os.listdir(base_dir):
+        pid = entry.removeprefix(SLOT_DIR_PREFIX)
+        if pid == entry or not pid.isdigit():
+            continue
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            shutil.rmtree(os.path.join(base_dir, entry), ignore_errors=True)
+        except PermissionError:
+            # Alive, run by another user
+            pass
+
 
 class ReloaderThread(threading.Thread):
     def __init__(self, worker: UvicornWorker, sleep_interval: float = 1.0):
@@ -27,6 +49,45 @@ class RestartableUvicornWorker(UvicornWorker):
     def __init__(self, *args: List[Any], **kwargs: Dict[str, Any]):
         super().__init__(*args, **kwargs)
         self._reloader_thread = ReloaderThread(self)
+        self._slot_file: Optional[IO] = None
+
+    def _claim_slot(self) -> int:
+        """
+        Index of this worker among the master's workers, stable across
+        restarts: the first slot whose lock file no live worker holds. The
+        lock is released by the OS when the worker exits, however it exits.
+        """
+        workers = self.cfg.workers
+        base_dir = self.cfg.worker_tmp_dir or tempfile.gettempdir()
+        _remove_stale_slot_dirs(base_dir)
+        slot_dir = os.path.join(base_dir, f"{SLOT_DIR_PREFIX}{self.ppid}")
+        os.makedirs(slot_dir, exist_ok=True)
+        for slot in range(workers):
+            slot_file = open(os.path.join(slot_dir, f"{slot}.lock"), "w")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                slot_file.close()
+                continue
+            # Held open for the worker's lifetime
+            self._slot_file = slot_file
+            return slot
+        # More workers than slots while old ones shut down (e.g. on reload)
+        return (self.age - 1) % workers
+
+    def init_process(self) -> None:
+        # Size the native thread pools for this worker's share of the cores
+        # before the app (and with it torch) is loaded, or right after the
+        # fork when the master preloaded it
+        apply_thread_plan(plan_threads(self._claim_slot(), self.cfg.workers))
+        if self.cfg.preload_app:
+            # Imported here, the master only loads the registry with the app
+            from insperion_api.modules.inspection.model_registry import (
+                model_registry,
+            )
+
+            model_registry.after_fork()
+        super().init_process()
 
     def run(self) -> None:
         if self.cfg.reload:
@@ -0,0 +1,11 @@
+import os
+
+# Settings are read at import time; give the required ones test values
+for name, value in {
+    "DB_USERNAME": "test",
+    "DB_PASSWORD": "test",
+    "AWS_ACCESS_KEY_ID": "test",
+    "AWS_SECRET_ACCESS_KEY": "test",
+    "YOLO_MODEL_PATH": "yolo11n.pt",
+}.items():
+    os.environ.setdefault(name, value)
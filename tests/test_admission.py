@@ -0,0 +1,110 @@
+from types import SimpleNamespace
+
+import pytest
+
+from insperion_api.modules.inspection import admission as admission_module
+from insperion_api.modules.inspection.admission import (
+    THROUGHPUT_WINDOW_S,
+    AdmissionController,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(
+        admission_module, "time", SimpleNamespace(monotonic=lambda: now[0])
+    )
+    return now
+
+
+def _controller(max_sessions: int = 2, max_in_flight: int = 4) -> AdmissionController:
+    return AdmissionController(
+        max_sessions=max_sessions,
+        max_in_flight=max_in_flight,
+        throttle_ratio=0.5,
+        retry_after_s=5,
+    )
+
+
+def test_sessions_over_the_limit_are_rejected():
+    controller = _controller(max_sessions=2)
+
+    assert controller.open_session()
+    assert controller.open_session()
+    assert not controller.open_session()
+    assert controller.sessions == 2
+
+    controller.close_session()
+    assert controller.open_session()
+    assert len(controller.rejection_reason().encode()) <= 123
+
+
+def test_frames_over_the_budget_are_shed():
+    controller = _controller(max_in_flight=2)
+
+    assert controller.acquire_frame()
+    assert controller.acquire_frame()
+    assert not controller.acquire_frame()
+
+    controller.release_frame()
+    assert controller.acquire_frame()
+
+
+def test_zero_disables_the_limits():
+    controller = _controller(max_sessions=0, max_in_flight=0)
+
+    assert all(controller.open_session() for _ in range(100))
+    assert all(controller.acquire_frame() for _ in range(100))
+    assert not controller.overloaded
+
+
+def test_overloaded_past_the_throttle_ratio():
+    controller = _controller(max_in_flight=4)
+    controller.acquire_frame()
+    assert not controller.overloaded
+    controller.acquire_frame()
+    assert controller.overloaded
+
+
+def test_fair_fps_shares_the_throughput_between_sessions(clock):
+    controller = _controller()
+    assert controller.fair_fps() is None
+
+    controller.open_session()
+    controller.open_session()
+    for _ in range(20):
+        controller.acquire_frame()
+        controller.release_frame()
+    assert controller.throughput() == 20 / THROUGHPUT_WINDOW_S
+    assert controller.fair_fps() == 2.0
+
+    # Frames drop out of the measurement once past the window
+    clock[0] += THROUGHPUT_WINDOW_S + 1
+    assert controller.fair_fps() is None
+
+
+def test_shed_frames_do_not_count_as_answered(clock):
+    controller = _controller()
+    controller.acquire_frame()
+    controller.release_frame(completed=False)
+    assert controller.throughput() == 0
+
+
+def test_retry_after_covers_the_frames_in_flight(clock):
+    controller = _controller(max_in_flight=10)
+    message = controller.throttle_message(dropped=True)
+    # Nothing answered yet: fall back on the configured delay
+    assert message["retry_after_ms"] == 5000
+
+    for _ in range(10):
+        controller.acquire_frame()
+        controller.release_frame()
+    for _ in range(4):
+        controller.acquire_frame()
+
+    message = controller.throttle_message(dropped=True)
+    assert message["type"] == "throttle"
+    # 4 frames in flight at 2 frames per second
+    assert message["retry_after_ms"] == 2000
+    assert "retry_after_ms" not in controller.throttle_message()
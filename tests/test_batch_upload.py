@@ -0,0 +1,164 @@
+import io
+import zipfile
+
+import pytest
+
+from insperion_api.modules.inspection.batch_upload import (
+    BatchUploadError,
+    BatchUploadTooLarge,
+    iter_multipart,
+    upload_images,
+)
+from insperion_api.settings.config import settings
+
+BOUNDARY = "test-boundary"
+
+
+class FakeRequest:
+    """The parts of a starlette Request the upload readers use."""
+
+    def __init__(self, body: bytes, content_type: str, chunk_size: int = 7) -> None:
+        self.headers = {"content-type": content_type}
+        self._body = body
+        self._chunk_size = chunk_size
+
+    async def stream(self):
+        for start in range(0, len(self._body), self._chunk_size):
+            yield self._body[start : start + self._chunk_size]
+
+
+def _zip(entries: dict[str, bytes]) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        for name, data in entries.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+
+def _multipart(parts: list[tuple[str, str, bytes]]) -> bytes:
+    body = b"preamble\r\n"
+    for name, content_type, data in parts:
+        body += (
+            (
+                f"--{BOUNDARY}\r\n"
+                f'Content-Disposition: form-data; name="files"; filename="{name}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n"
+            ).encode()
+            + data
+            + b"\r\n"
+        )
+    return body + f"--{BOUNDARY}--\r\n".encode()
+
+
+async def _collect(images) -> list[tuple[str, bytes]]:
+    return [image async for image in images]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("chunk_size", [1, 5, 64, 4096])
+async def test_multipart_parts_split_across_chunks(chunk_size):
+    # The second body holds the start of the delimiter without being one
+    body = _multipart(
+        [("a.jpg", "image/jpeg", b"first"), ("b.png", "image/png", b"x\r\n--y")]
+    )
+    request = FakeRequest(body, "multipart/form-data", chunk_size)
+
+    parts = []
+    async for headers, part in iter_multipart(request.stream(), BOUNDARY):
+        parts.append((headers["content-type"], b"".join([c async for c in part])))
+
+    assert parts == [("image/jpeg", b"first"), ("image/png", b"x\r\n--y")]
+
+
+@pytest.mark.asyncio
+async def test_truncated_multipart_body_fails():
+    body = _multipart([("a.jpg", "image/jpeg", b"first")])[:-20]
+    request = FakeRequest(body, "multipart/form-data")
+    with pytest.raises(BatchUploadError):
+        async for _, part in iter_multipart(request.stream(), BOUNDARY):
+            async for _ in part:
+                pass
+
+
+@pytest.mark.asyncio
+async def test_multipart_images_and_zip_parts():
+    archive = _zip({"in/c.jpg": b"c", "notes.txt": b"skip", "in/": b""})
+    body = _multipart(
+        [("a.jpg", "image/jpeg", b"a"), ("batch.zip", "application/zip", archive)]
+    )
+    request = FakeRequest(body, f"multipart/form-data; boundary={BOUNDARY}")
+
+    images = await _collect(await upload_images(request))
+
+    assert images == [("a.jpg", b"a"), ("in/c.jpg", b"c")]
+
+
+@pytest.mark.asyncio
+async def test_bare_zip_upload():
+    request = FakeRequest(_zip({"a.jpg": b"a", "b.JPG": b"b"}), "application/zip")
+    assert await _collect(await upload_images(request)) == [
+        ("a.jpg", b"a"),
+        ("b.JPG", b"b"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_invalid_zip_is_refused():
+    request = FakeRequest(b"not a zip archive", "application/zip")
+    with pytest.raises(BatchUploadError, match="Invalid zip"):
+        await upload_images(request)
+
+
+@pytest.mark.asyncio
+async def test_zip_over_entry_limit_is_refused_before_streaming(monkeypatch):
+    monkeypatch.setattr(settings, "batch_inspection_max_archive_entries", 2)
+    archive = _zip({f"{index}.jpg": b"x" for index in range(3)})
+    with pytest.raises(BatchUploadTooLarge, match="entries"):
+        await upload_images(FakeRequest(archive, "application/zip"))
+
+
+@pytest.mark.asyncio
+async def test_zip_over_size_limit_is_refused_while_spooling(monkeypatch):
+    archive = _zip({"a.jpg": b"x" * 1000})
+    monkeypatch.setattr(settings, "batch_inspection_max_archive_bytes", 100)
+    with pytest.raises(BatchUploadTooLarge, match="larger"):
+        await upload_images(FakeRequest(archive, "application/zip"))
+
+
+@pytest.mark.asyncio
+async def test_zip_over_size_limit_is_refused_by_content_length(monkeypatch):
+    monkeypatch.setattr(settings, "batch_inspection_max_archive_bytes", 100)
+    request = FakeRequest(b"", "application/zip")
+    request.headers["content-length"] = "101"
+    with pytest.raises(BatchUploadTooLarge):
+        await upload_images(request)
+
+
+@pytest.mark.asyncio
+async def test_oversized_zip_part_ends_a_multipart_stream(monkeypatch):
+    monkeypatch.setattr(settings, "batch_inspection_max_archive_entries", 1)
+    archive = _zip({"b.jpg": b"b", "c.jpg": b"c"})
+    body = _multipart(
+        [("a.jpg", "image/jpeg", b"a"), ("batch.zip", "application/zip", archive)]
+    )
+    images = await upload_images(
+        FakeRequest(body, f"multipart/form-data; boundary={BOUNDARY}")
+    )
+
+    assert await anext(images) == ("a.jpg", b"a")
+    with pytest.raises(BatchUploadTooLarge):
+        await anext(images)
+
+
+@pytest.mark.asyncio
+async def test_image_over_size_limit(monkeypatch):
+    monkeypatch.setattr(settings, "batch_inspection_max_image_bytes", 4)
+    images = await upload_images(FakeRequest(b"12345", "image/jpeg"))
+    with pytest.raises(BatchUploadError, match="larger"):
+        await _collect(images)
+
+
+@pytest.mark.asyncio
+async def test_unsupported_content_type():
+    with pytest.raises(BatchUploadError, match="content type"):
+        await upload_images(FakeRequest(b"{}", "application/json"))
@@ -0,0 +1,82 @@
+import cv2
+import numpy as np
+import pytest
+
+from insperion_api.modules.inspection.decoding import (
+    REDUCED_READ_FLAGS,
+    FrameDecoder,
+    choose_reduction,
+    exif_orientation,
+    jpeg_dimensions,
+)
+
+
+def _jpeg(width: int, height: int, orientation: int = 1) -> bytes:
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    # Asymmetric content, so every flip and rotation gives another image
+    image[: height // 3, : width // 4] = (0, 0, 255)
+    image[height // 2 :, width // 2 :] = (255, 0, 0)
+    data = cv2.imencode(".jpg", image)[1].tobytes()
+    if orientation == 1:
+        return data
+    # APP1 segment with a little-endian TIFF header and one orientation entry
+    tiff = (
+        b"II*\0"
+        + (8).to_bytes(4, "little")
+        + (1).to_bytes(2, "little")
+        + (0x0112).to_bytes(2, "little")
+        + (3).to_bytes(2, "little")
+        + (1).to_bytes(4, "little")
+        + orientation.to_bytes(2, "little")
+        + b"\0\0"
+        + (0).to_bytes(4, "little")
+    )
+    payload = b"Exif\0\0" + tiff
+    app1 = b"\xff\xe1" + (len(payload) + 2).to_bytes(2, "big") + payload
+    return data[:2] + app1 + data[2:]
+
+
+class FakeTurboJPEG:
+    """Decodes like libjpeg-turbo: scaled, ignoring the EXIF orientation."""
+
+    def decode(self, data: bytes, scaling_factor: tuple[int, int]) -> np.ndarray:
+        return cv2.imdecode(
+            np.frombuffer(data, np.uint8),
+            REDUCED_READ_FLAGS[scaling_factor[1]] | cv2.IMREAD_IGNORE_ORIENTATION,
+        )
+
+
+def test_jpeg_dimensions():
+    assert jpeg_dimensions(_jpeg(320, 240)) == (320, 240)
+    assert jpeg_dimensions(_jpeg(320, 240, orientation=6)) == (320, 240)
+    png = cv2.imencode(".png", np.zeros((4, 4, 3), dtype=np.uint8))[1].tobytes()
+    assert jpeg_dimensions(png) is None
+    assert jpeg_dimensions(b"\xff\xd8\xff") is None
+
+
+@pytest.mark.parametrize(
+    ("width", "height", "factor"),
+    [(3840, 2160, 4), (1920, 1080, 2), (1280, 720, 2), (1000, 1000, 1), (640, 480, 1)],
+)
+def test_choose_reduction_keeps_model_input_size(width, height, factor):
+    assert choose_reduction(width, height, 640) == factor
+    assert max(width, height) // factor >= 640 or factor == 1
+
+
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_exif_orientation(orientation):
+    assert exif_orientation(_jpeg(64, 48, orientation)) == orientation
+
+
+@pytest.mark.parametrize("reduced", [False, True])
+@pytest.mark.parametrize("orientation", range(1, 9))
+def test_turbojpeg_path_matches_opencv(orientation, reduced):
+    data = _jpeg(1600, 1200, orientation)
+    opencv = FrameDecoder()
+    opencv.reduced, opencv._turbojpeg = reduced, None
+    turbo = FrameDecoder()
+    turbo.reduced, turbo._turbojpeg = reduced, FakeTurboJPEG()
+
+    expected, actual = opencv.decode(data), turbo.decode(data)
+    assert actual.scale == expected.scale
+    np.testing.assert_array_equal(actual.image, expected.image)
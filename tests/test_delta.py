@@ -0,0 +1,76 @@
+import numpy as np
+
+from insperion_api.modules.inspection.delta import DeltaState
+from insperion_api.modules.inspection.detections import Detections
+
+
+def _detections(*boxes: tuple[float, float, float, float, int]) -> Detections:
+    return Detections(
+        np.array([box[:4] for box in boxes], dtype=np.float32).reshape(-1, 4),
+        np.full(len(boxes), 0.9, dtype=np.float32),
+        np.array([box[4] for box in boxes], dtype=np.int32),
+    )
+
+
+def _state(keyframe_interval: int = 30) -> DeltaState:
+    return DeltaState(keyframe_interval, iou_tolerance=0.9, pixel_tolerance=4.0)
+
+
+def test_first_frame_is_a_keyframe_with_fresh_ids():
+    delta = _state().update(_detections((0, 0, 10, 10, 0), (50, 50, 60, 60, 1)))
+
+    assert delta.keyframe
+    assert delta.added.size == 2
+    assert delta.added_ids.tolist() == [1, 2]
+    assert delta.updated.size == delta.removed_ids.size == 0
+
+
+def test_small_moves_are_not_sent():
+    state = _state()
+    state.update(_detections((0, 0, 100, 100, 0)))
+    delta = state.update(_detections((2, 2, 102, 102, 0)))
+
+    assert not delta.keyframe
+    assert delta.added.size == delta.updated.size == delta.removed_ids.size == 0
+
+
+def test_moved_added_and_removed_boxes():
+    state = _state()
+    state.update(_detections((0, 0, 100, 100, 0), (200, 200, 240, 240, 1)))
+    # The first box moves beyond the pixel tolerance, the second disappears
+    # and a new one shows up
+    delta = state.update(_detections((10, 0, 110, 100, 0), (400, 400, 420, 420, 1)))
+
+    assert delta.updated_ids.tolist() == [1]
+    np.testing.assert_array_equal(delta.updated.xyxy, [[10, 0, 110, 100]])
+    assert delta.removed_ids.tolist() == [2]
+    assert delta.added_ids.tolist() == [3]
+
+
+def test_small_moves_add_up_against_the_client_box():
+    state = _state()
+    state.update(_detections((0, 0, 100, 100, 0)))
+    assert state.update(_detections((3, 0, 103, 100, 0))).updated.size == 0
+    # 6 pixels from the box the client holds, though 3 from the last frame
+    delta = state.update(_detections((6, 0, 106, 100, 0)))
+
+    assert delta.updated_ids.tolist() == [1]
+
+
+def test_boxes_of_another_class_are_new_objects():
+    state = _state()
+    state.update(_detections((0, 0, 100, 100, 0)))
+    delta = state.update(_detections((0, 0, 100, 100, 1)))
+
+    assert delta.added_ids.tolist() == [2]
+    assert delta.removed_ids.tolist() == [1]
+
+
+def test_keyframe_every_interval_resends_everything():
+    state = _state(keyframe_interval=3)
+    frame = _detections((0, 0, 10, 10, 0))
+
+    keyframes = [state.update(frame).keyframe for _ in range(7)]
+
+    assert keyframes == [True, False, False, True, False, False, True]
+    assert state.update(frame).added.size == 0
@@ -0,0 +1,45 @@
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.encoding import (
+    BinaryResultEncoder,
+    decode_binary_result,
+)
+
+
+def _detections(track_id=None) -> Detections:
+    return Detections(
+        np.array([[1, 2, 30, 40], [50, 60, 70, 80]], dtype=np.float32),
+        np.array([0.5, 0.9], dtype=np.float32),
+        np.array([0, 1], dtype=np.int32),
+        track_id,
+    )
+
+
+def test_binary_round_trip_with_metadata():
+    encoder = BinaryResultEncoder({0: "scratch", 1: "dent"})
+    timings = {"decode": 1.5, "inference": 12.25}
+    decoded = decode_binary_result(
+        encoder.encode(_detections(), seq=7, dropped_frames=2, timings=timings)
+    )
+
+    assert decoded["seq"] == 7
+    assert decoded["dropped_frames"] == 2
+    assert decoded["timings"] == timings
+    assert decoded["detections"].track_id is None
+    np.testing.assert_array_equal(decoded["detections"].xyxy, _detections().xyxy)
+
+
+def test_binary_round_trip_with_track_ids_and_metadata():
+    detections = _detections(np.array([3, 11], dtype=np.int64))
+    encoder = BinaryResultEncoder({0: "scratch", 1: "dent"})
+    timings = {"decode": 1.5, "inference": 12.25}
+    decoded = decode_binary_result(
+        encoder.encode(detections, seq=1, source="tracked", timings=timings)
+    )
+
+    assert decoded["source"] == "tracked"
+    assert decoded["timings"] == timings
+    np.testing.assert_array_equal(decoded["detections"].track_id, [3, 11])
+    np.testing.assert_array_equal(decoded["detections"].class_id, [0, 1])
+    np.testing.assert_allclose(decoded["detections"].confidence, [0.5, 0.9])
@@ -0,0 +1,58 @@
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.frame_dedup import FrameDeduplicator, dhash
+
+
+def _detections(count: int = 1) -> Detections:
+    return Detections(
+        xyxy=np.zeros((count, 4), dtype=np.float32),
+        confidence=np.full(count, 0.9, dtype=np.float32),
+        class_id=np.zeros(count, dtype=np.int32),
+    )
+
+
+def _frame(seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).integers(0, 256, (480, 640, 3), np.uint8)
+
+
+def test_dhash_is_stable_under_small_changes():
+    frame = _frame(0)
+    noisy = np.clip(frame.astype(np.int16) + 1, 0, 255).astype(np.uint8)
+    assert (dhash(frame) ^ dhash(noisy)).bit_count() <= 4
+    assert (dhash(frame) ^ dhash(_frame(1))).bit_count() > 4
+
+
+def test_first_frame_is_never_reused():
+    assert FrameDeduplicator(threshold=4, max_reuse=3).lookup(0) is None
+
+
+def test_reuses_within_threshold_only():
+    deduplicator = FrameDeduplicator(threshold=2, max_reuse=10)
+    detections = _detections()
+    deduplicator.store(0b0000, detections)
+
+    assert deduplicator.lookup(0b0011) is detections
+    assert deduplicator.lookup(0b0111) is None
+    assert (deduplicator.checked, deduplicator.reused) == (2, 1)
+
+
+def test_zero_threshold_reuses_identical_frames_only():
+    deduplicator = FrameDeduplicator(threshold=0, max_reuse=10)
+    deduplicator.store(0xFF, _detections())
+
+    assert deduplicator.lookup(0xFF) is not None
+    assert deduplicator.lookup(0xFE) is None
+
+
+def test_max_reuse_forces_inference_until_next_store():
+    deduplicator = FrameDeduplicator(threshold=4, max_reuse=2)
+    deduplicator.store(0, _detections())
+
+    assert deduplicator.lookup(0) is not None
+    assert deduplicator.lookup(0) is not None
+    assert deduplicator.lookup(0) is None
+
+    fresh = _detections(2)
+    deduplicator.store(0, fresh)
+    assert deduplicator.lookup(0) is fresh
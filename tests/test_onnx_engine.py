@@ -0,0 +1,100 @@
+import numpy as np
+
+from insperion_api.modules.inspection.engines import (
+    LETTERBOX_COLOR,
+    OnnxEngine,
+    letterbox,
+    non_max_suppression,
+)
+from insperion_api.modules.inspection.inspection_params import InspectionParams
+
+
+def _engine() -> OnnxEngine:
+    # Post-processing does not touch the ONNX Runtime session
+    return object.__new__(OnnxEngine)
+
+
+def _prediction(*anchors: tuple[float, float, float, float, int, float]) -> np.ndarray:
+    """(4 + 3 classes, anchors) output from (cx, cy, w, h, class, score) rows."""
+    prediction = np.zeros((len(anchors), 4 + 3), dtype=np.float32)
+    for row, (cx, cy, w, h, class_id, score) in enumerate(anchors):
+        prediction[row, :4] = cx, cy, w, h
+        prediction[row, 4 + class_id] = score
+    return prediction.T
+
+
+def test_letterbox_scales_and_centers_the_frame():
+    frame = np.full((480, 640, 3), 255, dtype=np.uint8)
+    image, ratio, padding = letterbox(frame, 320)
+
+    assert image.shape == (320, 320, 3)
+    assert ratio == 0.5
+    assert padding == (0, 40)
+    assert tuple(image[0, 0]) == LETTERBOX_COLOR
+    assert tuple(image[-1, -1]) == LETTERBOX_COLOR
+    assert (image[40:280] == 255).all()
+
+
+def test_letterbox_keeps_a_square_frame_of_the_right_size():
+    frame = np.zeros((320, 320, 3), dtype=np.uint8)
+    image, ratio, padding = letterbox(frame, 320)
+
+    assert ratio == 1.0
+    assert padding == (0, 0)
+    np.testing.assert_array_equal(image, frame)
+
+
+def test_nms_keeps_the_best_of_overlapping_boxes():
+    boxes = np.array(
+        [[0, 0, 10, 10], [1, 1, 10, 10], [20, 20, 30, 30]], dtype=np.float32
+    )
+    scores = np.array([0.6, 0.9, 0.7], dtype=np.float32)
+
+    assert non_max_suppression(boxes, scores, 0.5).tolist() == [1, 2]
+    assert non_max_suppression(boxes, scores, 0.9).tolist() == [1, 2, 0]
+
+
+def test_postprocess_suppresses_within_a_class_only():
+    prediction = _prediction(
+        (50, 50, 20, 20, 0, 0.9),
+        (51, 51, 20, 20, 0, 0.8),
+        (50, 50, 20, 20, 1, 0.7),
+        (90, 90, 10, 10, 2, 0.1),
+    )
+    detections = _engine()._postprocess(prediction, (100, 100), 1.0, (0, 0), None)
+
+    assert detections.class_id.tolist() == [0, 1]
+    np.testing.assert_allclose(detections.confidence, [0.9, 0.7])
+
+
+def test_class_offset_separates_boxes_reaching_past_the_canvas():
+    # The same raw box for two classes, over ten times the 640 px canvas
+    prediction = _prediction(
+        (320, 320, 7600, 7600, 0, 0.9),
+        (320, 320, 7600, 7600, 1, 0.8),
+    )
+    detections = _engine()._postprocess(prediction, (100, 100), 1.0, (0, 0), None)
+
+    assert detections.class_id.tolist() == [0, 1]
+
+
+def test_postprocess_undoes_the_letterbox():
+    # A 640x480 frame letterboxed to 320: half size, 40 px of padding on top
+    prediction = _prediction((160, 160, 100, 50, 0, 0.9))
+    detections = _engine()._postprocess(prediction, (480, 640), 0.5, (0, 40), None)
+
+    np.testing.assert_allclose(detections.xyxy, [[220, 190, 420, 290]])
+
+
+def test_postprocess_scores_only_the_requested_classes():
+    prediction = _prediction((50, 50, 20, 20, 0, 0.9))
+    # The second class scores lower on the same anchor
+    prediction[4 + 2] = 0.6
+    params = InspectionParams(classes=(1, 2))
+
+    detections = _engine()._postprocess(prediction, (100, 100), 1.0, (0, 0), params)
+    assert detections.class_id.tolist() == [2]
+    np.testing.assert_allclose(detections.confidence, [0.6])
+
+    params = InspectionParams(classes=())
+    assert _engine()._postprocess(prediction, (100, 100), 1.0, (0, 0), params).size == 0
@@ -0,0 +1,68 @@
+import numpy as np
+
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.result_cache import (
+    ENTRY_OVERHEAD_BYTES,
+    ResultCache,
+)
+
+
+def _detections(count: int) -> Detections:
+    return Detections(
+        xyxy=np.zeros((count, 4), dtype=np.float32),
+        confidence=np.zeros(count, dtype=np.float32),
+        class_id=np.zeros(count, dtype=np.int32),
+    )
+
+
+def _size(count: int) -> int:
+    # 16 + 4 + 4 bytes per box
+    return ENTRY_OVERHEAD_BYTES + 24 * count
+
+
+def test_zero_bytes_disables_the_cache():
+    cache = ResultCache(max_bytes=0, ttl_s=60)
+    assert not cache.enabled
+    assert (cache.size_bytes, cache.entries) == (0, 0)
+
+
+def test_keys_differ_by_bytes_and_scope():
+    assert ResultCache.key(b"a", ("v1", None)) == ResultCache.key(b"a", ("v1", None))
+    assert ResultCache.key(b"a", ("v1", None)) != ResultCache.key(b"b", ("v1", None))
+    assert ResultCache.key(b"a", ("v1", None)) != ResultCache.key(b"a", ("v2", None))
+
+
+def test_bounded_by_bytes_least_recently_used_first():
+    cache = ResultCache(max_bytes=3 * _size(10), ttl_s=60)
+    keys = [ResultCache.key(bytes([i]), None) for i in range(4)]
+    for key in keys[:3]:
+        cache.put(key, _detections(10))
+    assert cache.size_bytes == 3 * _size(10)
+
+    # Touch the oldest, so the next insert evicts the second one instead
+    assert cache.get(keys[0]) is not None
+    cache.put(keys[3], _detections(10))
+
+    assert cache.entries == 3
+    assert cache.size_bytes <= cache.max_bytes
+    assert cache.get(keys[1]) is None
+    assert cache.get(keys[0]) is not None
+
+
+def test_entries_larger_than_the_cache_are_skipped():
+    cache = ResultCache(max_bytes=_size(10), ttl_s=60)
+    cache.put(ResultCache.key(b"big", None), _detections(11))
+    assert cache.entries == 0
+
+
+def test_entries_expire_after_the_ttl():
+    now = [1000.0]
+    cache = ResultCache(max_bytes=_size(10) * 4, ttl_s=5, timer=lambda: now[0])
+    key = ResultCache.key(b"frame", None)
+    cache.put(key, _detections(1))
+
+    now[0] += 4
+    assert cache.get(key) is not None
+    now[0] += 2
+    assert cache.get(key) is None
+    assert cache.entries == 0
@@ -0,0 +1,123 @@
+import numpy as np
+import pytest
+
+from insperion_api.core.constants.constants import InspectionStatus
+from insperion_api.modules.inspection import results_writer as writer_module
+from insperion_api.modules.inspection.detections import Detections
+from insperion_api.modules.inspection.results_writer import (
+    InspectionSummary,
+    ResultsWriter,
+    _merged_row,
+)
+
+NAMES = {0: "scratch", 1: "dent"}
+
+
+def _detections(*boxes: tuple[int, float]) -> Detections:
+    return Detections(
+        np.zeros((len(boxes), 4), dtype=np.float32),
+        np.array([box[1] for box in boxes], dtype=np.float32),
+        np.array([box[0] for box in boxes], dtype=np.int32),
+    )
+
+
+def _summary(*frames: Detections) -> InspectionSummary:
+    summary = InspectionSummary()
+    for detections in frames:
+        summary.add(detections, NAMES)
+    return summary
+
+
+def test_add_counts_boxes_and_frames_per_class():
+    summary = _summary(
+        _detections((0, 0.5), (0, 0.75), (1, 0.25)), _detections(), _detections((7, 1))
+    )
+
+    assert summary.frames == 3
+    assert summary.classes == {
+        "scratch": {"detections": 2, "frames": 1, "max_confidence": 0.75},
+        "dent": {"detections": 1, "frames": 1, "max_confidence": 0.25},
+        "7": {"detections": 1, "frames": 1, "max_confidence": 1.0},
+    }
+
+
+def test_merge_adds_up_summaries():
+    saved = _summary(_detections((0, 0.5)))
+    saved.first_frame_at = "2026-01-01T00:00:01.000+00:00"
+    saved.last_frame_at = "2026-01-01T00:00:02.000+00:00"
+    flushed = _summary(_detections((0, 0.9), (1, 0.3)))
+    flushed.first_frame_at = "2026-01-01T00:00:00.000+00:00"
+    flushed.last_frame_at = "2026-01-01T00:00:05.000+00:00"
+
+    saved.merge(flushed)
+
+    assert saved.frames == 2
+    assert saved.classes["scratch"] == {
+        "detections": 2,
+        "frames": 2,
+        "max_confidence": 0.9,
+    }
+    assert saved.classes["dent"]["detections"] == 1
+    assert saved.first_frame_at == "2026-01-01T00:00:00.000+00:00"
+    assert saved.last_frame_at == "2026-01-01T00:00:05.000+00:00"
+
+
+def test_merge_into_an_empty_summary_copies_it():
+    summary = _summary(_detections((1, 0.5)))
+    merged = InspectionSummary()
+    merged.merge(summary)
+    assert merged.as_dict() == summary.as_dict()
+
+
+@pytest.mark.parametrize("results", [None, {}, {"legacy": True}])
+def test_from_results_starts_over_on_unknown_results(results):
+    assert InspectionSummary.from_results(results) == InspectionSummary()
+
+
+def test_merged_row_adds_to_the_saved_results():
+    saved = _summary(_detections((0, 0.5))).as_dict()
+    row = _merged_row(
+        1, saved, "PENDING", _summary(_detections((0, 0.6))), InspectionStatus.COMPLETED
+    )
+
+    assert row["merged_results"]["frames"] == 2
+    assert row["merged_results"]["classes"]["scratch"]["detections"] == 2
+    assert row["next_status"] == "COMPLETED"
+
+
+@pytest.mark.parametrize(
+    ("saved", "target", "expected"),
+    [
+        ("PENDING", InspectionStatus.IN_PROGRESS, "IN_PROGRESS"),
+        ("COMPLETED", InspectionStatus.IN_PROGRESS, "IN_PROGRESS"),
+        ("IN_PROGRESS", InspectionStatus.FAILED, "FAILED"),
+        ("CANCELLED", InspectionStatus.IN_PROGRESS, "CANCELLED"),
+        ("CANCELLED", InspectionStatus.COMPLETED, "CANCELLED"),
+        ("FAILED", InspectionStatus.COMPLETED, "FAILED"),
+    ],
+)
+def test_status_transitions(saved, target, expected):
+    row = _merged_row(1, None, saved, InspectionSummary(), target)
+    assert row["next_status"] == expected
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_the_summaries(monkeypatch):
+    def unavailable(engine):
+        raise ConnectionError("database unavailable")
+
+    monkeypatch.setattr(writer_module, "get_async_engine", lambda: None)
+    monkeypatch.setattr(writer_module, "session_context", unavailable)
+    writer = ResultsWriter(flush_interval_ms=1000, max_records=100)
+    writer.open(1)
+    writer.record(1, _detections((0, 0.5)), NAMES)
+    await writer.flush()
+    writer.record(1, _detections((1, 0.5)), NAMES)
+    await writer.flush()
+
+    assert writer.pending_records == 2
+    assert writer.inspections == 1
+    pending = writer._inspections[1]
+    assert pending.dirty
+    assert pending.summary.frames == 2
+    assert set(pending.summary.classes) == {"scratch", "dent"}
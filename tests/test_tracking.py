@@ -0,0 +1,106 @@
+import cv2
+import numpy as np
+
+from insperion_api.modules.inspection.decoding import DecodedFrame
+from insperion_api.modules.inspection.detections import Detections, greedy_match
+from insperion_api.modules.inspection.tracking import BoxTracker
+
+
+def _detections(*boxes: tuple[float, float, float, float, int]) -> Detections:
+    return Detections(
+        np.array([box[:4] for box in boxes], dtype=np.float32).reshape(-1, 4),
+        np.full(len(boxes), 0.9, dtype=np.float32),
+        np.array([box[4] for box in boxes], dtype=np.int32),
+    )
+
+
+def _scene(seed: int = 0) -> np.ndarray:
+    # Coarse shading keeps the dHash stable as the view pans, fine texture
+    # gives the optical flow points to follow
+    rng = np.random.default_rng(seed)
+    shading = cv2.resize(
+        rng.integers(0, 200, (4, 5), np.uint8),
+        (400, 300),
+        interpolation=cv2.INTER_LINEAR,
+    )
+    texture = cv2.GaussianBlur(rng.integers(0, 56, (300, 400), np.uint8), (5, 5), 0)
+    return cv2.cvtColor(shading + texture, cv2.COLOR_GRAY2BGR)
+
+
+def _frame(scene: np.ndarray, dx: int = 0) -> DecodedFrame:
+    # A 320x240 view of the scene, its content moved dx pixels right
+    return DecodedFrame(np.ascontiguousarray(scene[30:270, 40 - dx : 360 - dx]))
+
+
+def _tracker(**kwargs) -> BoxTracker:
+    options = {
+        "detect_interval": 5,
+        "scene_change_threshold": 12,
+        "width": 320,
+        "match_iou": 0.3,
+    }
+    return BoxTracker(**{**options, **kwargs})
+
+
+def test_greedy_match_pairs_best_overlaps_first():
+    iou = np.array([[0.6, 0.7], [0.0, 0.8], [0.2, 0.0]])
+    # Row 1 takes column 1 first, so row 0 falls back on column 0
+    assert greedy_match(iou, 0.5).tolist() == [0, 1, -1]
+    assert greedy_match(iou, 0.1).tolist() == [0, 1, -1]
+    assert greedy_match(iou, 0.9).tolist() == [-1, -1, -1]
+
+
+def test_greedy_match_with_nothing_to_match():
+    assert greedy_match(np.zeros((2, 0)), 0.3).tolist() == [-1, -1]
+
+
+def test_first_frame_goes_to_the_detector():
+    tracker = _tracker()
+    assert tracker.step(_frame(_scene())) is None
+
+    tracks = tracker.update(_detections((50, 50, 150, 150, 0), (200, 60, 280, 200, 1)))
+    assert tracks.track_id.tolist() == [1, 2]
+
+
+def test_boxes_follow_the_motion_between_detections():
+    tracker = _tracker()
+    scene = _scene()
+    tracker.step(_frame(scene))
+    tracker.update(_detections((100, 80, 200, 180, 0)))
+
+    tracked = tracker.step(_frame(scene, dx=6))
+
+    assert tracked is not None
+    assert tracked.track_id.tolist() == [1]
+    np.testing.assert_allclose(tracked.xyxy, [[106, 80, 206, 180]], atol=1.5)
+
+
+def test_detects_every_interval():
+    tracker = _tracker(detect_interval=3)
+    frame = _frame(_scene())
+    tracker.step(frame)
+    tracker.update(_detections((100, 80, 200, 180, 0)))
+
+    assert tracker.step(frame) is not None
+    assert tracker.step(frame) is not None
+    assert tracker.step(frame) is None
+
+
+def test_scene_change_goes_to_the_detector():
+    tracker = _tracker()
+    tracker.step(_frame(_scene(0)))
+    tracker.update(_detections((100, 80, 200, 180, 0)))
+
+    assert tracker.step(_frame(_scene(1))) is None
+
+
+def test_detections_keep_the_ids_of_overlapping_tracks():
+    tracker = _tracker()
+    tracker.step(_frame(_scene()))
+    tracker.update(_detections((100, 80, 200, 180, 0), (220, 40, 300, 120, 1)))
+
+    # The first box moved a little, the second changed class, a third is new
+    tracks = tracker.update(
+        _detections((104, 80, 204, 180, 0), (220, 40, 300, 120, 2), (10, 10, 40, 40, 0))
+    )
+    assert tracks.track_id.tolist() == [1, 3, 4]